@@ -1,115 +1,283 @@
-import mysql.connector
 import time
-from multiprocessing import Process, Barrier, Manager
-from datetime import datetime, timedelta
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
-
-def worker_bsp(date_start, date_end, barrier, results, idx):
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        
-        # Convertir fechas a formato string para la consulta SQL
-        date_start_str = date_start.strftime('%Y-%m-%d')
-        date_end_str = date_end.strftime('%Y-%m-%d')
-        
-        # Ejecutar la consulta principal
-        query = "SELECT COUNT(*) FROM customers WHERE subscription_date >= %s AND subscription_date < %s"
-        cur.execute(query, (date_start_str, date_end_str))
-        cnt = cur.fetchone()[0]
-        cur.close()
-        conn.close()
+import math
+import argparse
+import multiprocessing
+from bisect import bisect_right
+from database import get_pool, add_backend_arguments, configure_backend, DatabaseManager
+from bsp_runtime import BSPEngine, BSPProgram
+from date_partitioner import (last_months_window, fetch_date_histogram, balanced_ranges,
+                              count_by_month_country, calendar_months, month_label,
+                              window_from_bounds, bounds_from_counts, monthly_histogram,
+                              counts_in_range, monthly_series)
+from snapshot import (open_snapshot, resolve_snapshot, date_bounds as snapshot_date_bounds,
+                      date_histogram as snapshot_date_histogram,
+                      count_by_month_country as snapshot_count_by_month_country)
+from result_store import (ResultStore, MonthlyCountryCounts, refresh, describe_refresh,
+                          DEFAULT_RESULTS_DIR)
+from windowed_metrics import (METRICS, DEFAULT_ROLLING, IDENTITY, add_metrics_arguments,
+                              merge_country_counts, month_totals, summarize, combine,
+                              compute_metrics, print_metrics)
+import cluster
+import tracing
+
+NUM_MONTHS = 12  # Ventana: últimos meses con datos
+HISTOGRAM_SAMPLE_EVERY = 1  # >1: muestrear una de cada N filas para el histograma
+MESSAGE_SLOT_SIZE = 256 * 1024  # Bytes por buzón: los parciales llevan el desglose por país
+
+def read_period(date_start, date_end, idx, snapshot_dir=None, stored_counts=None):
+    """Filas de un rango por mes y país; los errores de lectura se propagan"""
+    if stored_counts is not None:
+        # Modo incremental: conteos por mes y país ya puestos al día
+        counts = counts_in_range(stored_counts, date_start, date_end)
+    elif snapshot_dir:
+        counts = snapshot_count_by_month_country(open_snapshot(snapshot_dir),
+                                                 date_start, date_end)
+    else:
+        conn = get_pool().acquire()
+        try:
+            counts = count_by_month_country(conn, date_start, date_end)
+        finally:
+            conn.close()
+
+    print(f"Proceso {idx}: Rango {date_start} a {date_end}, "
+          f"Registros: {sum(month_totals(counts).values())}")
+    return counts
 
-        # Almacenar resultado
-        results[idx] = (date_start.strftime('%Y-%m'), cnt)
-        print(f"Proceso {idx}: Período {date_start.strftime('%Y-%m')}, Registros: {cnt}")
-        
+def count_period(date_start, date_end, idx, snapshot_dir=None, stored_counts=None):
+    """Como ``read_period``, pero {} si la consulta falla"""
+    try:
+        return read_period(date_start, date_end, idx, snapshot_dir, stored_counts)
     except Exception as e:
         print(f"Error en proceso {idx}: {e}")
-        results[idx] = (date_start.strftime('%Y-%m'), 0)
-    
-    # Sincronizar todos los procesos
-    barrier.wait()
-
-    # Solo el proceso 0 imprime el total
-    if idx == 0:
-        total = sum(v for _, v in results.values())
-        print(f"\n[BSP-paralelo] Total registros último año = {total}")
-        print("Desglose por mes:")
-        for i in range(len(results)):
-            mes, cantidad = results[i]
-            print(f"  {mes}: {cantidad} registros")
-
-def generate_monthly_ranges():
-    """Genera 12 rangos mensuales basados en los datos reales de la BD"""
-    # Basándose en el diagnóstico: datos van de 2020-01-01 a 2022-05-29
-    # Vamos a tomar los últimos 12 meses de datos disponibles
-    
-    # Comenzar desde mayo 2022 (último mes con datos) y retroceder 12 meses
-    end_date = datetime(2022, 6, 1)  # Primer día después del último mes con datos
-    fechas = []
-    
-    for i in range(12):
-        # Calcular el mes final
-        year = end_date.year
-        month = end_date.month - i
-        
-        # Ajustar año si el mes es negativo o cero
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        # Primer día del mes
-        fin = datetime(year, month, 1)
-        
-        # Primer día del siguiente mes (para el rango)
-        if month == 1:
-            inicio = datetime(year - 1, 12, 1)
+        return {}
+
+class WindowedMetricsProgram(BSPProgram):
+    """Métricas mensuales con una sola lectura por partición y un scan de prefijos.
+
+    - Superpaso 0: cada partición (rango de fechas equilibrado) cuenta sus
+      filas por mes y país y envía cada mes a su dueña: la partición donde
+      empieza el mes (o la primera, para el mes en que empieza la ventana).
+    - Superpaso 1: la dueña une los fragmentos de sus meses y resume su
+      segmento (total y últimos meses) con ``windowed_metrics.summarize``.
+    - Superpasos 1..log2(P): prefijo exclusivo de los resúmenes
+      (Hillis-Steele). En la ronda k la partición i envía lo acumulado a
+      i + 2^k, de modo que tras la última ronda cada una conoce el resumen de
+      todas las anteriores.
+    - En el último superpaso cada partición calcula las métricas de sus meses
+      (acumulado, media móvil, crecimiento, desglose por país) sin volver a la
+      BD ni recibir los meses de las demás.
+    """
+
+    def __init__(self, ranges, window, metrics=METRICS, rolling=DEFAULT_ROLLING,
+                 snapshot_dir=None, stored_counts=None):
+        self.ranges = ranges
+        self.num_partitions = len(ranges)
+        self.window = window
+        self.metrics = metrics
+        self.rolling = rolling
+        self.snapshot_dir = snapshot_dir  # Leer la instantánea en lugar de la BD
+        self.stored_counts = stored_counts  # O partir de los conteos de result_store
+        self.rounds = math.ceil(math.log2(self.num_partitions)) if self.num_partitions > 1 else 0
+        self.num_supersteps = 2 + self.rounds
+        self.starts = [start for start, _ in ranges]
+        self.months = {month_label(m): m for m in calendar_months(*window)}
+
+    def owner(self, label):
+        """Partición dueña del mes ``label`` (la que contiene su primer día en la ventana)"""
+        first = max(self.months[label], self.window[0])
+        return bisect_right(self.starts, first) - 1
+
+    def setup(self, pid, data):
+        return {'rango': data}
+
+    def superstep(self, step, pid, state, inbox, send):
+        if step == 0:
+            parcial = count_period(*state['rango'], pid, self.snapshot_dir, self.stored_counts)
+            state['registros'] = sum(month_totals(parcial).values())
+            fragments = {}
+            for label, countries in parcial.items():
+                if label in self.months:
+                    fragments.setdefault(self.owner(label), {})[label] = countries
+            for dest, fragment in fragments.items():
+                send(dest, fragment)
+            return state
+
+        if step == 1:
+            state['paises'] = merge_country_counts(msg for _, msg in inbox)
+            totals = month_totals(state['paises'])
+            state['serie'] = [(label, totals.get(label, 0)) for label in self.months
+                              if self.owner(label) == pid]
+            state['acumulado'] = summarize([n for _, n in state['serie']], self.rolling)
+            state['prefijo'] = IDENTITY
         else:
-            inicio = datetime(year, month - 1, 1)
-        
-        fechas.append((inicio, fin))
-    
-    # Invertir para tener orden cronológico ascendente
-    return list(reversed(fechas))
+            # Ronda step-2 del scan: llega lo acumulado de pid - 2^(step-2)
+            for _, received in inbox:
+                state['prefijo'] = combine(received, state['prefijo'], self.rolling)
+                state['acumulado'] = combine(received, state['acumulado'], self.rolling)
+
+        scan_round = step - 1
+        if scan_round < self.rounds and pid + 2 ** scan_round < self.num_partitions:
+            send(pid + 2 ** scan_round, state['acumulado'])
+        if step == self.num_supersteps - 1:
+            state['meses'] = compute_metrics(state['serie'], state['paises'], state['prefijo'],
+                                             self.metrics, self.rolling)
+        return state
+
+    def result(self, pid, state):
+        return {'rango': state['rango'], 'registros': state['registros'],
+                'meses': state['meses']}
+
+def collect_rows(results):
+    """Filas de métricas de todas las particiones, en orden de mes"""
+    return [m for r in results for m in r['meses']]
+
+def scan_unit(data):
+    """Unidad del modo multi-nodo: superpaso 0 (lectura) de una partición.
+
+    Un error de lectura se propaga para que el coordinador reintente la
+    unidad en lugar de sumar un parcial vacío.
+    """
+    return read_period(*data['range'], data['partition'], data['snapshot'])
+
+CLUSTER_HANDLERS = {'scan': scan_unit}
+
+def run_bsp_cluster(fechas, window, address, metrics=METRICS, rolling=DEFAULT_ROLLING,
+                    snapshot_dir=None, local_workers=0, authkey=cluster.DEFAULT_AUTHKEY,
+                    heartbeat_timeout=cluster.HEARTBEAT_TIMEOUT):
+    """Coordinador: los workers remotos hacen la lectura de cada partición.
+
+    Solo el superpaso 0 toca la BD; el resto de ``WindowedMetricsProgram``
+    (unir los meses y el scan de prefijos) es O(meses) y lo resuelve el
+    coordinador en cuanto tiene todos los parciales, que actúa de barrera.
+    """
+    units = [('scan', {'range': r, 'partition': i, 'snapshot': snapshot_dir})
+             for i, r in enumerate(fechas)]
+    parciales = [None] * len(units)
+
+    def on_result(unit, result):
+        parciales[unit] = result
+
+    status = cluster.run_coordinator(units, on_result, address, CLUSTER_HANDLERS,
+                                     local_workers, authkey, heartbeat_timeout)
+    por_pais = merge_country_counts(parciales)
+    series = monthly_series(month_totals(por_pais), *window)
+    return parciales, compute_metrics(series, por_pais, metrics=metrics, rolling=rolling), status
+
+def generate_balanced_ranges(num_partitions, months=NUM_MONTHS, snapshot_dir=None,
+                             stored_counts=None):
+    """Rangos con un número de filas similar dentro de la ventana con datos"""
+    if stored_counts is not None:
+        # Cortes en límites de mes: cada mes guardado cae entero en una partición
+        totals = month_totals(stored_counts)
+        start, end = window_from_bounds(*bounds_from_counts(totals), months)
+        if start is None:
+            return None, []
+        histogram = monthly_histogram(totals, start, end)
+        return (start, end), balanced_ranges(histogram, num_partitions, start, end)
+    if snapshot_dir:
+        snapshot = open_snapshot(snapshot_dir)
+        start, end = window_from_bounds(*snapshot_date_bounds(snapshot), months)
+        if start is None:
+            return None, []
+        histogram = snapshot_date_histogram(snapshot, start, end)
+        return (start, end), balanced_ranges(histogram, num_partitions, start, end)
+
+    conn = get_pool().acquire()
+    start, end = last_months_window(conn, months)
+    if start is None:
+        conn.close()
+        return None, []
+    histogram = fetch_date_histogram(conn, start, end, HISTOGRAM_SAMPLE_EVERY)
+    conn.close()
+    return (start, end), balanced_ranges(histogram, num_partitions, start, end)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Métricas mensuales BSP paralelo")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help="procesos del pool BSP y número de particiones")
+    parser.add_argument('--months', type=int, default=NUM_MONTHS,
+                        help="últimos meses con datos a procesar")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="contar desde la instantánea columnar en lugar de la BD")
+    parser.add_argument('--incremental', action='store_true',
+                        help="partir de los conteos guardados y leer solo las filas nuevas")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR,
+                        help="directorio de los resultados incrementales")
+    add_metrics_arguments(parser)
+    cluster.add_cluster_arguments(parser)
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    cluster.check_cluster_arguments(parser, args)
+    configure_backend(args)
+    tracing.start_from_args(args)
+    snapshot_dir = resolve_snapshot(args.snapshot) if args.snapshot else None
+
+    if args.worker:
+        cluster.run_worker(cluster.parse_address(args.worker), CLUSTER_HANDLERS, args.authkey)
+        raise SystemExit(0)
+    if args.coordinator and args.incremental:
+        parser.error("--incremental no necesita workers: los conteos ya están guardados")
+
     print("Iniciando procesamiento BSP paralelo...")
-    
-    
-    # Generar 12 particiones mensuales
-    fechas = generate_monthly_ranges()
-    
-    print(f"Procesando {len(fechas)} períodos mensuales:")
+
+    stored_counts = None
+    if args.incremental:
+        DatabaseManager().ensure_change_tracking()
+        t0 = time.perf_counter()
+        stored_counts, info = refresh(MonthlyCountryCounts(),
+                                      ResultStore(args.results_dir), args.workers)
+        print(f"Conteos por mes y país ({time.perf_counter() - t0:.2f} s): {describe_refresh(info)}")
+
+    # Particiones equilibradas según la distribución real de fechas
+    window, fechas = generate_balanced_ranges(args.workers, args.months, snapshot_dir,
+                                              stored_counts)
+    if not fechas:
+        print("No hay datos en la tabla customers")
+        raise SystemExit(1)
+
+    print(f"Procesando {len(fechas)} particiones entre {window[0]} y {window[1]}:")
     for i, (inicio, fin) in enumerate(fechas):
-        print(f"  {i}: {inicio.strftime('%Y-%m-%d')} a {fin.strftime('%Y-%m-%d')}")
-    
+        print(f"  {i}: {inicio} a {fin}")
+
     N = len(fechas)
-    mgr = Manager()
-    results = mgr.dict()
-    barrier = Barrier(N)
-    procs = []
-
-    print(f"\nIniciando {N} procesos paralelos...")
-    t0 = time.time()
-    
-    # Crear y lanzar procesos
-    for i, (ds, de) in enumerate(fechas):
-        p = Process(target=worker_bsp, args=(ds, de, barrier, results, i))
-        p.start()
-        procs.append(p)
-    
-    # Esperar a que terminen todos los procesos
-    for p in procs:
-        p.join()
-    
-    tiempo_total = time.time() - t0
-    print(f"\nTiempo total (BSP-paralelo): {tiempo_total:.2f} segundos")
\ No newline at end of file
+
+    if args.coordinator:
+        print("\nRepartiendo la lectura entre workers remotos...")
+        t0 = time.perf_counter()
+        parciales, filas, status = run_bsp_cluster(
+            fechas, window, cluster.parse_address(args.coordinator), args.metrics,
+            args.rolling, snapshot_dir, args.local_workers, args.authkey,
+            args.heartbeat_timeout)
+        tiempo_total = time.perf_counter() - t0
+        print(f"\n[BSP-multinodo] Total registros últimos {args.months} meses = "
+              f"{sum(f['registros'] for f in filas)}")
+        print(f"[Coordinador] {cluster.describe_status(status)}")
+        print_metrics(filas, args.metrics, args.rolling, args.top_paises)
+        print(f"\nTiempo total (BSP-multinodo): {tiempo_total:.2f} segundos")
+        tracing.finish_from_args(args)
+        raise SystemExit(0)
+
+    print(f"\nIniciando pool BSP de {N} procesos...")
+    with BSPEngine(N, slot_size=MESSAGE_SLOT_SIZE) as engine:
+        t0 = time.perf_counter()
+        program = WindowedMetricsProgram(fechas, window, args.metrics, args.rolling,
+                                         snapshot_dir, stored_counts)
+        results = engine.run(program, fechas)
+        tiempo_total = time.perf_counter() - t0
+        filas = collect_rows(results)
+
+        print(f"\n[BSP-paralelo] Total registros últimos {args.months} meses = "
+              f"{sum(f['registros'] for f in filas)}")
+        print(f"Superpasos: {program.num_supersteps} ({program.rounds} rondas de scan)")
+        print("Registros por partición:")
+        for i, r in enumerate(results):
+            print(f"  {i}: {r['registros']} registros")
+        print_metrics(filas, args.metrics, args.rolling, args.top_paises)
+
+        print("\nTiempos por superpaso:")
+        engine.print_timings()
+
+    print(f"\nTiempo total (BSP-paralelo): {tiempo_total:.2f} segundos")
+    tracing.finish_from_args(args)
@@ -1,54 +1,282 @@
-import mysql.connector
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import asyncio
 import time
+import argparse
+import multiprocessing
+from database import get_pool, configure_pool, DatabaseManager, add_backend_arguments, configure_backend
+from forkjoin_planner import PLANS, PLAN_FANOUT, PLAN_HLL, PLAN_COST, choose_plan, key_ranges
+from forkjoin_scheduler import (WorkStealingScheduler, cost_history_path, load_cost_history,
+                                save_cost_history, estimate_costs, pack_tasks)
+from city_sketches import id_shards, shard_sketches, merge_sketches, DEFAULT_SKETCH_DIR
+from hyperloglog import DEFAULT_PRECISION
+from shared_reduce import chunk_bounds
+from snapshot import open_snapshot, resolve_snapshot, city_pairs_task, distinct_cities_by_country
+from async_forkjoin import (create_async_pool, fork_join_async, DEFAULT_CONCURRENCY,
+                            DEFAULT_POOL_SIZE, DEFAULT_TASK_TIMEOUT)
+from result_store import (ResultStore, CitiesByCountry, refresh, describe_refresh,
+                          DEFAULT_RESULTS_DIR)
+import tracing
 
-# Datos de conexión
-DB_CONFIG = {
-    'host':     'localhost',
-    'user':     'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
+CITY_COUNT_SQL = "SELECT COUNT(DISTINCT City) FROM customers WHERE Country = %s"
+CITY_COUNT_RANGE_SQL = ("SELECT Country, COUNT(DISTINCT City) FROM customers "
+                        "WHERE Country >= %s AND Country <= %s GROUP BY Country")
+CITY_COUNT_IN_SQL = ("SELECT Country, COUNT(DISTINCT City) FROM customers "
+                     "WHERE Country IN ({}) GROUP BY Country")
+ROWS_BY_COUNTRY_SQL = "SELECT Country, COUNT(*) FROM customers GROUP BY Country"
 
 def contar_ciudades_por_pais(pais):
     """Consulta a MySQL y devuelve (pais, número_de_ciudades_distintas)."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(DISTINCT City) FROM customers WHERE Country = %s",
-        (pais,)
-    )
-    count = cursor.fetchone()[0]
-    cursor.close()
-    conn.close()
+    # Conexión del pool y sentencia preparada reutilizada entre países
+    with tracing.span('task', 'task', pais=pais), get_pool().connection() as conn:
+        count = conn.query_one(CITY_COUNT_SQL, (pais,))[0]
     return pais, count
 
-if __name__ == '__main__':
-    # 1) Recuperamos la lista de países
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT Country FROM customers")
-    paises = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
+def contar_ciudades_por_rango(desde, hasta):
+    """Un solo GROUP BY para los países de [desde, hasta]; devuelve {pais: ciudades}."""
+    with tracing.span('task', 'task', desde=desde, hasta=hasta), get_pool().connection() as conn:
+        return dict(conn.query(CITY_COUNT_RANGE_SQL, (desde, hasta)))
+
+def contar_ciudades_en(paises):
+    """Un paquete de países pequeños en una sola consulta ``IN (...)``"""
+    with tracing.span('task', 'task', paises=len(paises)), get_pool().connection() as conn:
+        # Cursor normal: cada tamaño de IN sería una sentencia preparada distinta
+        cur = conn.cursor()
+        cur.execute(CITY_COUNT_IN_SQL.format(', '.join(['%s'] * len(paises))), tuple(paises))
+        encontrados = dict(cur.fetchall())
+        cur.close()
+    return {pais: encontrados.get(pais, 0) for pais in paises}
+
+def fork_join_por_coste(num_threads=None, results_dir=DEFAULT_RESULTS_DIR):
+    """Plan cost: tareas por coste estimado, claves pequeñas en IN (...) y robo de trabajo"""
+    with get_pool().connection() as conn:
+        paises = [row[0] for row in conn.query("SELECT DISTINCT Country FROM customers")]
+    claves = [p for p in paises if p is not None]
+
+    # Coste de cada país: historial de ejecuciones anteriores o filas
+    path = cost_history_path(results_dir)
+    history = load_cost_history(path)
+    filas = {}
+    if any(p not in history for p in claves):
+        with get_pool().connection() as conn:
+            filas = dict(conn.query(ROWS_BY_COUNTRY_SQL))
+    costes = estimate_costs(claves, history, filas)
+
+    if num_threads is None:
+        num_threads = max(1, min(32, len(claves)))
+    tareas = pack_tasks(costes, num_threads)
+    num_threads = max(1, min(num_threads, len(tareas)))  # No más hilos que tareas
+    configure_pool(num_threads)
+    scheduler = WorkStealingScheduler(num_threads)
+
+    def run_task(tarea):
+        if len(tarea.keys) == 1:
+            return dict([contar_ciudades_por_pais(tarea.keys[0])])
+        return contar_ciudades_en(tarea.keys)
+
+    resultados = {None: 0} if None in paises else {}  # Igual que WHERE Country = NULL
+    medidos = {}
+    with tracing.span('join', 'stage'):
+        for tarea, parcial, segundos in scheduler.run(tareas, run_task):
+            resultados.update(parcial)
+            # Solo se miden las claves con tarea propia; las de un paquete
+            # se estimarán por sus filas
+            for pais in tarea.keys:
+                rows = filas.get(pais, (history.get(pais) or {}).get('rows'))
+                medidos[pais] = (segundos if len(tarea.keys) == 1 else None, rows)
+    save_cost_history(path, history, medidos)
+
+    paquetes = sum(1 for t in tareas if len(t.keys) > 1)
+    detalle = (f"{PLAN_COST} ({len(claves)} países, {len(tareas)} tareas, {paquetes} "
+               f"paquetes IN, {scheduler.steals} robos, desequilibrio "
+               f"{scheduler.imbalance():.2f}, coste {'historial' if not filas else 'filas'})")
+    return resultados, detalle, num_threads
+
+def fork_join_exacto(plan, num_threads=None):
+    """Plan fanout o grouped con hilos; devuelve (resultados, plan, tareas, hilos)"""
+    # 1) Recuperamos la lista de países (ordenada por la BD para cortar rangos)
+    with get_pool().connection() as conn:
+        paises = [row[0] for row in
+                  conn.query("SELECT DISTINCT Country FROM customers ORDER BY Country")]
 
     # 2) Lanzamos un pool de hilos
-    num_threads = min(32, len(paises))  # no más hilos que países ni un número excesivo
-    start = time.time()
+    if num_threads is None:
+        num_threads = min(32, len(paises))  # no más hilos que países ni un número excesivo
+    configure_pool(num_threads)  # una conexión por hilo
+    if plan == 'auto':
+        plan = choose_plan(len(paises), num_threads)
     resultados = {}
     with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        # Fork: lanzamos una tarea por cada país
-        futuros = {executor.submit(contar_ciudades_por_pais, p): p for p in paises}
+        if plan == PLAN_FANOUT:
+            # Fork: lanzamos una tarea por cada país
+            futuros = [executor.submit(contar_ciudades_por_pais, p) for p in paises]
+        else:
+            # Fork: un rango contiguo de países por hilo
+            rangos = key_ranges([p for p in paises if p is not None], num_threads)
+            futuros = [executor.submit(contar_ciudades_por_rango, desde, hasta)
+                       for desde, hasta in rangos]
+            if None in paises:
+                resultados[None] = 0  # Igual que WHERE Country = NULL en el plan fanout
 
         # Join: vamos recogiendo los resultados
-        for futuro in as_completed(futuros):
-            pais, cuenta = futuro.result()
-            resultados[pais] = cuenta
+        with tracing.span('join', 'stage'):
+            for futuro in as_completed(futuros):
+                if plan == PLAN_FANOUT:
+                    pais, cuenta = futuro.result()
+                    resultados[pais] = cuenta
+                else:
+                    resultados.update(futuro.result())
+
+    return resultados, f"{plan} ({len(paises)} países, {len(futuros)} tareas)", num_threads
+
+async def _fork_join_async(concurrency, timeout, on_result):
+    pool = await create_async_pool(min(concurrency, DEFAULT_POOL_SIZE)).open()
+    try:
+        paises = [row[0] for row in
+                  await pool.query("SELECT DISTINCT Country FROM customers ORDER BY Country")]
+
+        async def contar(pais):
+            return (await pool.query(CITY_COUNT_SQL, (pais,)))[0][0]
+
+        resultados, errores = await fork_join_async(paises, contar, concurrency, timeout,
+                                                    on_result)
+    finally:
+        await pool.close()
+    pool.print_stats()
+    return resultados, errores, pool.describe()
+
+def fork_join_asyncio(concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TASK_TIMEOUT,
+                      on_result=None):
+    """Plan fanout con corrutinas: una tarea por país, ``concurrency`` en curso a la vez"""
+    resultados, errores, pool = asyncio.run(_fork_join_async(concurrency, timeout, on_result))
+    for pais, error in errores.items():
+        print(f"[asyncio] {pais}: {type(error).__name__}: {error}")
+    detalle = (f"asyncio fanout ({len(resultados) + len(errores)} tareas, "
+               f"{len(errores)} fallidas, {pool})")
+    return resultados, detalle, concurrency
+
+def fork_join_incremental(num_threads, results_dir):
+    """Ciudades por país desde el estado guardado, leyendo solo las filas nuevas"""
+    configure_pool(num_threads)
+    state, info = refresh(CitiesByCountry(), ResultStore(results_dir), num_threads)
+    return CitiesByCountry.counts(state), f"incremental ({describe_refresh(info)})", num_threads
+
+def fork_join_hll(num_procs, precision, sketch_dir):
+    """Plan hll: un recorrido por fragmento de id, sketches por país unidos en el join"""
+    with get_pool().connection() as conn:
+        shards = id_shards(conn)
+
+    parciales = []
+    desde_cache = 0
+    with ProcessPoolExecutor(max_workers=num_procs) as executor:
+        # Fork: cada proceso construye los sketches de un fragmento disjunto
+        futuros = [executor.submit(tracing.run_traced, 'task', shard_sketches,
+                                   lo, hi, completo, precision, sketch_dir)
+                   for lo, hi, completo in shards]
+
+        # Join: se guardan los parciales y se unen al final
+        with tracing.span('join', 'stage'):
+            for futuro in as_completed(futuros):
+                sketches, cacheado = futuro.result()
+                parciales.append(sketches)
+                desde_cache += cacheado
+
+    resultados = {pais: s.count() for pais, s in merge_sketches(parciales).items()}
+    detalle = (f"{PLAN_HLL} (precisión {precision}, {len(shards)} fragmentos, "
+               f"{desde_cache} desde caché)")
+    return resultados, detalle, num_procs
+
+def fork_join_snapshot(num_procs, snapshot_dir):
+    """Conteo exacto desde la instantánea: cada proceso lee un fragmento de filas del mmap"""
+    snapshot_dir = resolve_snapshot(snapshot_dir)  # Todos leen la misma versión
+    snapshot = open_snapshot(snapshot_dir)
+
+    parciales = []
+    with ProcessPoolExecutor(max_workers=num_procs) as executor:
+        # Fork: pares (país, ciudad) distintos de cada fragmento
+        futuros = [executor.submit(tracing.run_traced, 'task', city_pairs_task,
+                                   snapshot_dir, lo, hi)
+                   for lo, hi in chunk_bounds(snapshot.num_rows, num_procs)]
+
+        # Join: unión de los pares y conteo por país
+        with tracing.span('join', 'stage'):
+            for futuro in as_completed(futuros):
+                parciales.append(futuro.result())
+
+    resultados = distinct_cities_by_country(snapshot, parciales)
+    return resultados, f"snapshot (versión {snapshot.version}, {len(futuros)} fragmentos)", num_procs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ciudades distintas por país (Fork-Join)")
+    parser.add_argument('--plan', choices=('auto',) + PLANS, default='auto',
+                        help="fanout: una consulta por país; grouped: un GROUP BY por "
+                             "rango de países; cost: tareas por coste estimado, países "
+                             "pequeños en IN (...) y robo de trabajo; hll: conteo "
+                             "aproximado en un solo recorrido; auto: fanout o grouped "
+                             "según el número de países")
+    parser.add_argument('--no-indexes', action='store_true',
+                        help="no comprobar/crear los índices secundarios")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help="procesos del plan hll o de --snapshot")
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help="precisión de los sketches HyperLogLog (4-16)")
+    parser.add_argument('--sketch-dir', default=DEFAULT_SKETCH_DIR,
+                        help="caché de sketches por fragmento ('' para desactivarla)")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="conteo exacto desde la instantánea columnar, sin consultas")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reutilizar el resultado guardado y leer solo las filas nuevas")
+    parser.add_argument('--results-dir', default=DEFAULT_RESULTS_DIR,
+                        help="directorio de los resultados incrementales")
+    parser.add_argument('--asyncio', action='store_true',
+                        help="plan fanout con asyncio en lugar de un hilo por tarea")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="tareas asyncio en curso a la vez")
+    parser.add_argument('--task-timeout', type=float, default=DEFAULT_TASK_TIMEOUT,
+                        help="segundos máximos por tarea asyncio (incluye esperar conexión)")
+    parser.add_argument('--stream', action='store_true',
+                        help="con --asyncio, mostrar cada país en cuanto termina")
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+    tracing.start_from_args(args)
+
+    # 0) Índices (country, city) y subscription_date
+    if not args.no_indexes and (args.plan != PLAN_HLL or args.asyncio) and not args.snapshot \
+            and not args.incremental:
+        DatabaseManager().ensure_indexes()
+    if args.incremental:
+        DatabaseManager().ensure_change_tracking()
 
-    total_time = time.time() - start
+    start = time.perf_counter()
+    if args.incremental:
+        resultados, detalle, num_workers = fork_join_incremental(args.workers, args.results_dir)
+        tipo, aprox = "hilos", ""
+    elif args.asyncio:
+        mostrar = (lambda pais, cuenta: print(f"{pais}: {cuenta} ciudades")) if args.stream else None
+        resultados, detalle, num_workers = fork_join_asyncio(args.concurrency,
+                                                             args.task_timeout, mostrar)
+        tipo, aprox = "corrutinas", ""
+    elif args.snapshot:
+        resultados, detalle, num_workers = fork_join_snapshot(args.workers, args.snapshot)
+        tipo, aprox = "procesos", ""
+    elif args.plan == PLAN_COST:
+        resultados, detalle, num_workers = fork_join_por_coste(results_dir=args.results_dir)
+        tipo, aprox = "hilos", ""
+    elif args.plan == PLAN_HLL:
+        resultados, detalle, num_workers = fork_join_hll(args.workers, args.precision,
+                                                         args.sketch_dir)
+        tipo, aprox = "procesos", "~"
+    else:
+        resultados, detalle, num_workers = fork_join_exacto(args.plan)
+        tipo, aprox = "hilos", ""
+    total_time = time.perf_counter() - start
 
     # 3) Mostramos resultados y tiempo
-    for pais, cuenta in resultados.items():
-        print(f"{pais}: {cuenta} ciudades")
-    print(f"\nTiempo total (paralelo con hilos): {total_time:.2f} s")
+    if not (args.asyncio and args.stream):
+        for pais, cuenta in resultados.items():
+            print(f"{pais}: {aprox}{cuenta} ciudades")
+    print(f"\nPlan: {detalle}, {num_workers} {tipo}")
+    print(f"Tiempo total (paralelo con {tipo}, plan {detalle.split()[0]}): {total_time:.2f} s")
+    get_pool().print_stats()
+    tracing.finish_from_args(args)
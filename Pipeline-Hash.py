@@ -1,126 +1,464 @@
-import mysql.connector
 import time
-from threading import Thread, Event
-from queue import Queue
+from threading import Thread
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
 import multiprocessing
+import argparse
+import os
+from functools import partial
+from stream_reader import iter_keyset_batches
+from database import DB_CONFIG, get_pool, get_backend, add_backend_arguments, configure_backend
+from hash_cache import HashCache, DEFAULT_PATH as HASH_CACHE_PATH
+from shuffle import (NUM_PARTITIONS, DEFAULT_SPILL_DIR, SpillWriter, partition_for,
+                     truncate_partitions)
+from snapshot import open_snapshot, resolve_snapshot
+from flow_control import AdaptiveController, MIN_BATCH_SIZE, MAX_BATCH_SIZE
+from result_store import id_ranges
+from checkpoint import Checkpoint, CheckpointError
+import cluster
+import tracing
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
-BATCH_SIZE = 100_000
+BATCH_SIZE = 100_000  # Lote fijo con --no-adaptive
 NUM_WORKERS = multiprocessing.cpu_count()  # Usar número de CPUs disponibles
-QUEUE_SIZE = BATCH_SIZE 
+CHUNK_SIZE = 1_000  # Emails por sub-lote enviado a los procesos de hashing
+QUEUE_SIZE = NUM_WORKERS * 4  # Máximo de sub-lotes en vuelo entre etapas (colas acotadas)
 HASH_ITERATIONS = 1000
+SERVER_SIDE_CURSOR = False  # True: un único cursor sin buffer con fetchmany
+SPILL_DIR = os.path.join(DEFAULT_SPILL_DIR, 'pipeline-paralelo')
+CHECKPOINT_PATH = os.path.join(DEFAULT_SPILL_DIR, 'pipeline-paralelo.checkpoint.json')
+CHECKPOINT_INTERVAL = 30.0  # Segundos entre checkpoints
+CLUSTER_UNIT_ROWS = 20_000  # Ids (o filas de la instantánea) por unidad en modo multi-nodo
 
-def hash_intensive(email):
+def chained_md5(email):
     """Función intensiva que realiza múltiples hashes"""
     result = email.encode()
     for _ in range(HASH_ITERATIONS):
         result = hashlib.md5(result).digest()
-    return int(hashlib.md5(email.encode()).hexdigest(), 16) % NUM_WORKERS, result
+    return result
 
-def process_batch(batch):
-    """Procesa un lote completo de emails y retorna conteos por worker"""
-    counts = [0] * NUM_WORKERS
+def hash_intensive(email, cache=None):
+    """Hash intensivo del email, reutilizando la caché persistente si se indica"""
+    if cache is not None:
+        result = cache.get_or_compute(email, HASH_ITERATIONS, chained_md5)
+    else:
+        result = chained_md5(email)
+    return partition_for(email), result
+
+def process_batch(batch, cache=None):
+    """Procesa un lote de emails y retorna sus registros (email, digest) por partición"""
+    buckets = [[] for _ in range(NUM_PARTITIONS)]
     for email in batch:
         if email:
-            worker_id, _ = hash_intensive(email)
-            counts[worker_id] += 1
-    return counts
+            partition, digest = hash_intensive(email, cache)
+            buckets[partition].append((email, digest))
+    return buckets
+
+def reader(batch_queue, num_workers, controller, snapshot_dir=None, progress=None):
+    """Etapa 1: lee emails de la BD y los reparte en sub-lotes a los workers.
 
-def reader_and_processor(result_queue, finished_event):
-    """Lee emails de la BD y los procesa en lotes"""
+    Cada sub-lote ocupa un hueco de la ventana del controlador: si el hashing
+    va por detrás, ``acquire()`` bloquea aquí (contrapresión) antes de leer más.
+    Viaja como ``(secuencia, última clave, emails)``: la clave es el ``id`` (o
+    la fila de la instantánea) hasta el que llega, y la lectura empieza tras
+    ``progress['last_key']`` al reanudar desde un checkpoint.
+    """
+    progress = progress if progress is not None else new_progress()
+    after = progress['last_key']
+    total_read = 0
+    seq = 0
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        offset = 0
-        total_read = 0
+        if snapshot_dir:
+            # Instantánea: solo se envían rangos de filas, cada worker lee sus
+            # emails del mmap compartido
+            num_rows = open_snapshot(snapshot_dir).num_rows
+            for start in range(after, num_rows, CHUNK_SIZE):
+                with tracing.span('backpressure', 'queue'):
+                    if not controller.acquire():
+                        break
+                stop = min(start + CHUNK_SIZE, num_rows)
+                with tracing.span('queue.put', 'queue'):
+                    batch_queue.put((seq, stop, range(start, stop)))
+                seq += 1
+                tracing.queue_depth('batch_queue', batch_queue)
+            print(f"[Reader] Terminado. {num_rows - after} filas repartidas desde la instantánea")
+            progress['read_complete'] = not controller.closed
+            return
+        
+        conn = get_pool().acquire()
+        print(f"[Reader] Iniciando lectura de emails...")
         
-        # Crear pool de threads para procesar lotes
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-            print(f"[Reader] Iniciando lectura y procesamiento de emails...")
+        # Paginación por clave primaria: coste constante por lote; el tamaño de
+        # cada lote lo decide el controlador según el ritmo de las etapas
+        batches = iter_keyset_batches(conn, ('email',), controller.next_batch_size,
+                                      after_id=after, server_side=SERVER_SIDE_CURSOR)
+        t_fetch = time.perf_counter()
+        for rows in tracing.iter_spans(batches, 'read.batch'):
+            if controller.closed:
+                break
+            controller.record_fetch(len(rows), time.perf_counter() - t_fetch)
             
-            while True:
-                cur.execute(
-                    "SELECT email FROM customers LIMIT %s OFFSET %s",
-                    (BATCH_SIZE, offset)
-                )
-                rows = cur.fetchall()
-                if not rows:
-                    break
-                
-                # Extraer emails del resultado
-                batch = [email[0] for email in rows if email[0]]
-                
-                # Procesar el lote y obtener resultados
-                counts = process_batch(batch)
-                result_queue.put(counts)
-                
+            # acquire() bloquea si los workers van por detrás (contrapresión),
+            # mientras tanto ellos siguen hasheando los sub-lotes en vuelo
+            for i in range(0, len(rows), CHUNK_SIZE):
+                chunk = rows[i:i + CHUNK_SIZE]
+                with tracing.span('backpressure', 'queue'):
+                    if not controller.acquire():
+                        break
+                batch = [email for _, email in chunk if email]
+                with tracing.span('queue.put', 'queue'):
+                    batch_queue.put((seq, chunk[-1][0], batch))
+                seq += 1
+                tracing.queue_depth('batch_queue', batch_queue)
                 total_read += len(batch)
-                offset += BATCH_SIZE
-                print(f"[Reader] Procesados {total_read} emails...")
             
-        cur.close()
-        conn.close()
+            print(f"[Reader] Leídos {total_read} emails (lote {len(rows)})...")
+            t_fetch = time.perf_counter()
         
-        print(f"[Reader] Terminado. Total emails procesados: {total_read}")
-        result_queue.put(None)  # Señal de fin
+        conn.close()
+        progress['read_complete'] = not controller.closed
+        print(f"[Reader] Terminado. Total emails leídos: {total_read}")
         
     except Exception as e:
         print(f"[Reader] Error: {e}")
-        result_queue.put(None)
     finally:
-        finished_event.set()
+        progress['issued'] = seq
+        # Una señal de fin por cada worker
+        for _ in range(num_workers):
+            batch_queue.put(None)
+
+def hash_worker(batch_queue, result_queue, cache_path=None, snapshot_dir=None):
+    """Etapa 2: proceso que hashea sub-lotes y envía sus conteos al collector"""
+    name = multiprocessing.current_process().name
+    cache = None
+    try:
+        # Cada proceso abre su propio mmap sobre el fichero de caché compartido
+        if cache_path:
+            cache = HashCache(cache_path)
+        while True:
+            with tracing.span('queue.get', 'queue'):
+                item = batch_queue.get()
+            if item is None:
+                break
+            seq, last_key, batch = item
+            try:
+                if isinstance(batch, range):
+                    with tracing.span('snapshot.read', 'io'):
+                        batch = open_snapshot(snapshot_dir).strings('email', batch.start,
+                                                                    batch.stop)
+                with tracing.span('hash', 'cpu', emails=len(batch)):
+                    buckets = process_batch(batch, cache)
+            except Exception as e:
+                print(f"[Worker {name}] Error en el sub-lote {seq}: {e}")
+                result_queue.put((seq, last_key, None))  # El collector detiene la ejecución
+                break
+            with tracing.span('queue.put', 'queue'):
+                result_queue.put((seq, last_key, buckets))
+    except Exception as e:
+        print(f"[Worker {name}] Error: {e}")
+    finally:
+        if cache is not None:
+            stats = cache.stats()
+            print(f"[Worker {name}] Caché: {stats['hits_lru'] + stats['hits_disk']} "
+                  f"aciertos, {stats['misses']} fallos")
+            cache.close()
+        tracing.flush()
+        result_queue.put(None)  # Señal de fin de este worker
+
+class PipelineIncomplete(RuntimeError):
+    pass
+
+def new_progress(totals=None, last_key=0):
+    """Estado compartido por reader, collector y checkpoints de una ejecución"""
+    return {'totals': list(totals) if totals else [0] * NUM_PARTITIONS,
+            'last_key': last_key, 'applied': 0, 'issued': None,
+            'read_complete': False, 'failed': False}
+
+def save_checkpoint(checkpoint, identity, progress, spill=None, finished=False):
+    """Checkpoint de lo aplicado hasta ``progress['last_key']`` (spill incluido)"""
+    with tracing.span('checkpoint', 'io'):
+        checkpoint.save(dict(identity, last_key=progress['last_key'],
+                             totals=progress['totals'],
+                             spill_sizes=spill.sync() if spill is not None else None,
+                             finished=finished))
 
-def collector(result_queue, finished_event):
-    """Recolecta y suma los resultados de todos los lotes"""
+def collector(result_queue, num_workers, controller, spill=None, progress=None,
+              checkpoint=None, identity=None, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """Etapa 3 (shuffle): cuenta y vuelca cada partición a su fichero de spill.
+
+    Los sub-lotes se aplican en orden de secuencia, de modo que los totales y
+    el spill cubren siempre exactamente las claves hasta
+    ``progress['last_key']`` y un checkpoint tomado en cualquier momento es
+    consistente. Los que llegan adelantados esperan en ``early`` sin liberar
+    su hueco de la ventana hasta aplicarse: un sub-lote lento detiene al
+    reader y ``early`` nunca pasa de la ventana.
+    """
     print(f"[Collector] Esperando resultados...")
     
-    totals = [0] * NUM_WORKERS
-    
-    while True:
-        counts = result_queue.get()
-        if counts is None:
-            break
-            
-        for i, count in enumerate(counts):
-            totals[i] += count
+    progress = progress if progress is not None else new_progress()
+    totals = progress['totals']
+    early = {}  # Sub-lotes recibidos antes que alguno anterior
+    pending = num_workers
+    last_save = time.monotonic()
     
+    while pending:
+        tracing.queue_depth('result_queue', result_queue)
+        with tracing.span('queue.get', 'queue'):
+            item = result_queue.get()
+        if item is None:
+            pending -= 1
+            continue
+        seq, last_key, buckets = item
+        if buckets is None:
+            # Un sub-lote falló: no se avanza más allá; el reader deja de leer
+            progress['failed'] = True
+            controller.close()
+            continue
+        if progress['failed']:
+            controller.release(sum(len(records) for records in buckets))
+            continue
+        early[seq] = (last_key, buckets)
+        while progress['applied'] in early:
+            last_key, buckets = early.pop(progress['applied'])
+            controller.release(sum(len(records) for records in buckets))
+            for i, records in enumerate(buckets):
+                totals[i] += len(records)
+            if spill is not None:
+                with tracing.span('spill.write', 'io'):
+                    spill.write_buckets(buckets)
+            progress['last_key'] = last_key
+            progress['applied'] += 1
+        if checkpoint is not None and time.monotonic() - last_save >= checkpoint_interval:
+            save_checkpoint(checkpoint, identity, progress, spill)
+            last_save = time.monotonic()
+    return totals
+
+def print_totals(totals, label="Pipeline-paralelo"):
     print(f"\n=== RESULTADOS FINALES ===")
-    print(f"[Pipeline-paralelo] Total registros = {sum(totals)}")
+    print(f"[{label}] Total registros = {sum(totals)}")
     for i, count in enumerate(totals):
-        print(f"  Worker {i}: {count} registros")
+        print(f"  Partición {i}: {count} registros")
     print("=" * 30)
-    
-    finished_event.set()
 
-if __name__ == '__main__':
-    print("Iniciando pipeline paralelo...")
-    print(f"Realizando {HASH_ITERATIONS} iteraciones de hash por email")
-    print(f"Usando {NUM_WORKERS} workers")
-    
-    result_queue = Queue()
-    reader_finished = Event()
-    collector_finished = Event()
+def run_pipeline(num_workers=NUM_WORKERS, queue_size=QUEUE_SIZE,
+                 cache_path=HASH_CACHE_PATH, spill_dir=SPILL_DIR, snapshot_dir=None,
+                 adaptive=True, min_batch=MIN_BATCH_SIZE, max_batch=MAX_BATCH_SIZE,
+                 checkpoint_path=None, resume=False, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """Lanza las tres etapas unidas por colas acotadas y espera a que terminen.
+
+    ``queue_size`` es el máximo de sub-lotes en vuelo; con ``adaptive`` el lote
+    de lectura (entre ``min_batch`` y ``max_batch``) y la ventana efectiva se
+    ajustan en ejecución, sin él se usan ``BATCH_SIZE`` y ``queue_size``.
+
+    Con ``checkpoint_path`` se guarda cada ``checkpoint_interval`` segundos la
+    última clave aplicada, los totales y el tamaño del spill; ``resume``
+    continúa desde ahí recortando el spill al checkpoint, así que cada email
+    se cuenta y se escribe exactamente una vez.
+    """
+    if snapshot_dir:
+        snapshot_dir = resolve_snapshot(snapshot_dir)  # Todos leen la misma versión
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    identity = {'source': get_backend().describe(DB_CONFIG), 'snapshot': snapshot_dir,
+                'partitions': NUM_PARTITIONS, 'iterations': HASH_ITERATIONS,
+                'spill_dir': spill_dir}
+    progress = new_progress()
+    state = checkpoint.load() if checkpoint is not None and resume else None
+    if resume and state is None:
+        print("[Checkpoint] No hay checkpoint previo: se empieza desde el principio")
+    if state is not None:
+        checkpoint.check_compatible(state, identity)
+        if state['finished']:
+            print(f"[Checkpoint] La ejecución del {state['saved_at']} ya había terminado")
+            print_totals(state['totals'])
+            return state['totals']
+        if spill_dir:
+            truncate_partitions(spill_dir, state['spill_sizes'])
+        progress = new_progress(state['totals'], state['last_key'])
+        print(f"[Checkpoint] Reanudando tras la clave {state['last_key']} "
+              f"({sum(state['totals'])} registros ya contados)")
+    if cache_path:
+        HashCache(cache_path).close()  # Crear el fichero antes de lanzar workers
     
-    t0 = time.time()
+    batch_queue = multiprocessing.Queue(maxsize=queue_size)
+    result_queue = multiprocessing.Queue(maxsize=queue_size)
     
-    # Iniciar threads
-    reader_thread = Thread(target=reader_and_processor, args=(result_queue, reader_finished))
-    collector_thread = Thread(target=collector, args=(result_queue, collector_finished))
+    workers = [
+        multiprocessing.Process(target=hash_worker,
+                                args=(batch_queue, result_queue, cache_path, snapshot_dir),
+                                name=f"hash-{i}")
+        for i in range(num_workers)
+    ]
+    for w in workers:
+        w.start()
     
+    controller = AdaptiveController(num_workers, min_batch, max_batch, queue_size,
+                                    adaptive=adaptive, batch_size=BATCH_SIZE)
+    reader_thread = Thread(target=reader,
+                           args=(batch_queue, num_workers, controller, snapshot_dir, progress))
     reader_thread.start()
-    collector_thread.start()
     
-    # Esperar a que terminen
+    spill = SpillWriter(spill_dir, reset=state is None) if spill_dir else None
+    finished = False
+    try:
+        collector(result_queue, num_workers, controller, spill, progress,
+                  checkpoint, identity, checkpoint_interval)
+        reader_thread.join()
+        finished = (progress['read_complete'] and not progress['failed']
+                    and progress['applied'] == progress['issued'])
+    finally:
+        controller.close()
+        if checkpoint is not None:
+            # También si se interrumpe: lo aplicado hasta aquí no se repite
+            save_checkpoint(checkpoint, identity, progress, spill, finished)
+        if spill is not None:
+            spill.close()
+    
     reader_thread.join()
-    collector_thread.join()
+    for w in workers:
+        w.join()
+    print(f"[Control] {controller.summary()}")
+    if not finished:
+        message = (f"Ejecución incompleta: {sum(progress['totals'])} registros "
+                   f"hasta la clave {progress['last_key']}")
+        if checkpoint is not None:
+            message += f"; reanudar con --resume (checkpoint en {checkpoint.path})"
+        raise PipelineIncomplete(message)
+    print_totals(progress['totals'])
+    return progress['totals']
+
+def hash_unit(data, cache_path=None):
+    """Unidad del modo multi-nodo: hashea los emails de un rango de ids o de filas"""
+    lo, hi = data['range']
+    if data['snapshot']:
+        emails = open_snapshot(data['snapshot']).strings('email', lo, hi)
+    else:
+        with get_pool().connection() as conn:
+            emails = [email for (email,) in conn.query(
+                "SELECT email FROM customers WHERE id > %s AND id <= %s", (lo, hi))]
+    cache = HashCache(cache_path) if cache_path else None
+    try:
+        buckets = process_batch(emails, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    # Sin spill basta con los conteos: no viajan los digests por la red
+    return buckets if data['records'] else [len(records) for records in buckets]
+
+def cluster_handlers(cache_path=HASH_CACHE_PATH):
+    return {'hash': partial(hash_unit, cache_path=cache_path)}
+
+def run_pipeline_cluster(address, local_workers=0, authkey=cluster.DEFAULT_AUTHKEY,
+                         heartbeat_timeout=cluster.HEARTBEAT_TIMEOUT,
+                         cache_path=HASH_CACHE_PATH, spill_dir=SPILL_DIR, snapshot_dir=None):
+    """Coordinador: reparte rangos de ids entre workers remotos y hace el shuffle.
+
+    Los workers leen y hashean su rango; el coordinador cuenta y escribe el
+    spill con el primer resultado de cada unidad.
+    """
+    if snapshot_dir:
+        # Los workers deben ver la instantánea en la misma ruta (disco compartido)
+        snapshot_dir = resolve_snapshot(snapshot_dir)
+        num_rows = open_snapshot(snapshot_dir).num_rows
+        ranges = [(lo, min(lo + CLUSTER_UNIT_ROWS, num_rows))
+                  for lo in range(0, num_rows, CLUSTER_UNIT_ROWS)]
+    else:
+        with get_pool().connection() as conn:
+            max_id = conn.query_one("SELECT MAX(id) FROM customers")[0] or 0
+        ranges = id_ranges(0, max_id, -(-max_id // CLUSTER_UNIT_ROWS), min_rows=1)
+    if cache_path and local_workers:
+        HashCache(cache_path).close()  # Crear el fichero antes de lanzar workers
+    units = [('hash', {'range': r, 'snapshot': snapshot_dir, 'records': spill_dir is not None})
+             for r in ranges]
+
+    totals = [0] * NUM_PARTITIONS
+    spill = SpillWriter(spill_dir) if spill_dir else None
+
+    def on_result(unit, result):
+        for i, records in enumerate(result):
+            totals[i] += len(records) if spill is not None else records
+        if spill is not None:
+            with tracing.span('spill.write', 'io'):
+                spill.write_buckets(result)
+
+    try:
+        status = cluster.run_coordinator(units, on_result, address,
+                                         cluster_handlers(cache_path), local_workers,
+                                         authkey, heartbeat_timeout)
+    finally:
+        if spill is not None:
+            spill.close()
+
+    print_totals(totals, "Pipeline-multinodo")
+    print(f"[Coordinador] {cluster.describe_status(status)}")
+    return totals
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pipeline paralelo de hashing de emails")
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS,
+                        help="procesos de hashing (por defecto: número de CPUs)")
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help="sub-lotes máximos en vuelo entre etapas")
+    parser.add_argument('--min-batch', type=int, default=MIN_BATCH_SIZE,
+                        help="lote de lectura mínimo del control adaptativo")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE,
+                        help="lote de lectura máximo del control adaptativo")
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help=f"lote fijo de {BATCH_SIZE} y ventana igual a --queue-size")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="no usar la caché persistente de hashes")
+    parser.add_argument('--spill-dir', default=SPILL_DIR,
+                        help="directorio de los ficheros de cada partición")
+    parser.add_argument('--no-spill', action='store_true',
+                        help="solo contar registros por partición, sin escribirlos")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="leer los emails de la instantánea columnar en lugar de la BD")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, metavar='FICHERO',
+                        help="fichero de checkpoint (última clave, totales y tamaño del spill)")
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL,
+                        help="segundos entre checkpoints")
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help="no guardar checkpoints")
+    parser.add_argument('--resume', action='store_true',
+                        help="continuar desde el último checkpoint en lugar de empezar de cero")
+    cluster.add_cluster_arguments(parser)
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    cluster.check_cluster_arguments(parser, args)
+    configure_backend(args)
+    tracing.start_from_args(args)
+    cache_path = None if args.no_cache else HASH_CACHE_PATH
+
+    if args.worker:
+        cluster.run_worker(cluster.parse_address(args.worker), cluster_handlers(cache_path),
+                           args.authkey)
+        raise SystemExit(0)
+    if args.coordinator:
+        print("Iniciando pipeline multi-nodo...")
+        t0 = time.perf_counter()
+        run_pipeline_cluster(cluster.parse_address(args.coordinator),
+                             args.local_workers, args.authkey, args.heartbeat_timeout,
+                             cache_path, None if args.no_spill else args.spill_dir,
+                             args.snapshot)
+        print(f"\nTiempo total (Pipeline-multinodo): {time.perf_counter() - t0:.2f} segundos")
+        tracing.finish_from_args(args)
+        raise SystemExit(0)
     
-    tiempo_total = time.time() - t0
-    print(f"\nTiempo total (Pipeline-paralelo): {tiempo_total:.2f} segundos")
\ No newline at end of file
+    print("Iniciando pipeline paralelo...")
+    print(f"Realizando {HASH_ITERATIONS} iteraciones de hash por email")
+    print(f"Usando {args.workers} workers")
+    
+    t0 = time.perf_counter()
+    if args.resume and args.no_checkpoint:
+        parser.error("--resume necesita checkpoints")
+    try:
+        run_pipeline(args.workers, args.queue_size, cache_path,
+                     None if args.no_spill else args.spill_dir, args.snapshot,
+                     not args.no_adaptive, args.min_batch, args.max_batch,
+                     None if args.no_checkpoint else args.checkpoint, args.resume,
+                     args.checkpoint_interval)
+    except (PipelineIncomplete, CheckpointError) as e:
+        print(f"\n[Pipeline-paralelo] {e}")
+        tracing.finish_from_args(args)
+        raise SystemExit(1)
+    tiempo_total = time.perf_counter() - t0
+    print(f"\nTiempo total (Pipeline-paralelo): {tiempo_total:.2f} segundos")
+    tracing.finish_from_args(args)
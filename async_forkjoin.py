@@ -0,0 +1,157 @@
+"""Fork-Join con asyncio para consultas por clave limitadas por E/S.
+
+En lugar de un hilo del sistema por tarea, cada clave es una corrutina; un
+``asyncio.Semaphore`` limita cuántas consultas hay en curso a la vez y cada
+tarea tiene su propio timeout. ``fork_join_stream`` entrega los resultados
+según van terminando, de modo que miles de claves no necesitan miles de
+hilos ni esperar a la más lenta para empezar a consumir.
+
+Pools asíncronos:
+
+- ``AioMySQLPool``: pool nativo de ``aiomysql`` (dependencia opcional).
+- ``ThreadedAsyncPool``: sustituto local para cualquier motor de
+  ``database`` (SQLite embebido, o MySQL sin ``aiomysql``). Ejecuta cada
+  consulta bloqueante en un ejecutor con tantos hilos como conexiones, así
+  que el número de hilos lo fija el tamaño del pool y no el de claves.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from database import ConnectionPool, DB_CONFIG, get_backend
+
+try:
+    import aiomysql
+except ImportError:  # Solo el pool sustituto
+    aiomysql = None
+
+DEFAULT_CONCURRENCY = 64  # Tareas en curso a la vez
+DEFAULT_POOL_SIZE = 16  # Conexiones (y hilos del sustituto) como máximo
+DEFAULT_TASK_TIMEOUT = 30.0  # Segundos por tarea (None: sin límite)
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+class AioMySQLPool:
+    """Pool de ``aiomysql``; se crea dentro del bucle de eventos con ``open()``"""
+
+    def __init__(self, size, **config):
+        self.size = size
+        self.config = config or dict(DB_CONFIG)
+        self._pool = None
+
+    async def open(self):
+        config = dict(self.config)
+        config['db'] = config.pop('database', None)
+        self._pool = await aiomysql.create_pool(minsize=1, maxsize=self.size, **config)
+        return self
+
+    async def query(self, sql, params=()):
+        async with self._pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+
+    async def close(self):
+        self._pool.close()
+        await self._pool.wait_closed()
+
+    def describe(self):
+        return f"aiomysql ({self.size} conexiones)"
+
+    def print_stats(self):
+        print(f"[Pool asíncrono] aiomysql, {self.size} conexiones como máximo")
+
+
+class ThreadedAsyncPool:
+    """Pool asíncrono sobre un ``ConnectionPool`` síncrono y ``size`` hilos"""
+
+    def __init__(self, size, backend=None, **config):
+        self.size = size
+        self._sync_pool = ConnectionPool(size, backend, **(config or DB_CONFIG))
+        self._executor = None
+
+    async def open(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.size,
+                                            thread_name_prefix='async-db')
+        return self
+
+    def _query(self, sql, params):
+        with self._sync_pool.connection() as conn:
+            return conn.query(sql, params)
+
+    async def query(self, sql, params=()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._query, sql, params)
+
+    async def close(self):
+        # Las consultas abandonadas por timeout terminan antes de cerrar
+        self._executor.shutdown(wait=True)
+        self._sync_pool.close()
+
+    def describe(self):
+        return f"{self._sync_pool.backend.name} con {self.size} hilos (sustituto asíncrono)"
+
+    def print_stats(self):
+        self._sync_pool.print_stats("Pool asíncrono")
+
+
+def create_async_pool(size):
+    """``aiomysql`` si el motor es MySQL y está instalado; si no, el sustituto"""
+    backend = get_backend()
+    if backend.name == 'mysql' and aiomysql is not None:
+        return AioMySQLPool(size, **DB_CONFIG)
+    return ThreadedAsyncPool(size, backend, **DB_CONFIG)
+
+
+async def _run_task(semaphore, task, key, timeout):
+    """Fork de una clave: espera turno en el semáforo y aplica el timeout"""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(task(key), timeout)
+            return key, result, None
+        except asyncio.TimeoutError:
+            return key, None, TaskTimeout(f"{key!r}: más de {timeout}s")
+        except Exception as e:
+            return key, None, e
+        finally:
+            tracing.add_span('task', start, time.perf_counter(), 'task')
+
+
+async def fork_join_stream(keys, task, concurrency=DEFAULT_CONCURRENCY,
+                           timeout=DEFAULT_TASK_TIMEOUT):
+    """Genera ``(clave, resultado, error)`` según terminan las tareas ``task(clave)``.
+
+    Un error o timeout de una clave no cancela el resto: se entrega con
+    ``resultado=None`` y la excepción en ``error``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = [asyncio.create_task(_run_task(semaphore, task, key, timeout)) for key in keys]
+    try:
+        for finished in asyncio.as_completed(pending):
+            yield await finished
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+async def fork_join_async(keys, task, concurrency=DEFAULT_CONCURRENCY,
+                          timeout=DEFAULT_TASK_TIMEOUT, on_result=None):
+    """Join completo: ``({clave: resultado}, {clave: error})``.
+
+    ``on_result(clave, resultado)`` se llama en cuanto llega cada resultado.
+    """
+    resultados = {}
+    errores = {}
+    async for key, result, error in fork_join_stream(keys, task, concurrency, timeout):
+        if error is not None:
+            errores[key] = error
+            continue
+        resultados[key] = result
+        if on_result is not None:
+            on_result(key, result)
+    return resultados, errores
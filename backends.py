@@ -0,0 +1,221 @@
+"""Motores de base de datos intercambiables para todos los scripts.
+
+- ``MySQLBackend``: ``mysql.connector`` contra el servidor de ``DB_CONFIG``.
+- ``SQLiteBackend``: SQLite embebido sobre un fichero local (por defecto
+  ``<database>.db``) en modo WAL, sin servidor. Permite ejecutar y medir los
+  patrones sin conexión y sin el ruido de la configuración de MySQL.
+
+La conexión SQLite imita la parte de la API de ``mysql.connector`` que usa el
+proyecto (``cursor(prepared=...)``, ``cursor(buffered=...)``,
+``consume_results``, ``with_rows``, parámetros ``%s``) y traduce las pocas
+construcciones propias de MySQL: ``YEAR``/``MONTH``, ``MOD`` y
+``AUTO_INCREMENT``. ``LOAD DATA LOCAL INFILE`` no tiene equivalente.
+"""
+import re
+import sqlite3
+import unicodedata
+from datetime import date, datetime
+
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:  # Solo el motor SQLite
+    mysql = None
+
+    class Error(Exception):
+        pass
+
+BACKENDS = ('mysql', 'sqlite')
+DEFAULT_BACKEND = 'mysql'
+SQLITE_BUSY_TIMEOUT = 30  # Segundos de espera si otro escritor tiene el bloqueo
+
+# Mismo formato que devuelve MySQL: DATE <-> datetime.date
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(' '))
+sqlite3.register_converter('DATE', lambda b: date.fromisoformat(b.decode()))
+
+_SQLITE_REWRITES = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.I),
+     'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\bYEAR\(([^()]*)\)', re.I), r"CAST(strftime('%Y', \1) AS INTEGER)"),
+    (re.compile(r'\bMONTH\(([^()]*)\)', re.I), r"CAST(strftime('%m', \1) AS INTEGER)"),
+    (re.compile(r'\bMOD\(([^(),]*),([^()]*)\)', re.I), r'((\1) % (\2))'),
+]
+
+
+def translate_sqlite(sql, _cache={}):
+    """SQL con sintaxis de MySQL -> SQLite (memorizado por sentencia)"""
+    translated = _cache.get(sql)
+    if translated is None:
+        translated = sql
+        for pattern, replacement in _SQLITE_REWRITES:
+            translated = pattern.sub(replacement, translated)
+        _cache[sql] = translated
+    return translated
+
+
+class SQLiteCursor:
+    """Cursor SQLite con la interfaz que el proyecto usa de ``mysql.connector``"""
+
+    def __init__(self, raw):
+        self._cur = raw
+
+    def execute(self, sql, params=()):
+        try:
+            self._cur.execute(translate_sqlite(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+
+    def executemany(self, sql, seq_params):
+        try:
+            self._cur.executemany(translate_sqlite(sql), seq_params)
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cur.fetchmany(size)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    @property
+    def with_rows(self):
+        return self._cur.description is not None
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path, wal=True, autocommit=False):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT,
+                                     detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False,
+                                     isolation_level=None if autocommit else '')
+        if wal:
+            # WAL: los lectores no bloquean al escritor ni al revés
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def cursor(self, prepared=False, buffered=True, **kwargs):
+        # sqlite3 ya cachea las sentencias compiladas y lee las filas bajo
+        # demanda: prepared/buffered no cambian nada
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+def accent_case_key(text):
+    """Clave de comparación aproximada de las collations ``_ai_ci`` de MySQL.
+
+    ``utf8mb4_general_ci``/``utf8mb4_0900_ai_ci`` (las de XAMPP y MySQL 8 por
+    defecto) tratan 'París', 'paris' y 'Paris' como el mismo valor; también se
+    ignoran los espacios finales. No reproduce expansiones como 'ß' = 'ss'.
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold().rstrip(' ')
+
+
+class MySQLBackend:
+    name = 'mysql'
+    supports_load_infile = True
+
+    def __init__(self):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python no está instalado (usar --backend sqlite)")
+
+    def connect(self, config):
+        return mysql.connector.connect(**config)
+
+    def index_columns(self, cursor, table):
+        """``{nombre_índice: [columnas en orden]}``"""
+        cursor.execute(f"SHOW INDEX FROM {table}")
+        existing = {}
+        for row in cursor.fetchall():
+            key_name, seq, column = row[2], row[3], row[4]
+            existing.setdefault(key_name, []).append((seq, column.lower()))
+        return {name: [col for _, col in sorted(cols)] for name, cols in existing.items()}
+
+    def trigger_names(self, cursor, table):
+        cursor.execute(f"SHOW TRIGGERS LIKE '{table}'")
+        return [row[0] for row in cursor.fetchall()]
+
+    def describe(self, config):
+        return f"MySQL {config.get('host')}/{config.get('database')}"
+
+    @staticmethod
+    def text_key(text):
+        """Valor con el que ``=``/``DISTINCT`` comparan un texto en este motor"""
+        return accent_case_key(text)
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    supports_load_infile = False
+
+    def __init__(self, path=None, wal=True):
+        """``path=None``: un fichero ``<database>.db`` por base de datos configurada"""
+        self.path = path
+        self.wal = wal
+
+    def path_for(self, config):
+        return self.path or f"{config.get('database') or 'sumaparalela'}.db"
+
+    def connect(self, config):
+        return SQLiteConnection(self.path_for(config), self.wal,
+                                autocommit=config.get('autocommit', False))
+
+    def index_columns(self, cursor, table):
+        cursor.execute(f"PRAGMA table_info({table})")
+        primary = [row[1].lower() for row in sorted(cursor.fetchall(), key=lambda r: r[5])
+                   if row[5]]
+        existing = {'PRIMARY': primary} if primary else {}
+        cursor.execute(f"PRAGMA index_list({table})")
+        for name in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"PRAGMA index_info({name})")
+            existing[name] = [row[2].lower() for row in sorted(cursor.fetchall())]
+        return existing
+
+    def trigger_names(self, cursor, table):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                       (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def describe(self, config):
+        return f"SQLite {self.path_for(config)}{' (WAL)' if self.wal else ''}"
+
+    @staticmethod
+    def text_key(text):
+        return text  # Collation BINARY: distingue mayúsculas y acentos
+
+
+def create_backend(name=DEFAULT_BACKEND, **options):
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(**options)
+    raise ValueError(f"Motor desconocido: {name}")
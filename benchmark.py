@@ -0,0 +1,382 @@
+"""Banco de pruebas común para las parejas serial/paralelo de los tres patrones.
+
+Para cada patrón (Pipeline, Fork-Join, BSP), base de datos (tamaño de datos) y
+número de workers se mide la versión serial y la paralela:
+
+- Cada medición se ejecuta en un proceso hijo nuevo, de modo que el pico de
+  memoria (RSS del proceso y de sus workers) no se mezcla entre mediciones.
+- Se usa ``time.perf_counter``, con ejecuciones de calentamiento que no se
+  cuentan y varias repeticiones medidas (se informa la mediana).
+- Las versiones seriales usan las mismas particiones que las paralelas
+  (BSP: ``--partitions`` igual a ``--workers``) y Fork-Join el mismo plan
+  (``--plan``, fijo en ambas) para que la comparación sea del mismo trabajo.
+- La caché persistente de hashes del Pipeline se desactiva: si no, la
+  segunda versión medida leería los hashes calculados por la primera.
+- ``db_time_s`` es el tiempo dentro de llamadas a la base de datos sumado
+  entre todos los workers y ``db_share`` su fracción sobre el tiempo total de
+  los workers (``mediana * workers``; ``mediana`` en las seriales, que usan un
+  solo hilo): el resto es tiempo del cliente.
+
+El tamaño de datos se varía con ``--databases``: bases con la misma tabla
+``customers`` cargada con distintos números de filas (``insert-data.py``);
+con ``--backend sqlite`` cada una es el fichero ``<database>.db``. Con
+``--snapshot`` los patrones leen la instantánea columnar (``snapshot.py``) en
+lugar de la BD; la ruta admite ``{database}`` para usar una por base.
+Los resultados se guardan en JSON y CSV en ``--output-dir`` y con
+``--baseline`` se comparan con un JSON anterior para detectar regresiones.
+"""
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from snapshot import open_snapshot, resolve_snapshot
+from forkjoin_planner import PLAN_FANOUT, PLAN_GROUPED
+from database import (DB_CONFIG, get_pool, configure_pool, db_time, get_backend,
+                      add_backend_arguments, configure_backend)
+
+PATTERNS = ('pipeline', 'forkjoin', 'bsp')
+MODES = ('serial', 'paralelo')
+DEFAULT_WARMUPS = 1
+DEFAULT_REPETITIONS = 3
+DEFAULT_OUTPUT_DIR = 'benchmarks'
+DEFAULT_MONTHS = 12
+REGRESSION_THRESHOLD = 0.10  # Mediana un 10 % más lenta que la referencia
+
+CSV_FIELDS = ['pattern', 'mode', 'database', 'workers', 'rows', 'warmups', 'repetitions',
+              'median_s', 'min_s', 'mean_s', 'stdev_s', 'rows_per_s', 'peak_rss_mb',
+              'speedup', 'efficiency', 'db_time_s', 'db_share', 'backend', 'error']
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(filename):
+    """Importa uno de los scripts del proyecto (sus nombres llevan guiones)"""
+    name = os.path.splitext(filename)[0].replace('-', '_').replace('–', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(_HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    # Registrado para que los workers puedan deserializar sus funciones y clases
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _count_customers():
+    with get_pool().connection() as conn:
+        return conn.query_one("SELECT COUNT(*) FROM customers")[0]
+
+
+# Cada carga de trabajo prepara lo que no se mide y devuelve ``(run, close)``;
+# ``run()`` ejecuta una vez el trabajo medido y devuelve las filas procesadas.
+
+def _pipeline_serial(workers, scratch, options):
+    mod = load_script('sin-Pipeline-Hash.py')
+    spill_dir = os.path.join(scratch, 'spill') if options['spill'] else None
+
+    def run():
+        _, total = mod.serial_pipeline_hash(use_cache=False, spill_dir=spill_dir,
+                                            snapshot_dir=options['snapshot'])
+        return total
+    return run, None
+
+
+def _pipeline_parallel(workers, scratch, options):
+    mod = load_script('Pipeline-Hash.py')
+    spill_dir = os.path.join(scratch, 'spill') if options['spill'] else None
+
+    def run():
+        return sum(mod.run_pipeline(workers, workers * 4, None, spill_dir,
+                                    options['snapshot']))
+    return run, None
+
+
+def _forkjoin_serial(workers, scratch, options):
+    mod = load_script('sin-Fork–Join.py')
+    if options['snapshot']:
+        rows = open_snapshot(options['snapshot']).num_rows
+
+        def run():
+            mod.contar_ciudades_snapshot(options['snapshot'])
+            return rows
+        return run, None
+
+    configure_pool(0)
+    rows = _count_customers()
+    # Mismo plan que la versión paralela: si no, el speedup compararía consultas distintas
+    contar = (mod.contar_ciudades_agrupado if options['plan'] == PLAN_GROUPED
+              else mod.contar_ciudades_serial)
+
+    def run():
+        contar()
+        return rows
+    return run, None
+
+
+def _forkjoin_parallel(workers, scratch, options):
+    mod = load_script('Fork–Join.py')
+    if options['snapshot']:
+        rows = open_snapshot(options['snapshot']).num_rows
+
+        def run():
+            mod.fork_join_snapshot(workers, options['snapshot'])
+            return rows
+        return run, None
+
+    rows = _count_customers()
+
+    def run():
+        mod.fork_join_exacto(options['plan'], workers)
+        return rows
+    return run, None
+
+
+def _bsp_serial(workers, scratch, options):
+    mod = load_script('sin-BSP-style.py')
+    window, fechas = mod.generate_balanced_ranges(workers, options['months'],
+                                                  options['snapshot'])
+    if not fechas:
+        raise RuntimeError("No hay datos en la tabla customers")
+
+    def run():
+        _, filas = mod.conteo_serial(fechas, window, options['snapshot'])
+        return sum(f['registros'] for f in filas)
+    return run, None
+
+
+def _bsp_parallel(workers, scratch, options):
+    mod = load_script('BSP-style.py')
+    from bsp_runtime import BSPEngine
+    window, fechas = mod.generate_balanced_ranges(workers, options['months'],
+                                                  options['snapshot'])
+    if not fechas:
+        raise RuntimeError("No hay datos en la tabla customers")
+    # El pool BSP es persistente: se crea fuera de la medición, como en BSP-style.py
+    engine = BSPEngine(len(fechas), slot_size=mod.MESSAGE_SLOT_SIZE)
+
+    def run():
+        program = mod.WindowedMetricsProgram(fechas, window, snapshot_dir=options['snapshot'])
+        return sum(f['registros'] for f in mod.collect_rows(engine.run(program, fechas)))
+    return run, engine.close
+
+
+WORKLOADS = {
+    ('pipeline', 'serial'): _pipeline_serial,
+    ('pipeline', 'paralelo'): _pipeline_parallel,
+    ('forkjoin', 'serial'): _forkjoin_serial,
+    ('forkjoin', 'paralelo'): _forkjoin_parallel,
+    ('bsp', 'serial'): _bsp_serial,
+    ('bsp', 'paralelo'): _bsp_parallel,
+}
+
+
+def _peak_rss_mb():
+    """Pico de RSS de este proceso y de sus hijos ya terminados (KB en Linux)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def _measure(pattern, mode, database, workers, warmups, repetitions, options, conn):
+    """Cuerpo del proceso hijo: prepara, calienta, mide y envía el resultado"""
+    DB_CONFIG['database'] = database
+    if options['snapshot']:
+        options = dict(options, snapshot=resolve_snapshot(
+            options['snapshot'].format(database=database)))
+    scratch = tempfile.mkdtemp(prefix='bench-')
+    result = {'times': [], 'db_times': [], 'rows': None, 'error': None}
+    close = None
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            run, close = WORKLOADS[pattern, mode](workers, scratch, options)
+            for _ in range(warmups):
+                run()
+            for _ in range(repetitions):
+                t0, db0 = time.perf_counter(), db_time()
+                rows = run()
+                result['times'].append(time.perf_counter() - t0)
+                result['db_times'].append(db_time() - db0)
+                result['rows'] = rows
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if close is not None:
+            close()
+        shutil.rmtree(scratch, ignore_errors=True)
+        get_pool().close()
+    result['peak_rss_mb'] = _peak_rss_mb()
+    conn.send(result)
+    conn.close()
+
+
+def measure(pattern, mode, database, workers, warmups=DEFAULT_WARMUPS,
+            repetitions=DEFAULT_REPETITIONS, options=None):
+    """Mide una combinación en un proceso hijo y devuelve su fila de resultados"""
+    options = {'spill': True, 'plan': PLAN_FANOUT, 'months': DEFAULT_MONTHS, 'snapshot': None,
+               **(options or {})}
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(
+        target=_measure, name=f"bench-{pattern}-{mode}",
+        args=(pattern, mode, database, workers, warmups, repetitions, options, child_conn))
+    proc.start()
+    child_conn.close()
+    try:
+        raw = parent_conn.recv()
+    except EOFError:
+        raw = {'times': [], 'db_times': [], 'rows': None, 'peak_rss_mb': None,
+               'error': "el proceso de medición terminó sin resultado"}
+    proc.join()
+
+    times = raw['times']
+    row = {
+        'pattern': pattern, 'mode': mode, 'database': database, 'workers': workers,
+        'rows': raw['rows'], 'warmups': warmups, 'repetitions': repetitions,
+        'times_s': times,
+        'median_s': statistics.median(times) if times else None,
+        'min_s': min(times) if times else None,
+        'mean_s': statistics.mean(times) if times else None,
+        'stdev_s': statistics.stdev(times) if len(times) > 1 else 0.0 if times else None,
+        'peak_rss_mb': raw['peak_rss_mb'],
+        'speedup': None, 'efficiency': None,
+        'db_time_s': statistics.median(raw['db_times']) if raw['db_times'] else None,
+        'backend': get_backend().name,
+        'error': raw['error'],
+    }
+    # Las versiones seriales corren en un solo hilo aunque ``workers`` sea su
+    # número de particiones (BSP)
+    threads = 1 if mode == 'serial' else workers
+    row['db_share'] = (row['db_time_s'] / (row['median_s'] * threads)
+                       if row['db_time_s'] is not None and row['median_s'] else None)
+    row['rows_per_s'] = (row['rows'] / row['median_s']
+                         if row['rows'] is not None and row['median_s'] else None)
+    return row
+
+
+def run_suite(patterns, databases, worker_counts, warmups, repetitions, options):
+    """Barrido completo; devuelve la lista de filas (serial y paralelo)"""
+    results = []
+    for database in databases:
+        for pattern in patterns:
+            serial_cache = {}
+            for workers in worker_counts:
+                # Solo la versión serial de BSP depende del número de particiones
+                key = workers if pattern == 'bsp' else 1
+                if key not in serial_cache:
+                    print(f"[{database}] {pattern} serial (particiones={key})...", flush=True)
+                    serial_cache[key] = measure(pattern, 'serial', database, key,
+                                                warmups, repetitions, options)
+                    results.append(serial_cache[key])
+                serial = serial_cache[key]
+
+                print(f"[{database}] {pattern} paralelo (workers={workers})...", flush=True)
+                row = measure(pattern, 'paralelo', database, workers,
+                              warmups, repetitions, options)
+                if row['median_s'] and serial['median_s']:
+                    row['speedup'] = serial['median_s'] / row['median_s']
+                    row['efficiency'] = row['speedup'] / workers
+                results.append(row)
+    return results
+
+
+def print_summary(results):
+    print(f"\n{'patrón':9} {'modo':9} {'base de datos':15} {'workers':>7} {'filas':>9} "
+          f"{'mediana':>9} {'filas/s':>11} {'speedup':>8} {'eficiencia':>10} {'RSS MB':>8} "
+          f"{'% en BD':>7}")
+    for r in results:
+        if r['error']:
+            print(f"{r['pattern']:9} {r['mode']:9} {r['database']:15} {r['workers']:7d} "
+                  f"ERROR: {r['error']}")
+            continue
+        speedup = f"{r['speedup']:.2f}x" if r['speedup'] is not None else "-"
+        efficiency = f"{r['efficiency']:.0%}" if r['efficiency'] is not None else "-"
+        db_share = f"{r['db_share']:.0%}" if r['db_share'] is not None else "-"
+        print(f"{r['pattern']:9} {r['mode']:9} {r['database']:15} {r['workers']:7d} "
+              f"{r['rows']:9d} {r['median_s']:8.3f}s {r['rows_per_s']:11.0f} "
+              f"{speedup:>8} {efficiency:>10} {r['peak_rss_mb']:8.1f} {db_share:>7}")
+
+
+def write_results(results, output_dir, config):
+    """Guarda ``bench-<fecha>.json`` (con los tiempos de cada repetición) y ``.csv``"""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    json_path = os.path.join(output_dir, f"bench-{stamp}.json")
+    csv_path = os.path.join(output_dir, f"bench-{stamp}.csv")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'created': stamp, 'config': config, 'results': results}, f, indent=2)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+    return json_path, csv_path
+
+
+def compare_with_baseline(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Compara las medianas con un JSON anterior; devuelve las regresiones"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    key = lambda r: (r.get('backend'), r['pattern'], r['mode'], r['database'], r['workers'])
+    previous = {key(r): r for r in baseline if r.get('median_s')}
+
+    regressions = []
+    print(f"\nComparación con {baseline_path}:")
+    for r in results:
+        old = previous.get(key(r))
+        if old is None or not r['median_s']:
+            continue
+        change = r['median_s'] / old['median_s'] - 1
+        marker = "  <-- REGRESIÓN" if change > threshold else ""
+        print(f"  {r['pattern']:9} {r['mode']:9} {r['database']:15} w={r['workers']:<3d} "
+              f"{old['median_s']:.3f}s -> {r['median_s']:.3f}s ({change:+.1%}){marker}")
+        if marker:
+            regressions.append(r)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark serial vs paralelo de los patrones")
+    parser.add_argument('--patterns', nargs='+', choices=PATTERNS, default=list(PATTERNS))
+    parser.add_argument('--workers', nargs='+', type=int,
+                        default=sorted({1, 2, 4, multiprocessing.cpu_count()}),
+                        help="números de workers a barrer")
+    parser.add_argument('--databases', nargs='+', default=[DB_CONFIG['database']],
+                        help="bases de datos con distinto volumen de customers")
+    parser.add_argument('--warmups', type=int, default=DEFAULT_WARMUPS)
+    parser.add_argument('--repetitions', type=int, default=DEFAULT_REPETITIONS)
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS,
+                        help="ventana de meses del patrón BSP")
+    parser.add_argument('--plan', choices=(PLAN_FANOUT, PLAN_GROUPED), default=PLAN_FANOUT,
+                        help="plan exacto de Fork-Join, el mismo en la versión serial y la "
+                             "paralela (auto no: elegiría según el número de workers)")
+    parser.add_argument('--no-spill', action='store_true',
+                        help="Pipeline sin escribir los ficheros de cada partición")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="leer la instantánea columnar en lugar de la BD "
+                             "(admite {database})")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--baseline', help="JSON de una ejecución anterior con el que comparar")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+
+    options = {'spill': not args.no_spill, 'plan': args.plan, 'months': args.months,
+               'snapshot': args.snapshot}
+    results = run_suite(args.patterns, args.databases, args.workers,
+                        args.warmups, args.repetitions, options)
+    print_summary(results)
+
+    config = dict(vars(args), cpu_count=multiprocessing.cpu_count())
+    json_path, csv_path = write_results(results, args.output_dir, config)
+    print(f"\nResultados guardados en {json_path} y {csv_path}")
+
+    if args.baseline and compare_with_baseline(results, args.baseline):
+        raise SystemExit(1)
@@ -0,0 +1,218 @@
+"""Motor BSP (Bulk Synchronous Parallel) reutilizable.
+
+- Un pool de procesos persistente ejecuta programas BSP sucesivos sin volver a
+  crear un ``Process`` por partición en cada ejecución.
+- Cada superpaso tiene tres fases: cómputo local, intercambio de mensajes y
+  barrera. Los mensajes se escriben en un bloque de ``shared_memory`` con un
+  buzón por par (origen, destino) y doble buffer según la paridad del
+  superpaso, por lo que basta una barrera por superpaso.
+- Se mide, por superpaso y por worker, el tiempo de cómputo, de comunicación y
+  de espera en la barrera (también como spans ``bsp.*`` si ``tracing`` está
+  activo).
+
+Un programa BSP es una subclase de ``BSPProgram`` definida a nivel de módulo
+(para poder enviarse a los workers) que implementa ``setup``, ``superstep`` y
+``result``.
+"""
+import multiprocessing
+import pickle
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import tracing
+
+DEFAULT_SLOT_SIZE = 64 * 1024  # Bytes por buzón (origen, destino)
+
+_LEN = struct.Struct('<Q')
+
+
+class BSPProgram:
+    """Programa BSP: el estado de cada partición vive en su worker entre superpasos"""
+    num_supersteps = 1
+
+    def setup(self, pid, data):
+        """Estado inicial de la partición ``pid`` a partir de su entrada"""
+        return data
+
+    def superstep(self, step, pid, state, inbox, send):
+        """Cómputo local de un superpaso.
+
+        ``inbox`` es la lista de ``(pid_origen, mensaje)`` recibidos en el
+        superpaso anterior y ``send(pid_destino, mensaje)`` envía mensajes que
+        se entregarán en el siguiente. Devuelve el nuevo estado.
+        """
+        return state
+
+    def result(self, pid, state):
+        """Valor final que se devuelve al proceso principal"""
+        return state
+
+
+class BSPError(RuntimeError):
+    pass
+
+
+def _slot_offset(bank, src_worker, dst_worker, num_workers, slot_size):
+    return ((bank * num_workers + src_worker) * num_workers + dst_worker) * slot_size
+
+
+def _worker_loop(worker_id, num_workers, shm, slot_size, barrier, jobs, results):
+    """Bucle de un proceso del pool: ejecuta trabajos hasta recibir ``None``"""
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        program, assignment = job
+        try:
+            values, timings = _run_job(worker_id, num_workers, shm, slot_size,
+                                       barrier, program, assignment)
+            outcome = (worker_id, values, timings, None)
+        except Exception as e:
+            barrier.abort()  # Desbloquear al resto de workers
+            outcome = (worker_id, None, None, f"{type(e).__name__}: {e}")
+        tracing.flush()  # Antes de avisar al proceso principal
+        results.put(outcome)
+
+
+def _run_job(worker_id, num_workers, shm, slot_size, barrier, program, assignment):
+    """Ejecuta todos los superpasos para las particiones asignadas a este worker"""
+    states = {pid: program.setup(pid, data) for pid, data in assignment}
+    inboxes = {pid: [] for pid in states}
+    timings = []
+
+    for step in range(program.num_supersteps):
+        # 1) Cómputo local
+        t0 = time.perf_counter()
+        outbox = [[] for _ in range(num_workers)]
+        for pid in states:
+            def send(dest, msg, _src=pid):
+                outbox[dest % num_workers].append((_src, dest, msg))
+            states[pid] = program.superstep(step, pid, states[pid], inboxes[pid], send)
+        t1 = time.perf_counter()
+
+        # 2) Escritura de los mensajes salientes en memoria compartida
+        bank = step % 2
+        for dst_worker, msgs in enumerate(outbox):
+            payload = pickle.dumps(msgs, protocol=pickle.HIGHEST_PROTOCOL)
+            if _LEN.size + len(payload) > slot_size:
+                raise BSPError(f"Mensajes de {len(payload)} bytes exceden el buzón "
+                               f"de {slot_size} bytes (aumentar slot_size)")
+            off = _slot_offset(bank, worker_id, dst_worker, num_workers, slot_size)
+            shm.buf[off:off + _LEN.size] = _LEN.pack(len(payload))
+            shm.buf[off + _LEN.size:off + _LEN.size + len(payload)] = payload
+        t2 = time.perf_counter()
+
+        # 3) Barrera
+        barrier.wait()
+        t3 = time.perf_counter()
+
+        # 4) Lectura de los buzones dirigidos a este worker
+        inboxes = {pid: [] for pid in states}
+        for src_worker in range(num_workers):
+            off = _slot_offset(bank, src_worker, worker_id, num_workers, slot_size)
+            (length,) = _LEN.unpack_from(shm.buf, off)
+            start = off + _LEN.size
+            for src, dest, msg in pickle.loads(shm.buf[start:start + length]):
+                inboxes[dest].append((src, msg))
+        for inbox in inboxes.values():
+            inbox.sort(key=lambda item: item[0])
+        t4 = time.perf_counter()
+
+        timings.append({'compute': t1 - t0, 'comm': (t2 - t1) + (t4 - t3),
+                        'barrier': t3 - t2})
+        tracing.add_span('bsp.compute', t0, t1, 'bsp', step=step)
+        tracing.add_span('bsp.send', t1, t2, 'bsp', step=step)
+        tracing.add_span('bsp.barrier', t2, t3, 'bsp', step=step)
+        tracing.add_span('bsp.receive', t3, t4, 'bsp', step=step)
+
+    values = {pid: program.result(pid, state) for pid, state in states.items()}
+    return values, timings
+
+
+class BSPEngine:
+    def __init__(self, num_workers=None, slot_size=DEFAULT_SLOT_SIZE):
+        """Crea el pool de procesos y el bloque de memoria compartida de mensajes"""
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.slot_size = slot_size
+        self.last_timings = []
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=2 * self.num_workers * self.num_workers * slot_size)
+        self._barrier = multiprocessing.Barrier(self.num_workers)
+        self._results = multiprocessing.Queue()
+        self._jobs = [multiprocessing.Queue() for _ in range(self.num_workers)]
+        self._lock = threading.Lock()
+        self._procs = [
+            multiprocessing.Process(
+                target=_worker_loop, name=f"bsp-{w}", daemon=True,
+                args=(w, self.num_workers, self._shm, slot_size, self._barrier,
+                      self._jobs[w], self._results))
+            for w in range(self.num_workers)
+        ]
+        for p in self._procs:
+            p.start()
+
+    def run(self, program, inputs):
+        """Ejecuta ``program`` con una partición por elemento de ``inputs``.
+
+        Las particiones se reparten de forma cíclica entre los workers (la
+        partición ``pid`` vive en el worker ``pid % num_workers``). Devuelve la
+        lista de resultados ordenada por partición.
+        """
+        with self._lock:
+            self._barrier.reset()
+            for w in range(self.num_workers):
+                assignment = [(pid, inputs[pid])
+                              for pid in range(w, len(inputs), self.num_workers)]
+                self._jobs[w].put((program, assignment))
+
+            values = {}
+            per_worker = {}
+            errors = []
+            for _ in range(self.num_workers):
+                worker_id, worker_values, timings, error = self._results.get()
+                if error:
+                    errors.append(f"worker {worker_id}: {error}")
+                    continue
+                values.update(worker_values)
+                per_worker[worker_id] = timings
+            if errors:
+                raise BSPError("; ".join(errors))
+
+        self.last_timings = self._aggregate_timings(per_worker, program.num_supersteps)
+        return [values[pid] for pid in range(len(inputs))]
+
+    @staticmethod
+    def _aggregate_timings(per_worker, num_supersteps):
+        """Máximo y media por fase y superpaso (el máximo marca el ritmo BSP)"""
+        summary = []
+        for step in range(num_supersteps):
+            row = {'superstep': step}
+            for phase in ('compute', 'comm', 'barrier'):
+                values = [t[step][phase] for t in per_worker.values()]
+                row[f'{phase}_max'] = max(values)
+                row[f'{phase}_mean'] = sum(values) / len(values)
+            summary.append(row)
+        return summary
+
+    def print_timings(self):
+        print("Superpaso | cómputo máx | comunicación máx | barrera máx | barrera media")
+        for row in self.last_timings:
+            print(f"  {row['superstep']:7d} | {row['compute_max']:10.4f}s | "
+                  f"{row['comm_max']:15.4f}s | {row['barrier_max']:10.4f}s | "
+                  f"{row['barrier_mean']:12.4f}s")
+
+    def close(self):
+        for q in self._jobs:
+            q.put(None)
+        for p in self._procs:
+            p.join()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
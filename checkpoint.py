@@ -0,0 +1,62 @@
+"""Checkpoints duraderos para reanudar ejecuciones largas.
+
+Un checkpoint es un JSON pequeño (última clave procesada, totales, tamaño de
+los ficheros de salida) que se escribe en un temporal, se fuerza a disco con
+``fsync`` y sustituye al anterior con ``os.replace``. Un corte de luz o un
+``kill -9`` a mitad deja siempre el checkpoint anterior completo, nunca uno a
+medias.
+"""
+import json
+import os
+import time
+
+FORMAT_VERSION = 1
+
+
+class CheckpointError(RuntimeError):
+    pass
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.saves = 0
+
+    def load(self):
+        """Último estado guardado, o None si no hay checkpoint"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            raise CheckpointError(f"Checkpoint ilegible en {self.path}: {e}")
+        if state.get('format') != FORMAT_VERSION:
+            raise CheckpointError(f"Formato de checkpoint {state.get('format')} no compatible")
+        return state
+
+    def save(self, state):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        state = dict(state, format=FORMAT_VERSION,
+                     saved_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        tmp = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # El rename solo es duradero cuando se sincroniza el directorio
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.saves += 1
+
+    def check_compatible(self, state, expected):
+        """Error si el checkpoint es de otra configuración (base, particiones, ...)"""
+        for key, value in expected.items():
+            if state.get(key) != value:
+                raise CheckpointError(f"El checkpoint no corresponde a esta ejecución: "
+                                      f"{key} = {state.get(key)!r}, se esperaba {value!r}")
@@ -0,0 +1,111 @@
+"""Ciudades distintas por país en modo aproximado con sketches HyperLogLog.
+
+La tabla se divide en fragmentos disjuntos de ``id`` alineados a ``SHARD_SIZE``.
+Cada fragmento se recorre una sola vez y produce un sketch por país; la fase
+join une los sketches de todos los fragmentos. Los fragmentos completos (todo
+su rango de ``id`` ya existe, y con AUTO_INCREMENT no van a aparecer filas
+nuevas en él) se guardan en ``sketch_dir`` y en ejecuciones posteriores se
+cargan en lugar de volver a leerse.
+
+Países y ciudades se comparan con la collation del motor
+(``backend.text_key``), igual que ``COUNT(DISTINCT City)`` en el modo exacto:
+en MySQL 'Lima' y 'LIMA' son una sola ciudad y suman un único valor al sketch.
+"""
+import base64
+import json
+import os
+
+from database import get_pool, get_backend
+from hyperloglog import HyperLogLog, DEFAULT_PRECISION
+from stream_reader import iter_keyset_batches
+
+SHARD_SIZE = 100_000
+SCAN_BATCH_SIZE = 20_000
+DEFAULT_SKETCH_DIR = 'sketches'
+
+
+def id_shards(conn, shard_size=SHARD_SIZE):
+    """Fragmentos ``(after_id, until_id, completo)`` que cubren la tabla"""
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(id), MAX(id) FROM customers")
+    min_id, max_id = cur.fetchone()
+    cur.close()
+    if max_id is None:
+        return []
+    first = (min_id - 1) // shard_size * shard_size
+    return [(lo, lo + shard_size, lo + shard_size <= max_id)
+            for lo in range(first, max_id, shard_size)]
+
+
+def scan_shard(conn, after_id, until_id, precision=DEFAULT_PRECISION):
+    """Recorre ``after_id < id <= until_id`` y devuelve ``{pais: HyperLogLog}``"""
+    key = get_backend().text_key
+    sketches = {}
+    names = {}  # Clave de collation -> primera grafía del país
+    for rows in iter_keyset_batches(conn, ('country', 'city'), SCAN_BATCH_SIZE,
+                                    after_id=after_id, until_id=until_id):
+        for _, country, city in rows:
+            if country is None or city is None:
+                continue  # COUNT(DISTINCT City) ignora los NULL
+            country = names.setdefault(key(country), country)
+            sketch = sketches.get(country)
+            if sketch is None:
+                sketch = sketches[country] = HyperLogLog(precision)
+            sketch.add(key(city))
+    return sketches
+
+
+def shard_path(sketch_dir, after_id, until_id, precision):
+    # El motor forma parte del nombre: cada uno compara las ciudades a su manera
+    return os.path.join(sketch_dir, f"shard-{after_id}-{until_id}-p{precision}-"
+                                    f"{get_backend().name}.json")
+
+
+def save_sketches(path, sketches):
+    """Guarda ``{pais: HyperLogLog}`` de forma atómica"""
+    data = {country: base64.b64encode(s.to_bytes()).decode('ascii')
+            for country, s in sketches.items()}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def load_sketches(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {country: HyperLogLog.from_bytes(base64.b64decode(encoded))
+            for country, encoded in data.items()}
+
+
+def shard_sketches(after_id, until_id, complete, precision=DEFAULT_PRECISION,
+                   sketch_dir=DEFAULT_SKETCH_DIR):
+    """Sketches de un fragmento, desde la caché si existe (tarea de un worker).
+
+    Devuelve ``(sketches, desde_cache)``.
+    """
+    path = shard_path(sketch_dir, after_id, until_id, precision) if sketch_dir else None
+    if complete and path and os.path.exists(path):
+        return load_sketches(path), True
+
+    with get_pool().connection() as conn:
+        sketches = scan_shard(conn, after_id, until_id, precision)
+    if complete and path:
+        os.makedirs(sketch_dir, exist_ok=True)
+        save_sketches(path, sketches)
+    return sketches, False
+
+
+def merge_sketches(partials):
+    """Join: une los sketches de varios fragmentos por país"""
+    key = get_backend().text_key
+    merged = {}
+    names = {}
+    for partial in partials:
+        for country, sketch in partial.items():
+            country = names.setdefault(key(country), country)
+            if country in merged:
+                merged[country].merge(sketch)
+            else:
+                merged[country] = sketch
+    return merged
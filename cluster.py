@@ -0,0 +1,322 @@
+"""Modo coordinador/worker en varias máquinas para Pipeline y BSP.
+
+El coordinador reparte unidades de trabajo (rangos de ``id`` para el
+hashing, rangos de fechas para el superpaso de lectura de BSP) a través de un
+``WorkRegistry`` servido por TCP con ``multiprocessing.managers``. Cada
+worker, en cualquier máquina con acceso a la BD, se conecta, pide una unidad
+(``lease``), la ejecuta con el manejador de su tipo y devuelve el resultado
+(``complete``).
+
+- Latidos: cada worker envía ``heartbeat`` cada ``HEARTBEAT_INTERVAL``
+  segundos desde un hilo propio, también mientras ejecuta una unidad larga.
+- Reasignación: si un worker no da señales en ``heartbeat_timeout`` segundos
+  se da por muerto y sus unidades vuelven a la cola. Si llegara a terminar
+  una unidad ya reasignada, solo cuenta el primer resultado de cada unidad,
+  así que cada una se suma exactamente una vez.
+- Errores: una unidad cuyo manejador falla se reintenta hasta
+  ``MAX_ATTEMPTS`` veces; después el coordinador aborta.
+
+Los manejadores son funciones de los propios scripts, de modo que los workers
+se lanzan con el mismo script y ``--worker HOST:PUERTO``. Para probar en una
+sola máquina, ``--local-workers N`` arranca N workers junto al coordinador.
+
+``multiprocessing.managers`` intercambia pickles, así que quien conozca la
+clave puede ejecutar código en el coordinador y en los workers. No hay clave
+por defecto: sin ``--authkey`` ni ``$CLUSTER_AUTHKEY`` el coordinador genera
+una aleatoria y la muestra, y escucha solo en 127.0.0.1 salvo que se indique
+otro host.
+"""
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+
+DEFAULT_PORT = 50_000
+DEFAULT_AUTHKEY = os.environ.get('CLUSTER_AUTHKEY')  # Sin clave: se genera una al arrancar
+HEARTBEAT_INTERVAL = 1.0  # Segundos entre latidos de un worker
+HEARTBEAT_TIMEOUT = 10.0  # Segundos sin latido para dar un worker por muerto
+POLL_INTERVAL = 0.2  # Espera de un worker sin unidades pendientes
+CONNECT_TIMEOUT = 30.0  # Reintentos de conexión de un worker que arranca antes
+MAX_ATTEMPTS = 3  # Ejecuciones fallidas de una unidad antes de abortar
+
+
+class ClusterError(RuntimeError):
+    pass
+
+
+class WorkRegistry:
+    """Estado de las unidades y los workers; vive en el proceso del coordinador"""
+
+    def __init__(self, units, heartbeat_timeout=HEARTBEAT_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        """``units``: lista de ``(tipo, datos)``; el id de cada unidad es su posición"""
+        self.units = list(units)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._pending = list(range(len(self.units)))
+        self._leases = {}  # unidad -> worker
+        self._done = set()
+        self._attempts = [0] * len(self.units)
+        self._last_seen = {}  # worker -> instante del último latido
+        self._dead = set()
+        self._results = queue.Queue()
+        self._closed = False
+        self.reassigned = 0
+        self.duplicates = 0
+        self.failure = None
+
+    def heartbeat(self, worker):
+        with self._lock:
+            self._last_seen[worker] = time.monotonic()
+            self._dead.discard(worker)
+
+    def lease(self, worker):
+        """Siguiente unidad ``(id, tipo, datos)``, o None si no hay ninguna pendiente"""
+        with self._lock:
+            self._last_seen[worker] = time.monotonic()
+            self._dead.discard(worker)
+            if self._closed or not self._pending:
+                return None
+            unit = self._pending.pop(0)
+            self._leases[unit] = worker
+            kind, data = self.units[unit]
+            return unit, kind, data
+
+    def complete(self, worker, unit, result):
+        with self._lock:
+            if unit in self._done:
+                self.duplicates += 1  # Unidad reasignada que ya terminó otro worker
+                return False
+            # En la cola antes de marcarla terminada: quien vea la unidad en
+            # ``_done`` encuentra también su resultado
+            self._results.put((unit, result))
+            self._done.add(unit)
+            self._leases.pop(unit, None)
+            if unit in self._pending:
+                self._pending.remove(unit)
+        return True
+
+    def fail(self, worker, unit, error):
+        with self._lock:
+            if unit in self._done or self._leases.get(unit) != worker:
+                return
+            del self._leases[unit]
+            self._attempts[unit] += 1
+            if self._attempts[unit] >= self.max_attempts:
+                self.failure = f"unidad {unit} ({self.units[unit][0]}): {error}"
+                self._closed = True
+            else:
+                self._pending.insert(0, unit)
+        self._results.put(None)  # Despierta al coordinador
+
+    def reap(self):
+        """Devuelve a la cola las unidades de workers sin latido; lista de muertos nuevos"""
+        now = time.monotonic()
+        with self._lock:
+            dead = [w for w, seen in self._last_seen.items()
+                    if w not in self._dead and now - seen > self.heartbeat_timeout]
+            for worker in dead:
+                self._dead.add(worker)
+                for unit in [u for u, w in self._leases.items() if w == worker]:
+                    del self._leases[unit]
+                    self._pending.insert(0, unit)
+                    self.reassigned += 1
+            return dead
+
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+    def next_result(self, timeout):
+        """``(unidad, resultado)`` terminado, o None si no llega ninguno en ``timeout``"""
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def finished(self):
+        return len(self._done) == len(self.units)
+
+    def status(self):
+        with self._lock:
+            alive = [w for w in self._last_seen if w not in self._dead]
+            return {'units': len(self.units), 'done': len(self._done),
+                    'pending': len(self._pending), 'leased': len(self._leases),
+                    'workers': len(alive), 'dead': len(self._dead),
+                    'reassigned': self.reassigned, 'duplicates': self.duplicates}
+
+
+class ClusterManager(BaseManager):
+    pass
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """'host:puerto', ':puerto' o 'puerto' -> ``(host, puerto)``"""
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port or DEFAULT_PORT)
+
+
+def _authkey(authkey):
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def _serve_forever(server):
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass  # serve_forever termina con sys.exit(0), pensado para su propio proceso
+
+
+def serve(registry, address, authkey=DEFAULT_AUTHKEY):
+    """Sirve ``registry`` por TCP desde un hilo; devuelve el servidor (``.address``)"""
+    ClusterManager.register('registry', callable=lambda: registry)
+    server = ClusterManager(address=address, authkey=_authkey(authkey)).get_server()
+    threading.Thread(target=_serve_forever, args=(server,), name='cluster-server',
+                     daemon=True).start()
+    return server
+
+
+def connect(address, authkey=DEFAULT_AUTHKEY, timeout=CONNECT_TIMEOUT):
+    """Proxy del ``WorkRegistry`` remoto; reintenta mientras el coordinador arranca"""
+    ClusterManager.register('registry')
+    deadline = time.monotonic() + timeout
+    while True:
+        manager = ClusterManager(address=address, authkey=_authkey(authkey))
+        try:
+            manager.connect()
+            return manager.registry()
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(POLL_INTERVAL)
+
+
+def run_worker(address, handlers, authkey=DEFAULT_AUTHKEY, heartbeat_interval=HEARTBEAT_INTERVAL):
+    """Bucle de un worker: pide unidades y las ejecuta con ``handlers[tipo](datos)``"""
+    if not authkey:
+        raise ClusterError("Un worker necesita la clave del coordinador "
+                           "(--authkey o $CLUSTER_AUTHKEY)")
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    registry = connect(address, authkey)
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(heartbeat_interval):
+            try:
+                registry.heartbeat(worker)
+            except (ConnectionError, EOFError):
+                return
+
+    threading.Thread(target=beat, name='heartbeat', daemon=True).start()
+    done = 0
+    try:
+        while True:
+            unit = registry.lease(worker)
+            if unit is None:
+                if registry.closed():
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            unit_id, kind, data = unit
+            try:
+                result = handlers[kind](data)
+            except Exception as e:
+                print(f"[Worker {worker}] Error en la unidad {unit_id}: {e}")
+                registry.fail(worker, unit_id, repr(e))
+                continue
+            registry.complete(worker, unit_id, result)
+            done += 1
+    except (ConnectionError, EOFError):
+        pass  # El coordinador terminó
+    finally:
+        stop.set()
+    print(f"[Worker {worker}] Terminado: {done} unidades")
+    return done
+
+
+def run_coordinator(units, on_result, address, handlers=None, local_workers=0,
+                    authkey=DEFAULT_AUTHKEY, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+    """Reparte ``units`` y llama a ``on_result(id, resultado)`` una vez por unidad.
+
+    ``local_workers`` arranca ese número de workers en esta máquina (necesita
+    ``handlers``). Sin ``authkey`` se genera una clave aleatoria. Devuelve el
+    estado final del registro.
+    """
+    if not authkey:
+        authkey = secrets.token_hex(16)
+        print(f"[Coordinador] Clave generada: {authkey} "
+              f"(pásala a los workers con --authkey o $CLUSTER_AUTHKEY)")
+    registry = WorkRegistry(units, heartbeat_timeout)
+    server = serve(registry, address, authkey)
+    host, port = server.address
+    print(f"[Coordinador] Escuchando en {host}:{port}, {len(registry.units)} unidades")
+
+    local_address = ('127.0.0.1' if host in ('', '0.0.0.0') else host, port)
+    local = [Process(target=run_worker, args=(local_address, handlers, authkey),
+                     name=f"cluster-worker-{i}")
+             for i in range(local_workers)]
+    for p in local:
+        p.start()
+    try:
+        last_report = time.monotonic()
+        delivered = 0
+        # Se cuenta lo entregado a ``on_result`` y no ``registry.finished()``: la
+        # última unidad puede estar terminada con su resultado aún en la cola
+        while delivered < len(registry.units):
+            item = registry.next_result(HEARTBEAT_INTERVAL)
+            if item is not None:
+                on_result(*item)
+                delivered += 1
+            if registry.failure:
+                raise ClusterError(registry.failure)
+            for worker in registry.reap():
+                print(f"[Coordinador] Worker {worker} sin latido: sus unidades se reasignan")
+            if time.monotonic() - last_report > 5:
+                status = registry.status()
+                print(f"[Coordinador] {status['done']}/{status['units']} unidades, "
+                      f"{status['workers']} workers activos")
+                last_report = time.monotonic()
+    finally:
+        registry.close()  # Los workers salen en su siguiente lease
+        for p in local:
+            p.join()
+        time.sleep(2 * POLL_INTERVAL)
+        server.stop_event.set()
+    return registry.status()
+
+
+def describe_status(status):
+    return (f"{status['done']}/{status['units']} unidades, {status['workers']} workers activos, "
+            f"{status['dead']} caídos, {status['reassigned']} unidades reasignadas, "
+            f"{status['duplicates']} resultados duplicados descartados")
+
+
+def add_cluster_arguments(parser):
+    """Opciones comunes ``--coordinator``, ``--worker``, ``--local-workers``, ..."""
+    group = parser.add_argument_group("modo multi-nodo")
+    group.add_argument('--coordinator', metavar='[HOST]:PUERTO',
+                       help="repartir el trabajo a workers remotos escuchando en esta dirección "
+                            "(por defecto en 127.0.0.1; 0.0.0.0 para todas las interfaces)")
+    group.add_argument('--worker', metavar='HOST:PUERTO',
+                       help="ejecutar como worker del coordinador indicado")
+    group.add_argument('--local-workers', type=int, default=0,
+                       help="workers a arrancar en esta máquina junto al coordinador")
+    group.add_argument('--authkey', default=DEFAULT_AUTHKEY,
+                       help="clave compartida entre coordinador y workers (por defecto "
+                            "$CLUSTER_AUTHKEY; sin ella el coordinador genera una aleatoria)")
+    group.add_argument('--heartbeat-timeout', type=float, default=HEARTBEAT_TIMEOUT,
+                       help="segundos sin latido para reasignar las unidades de un worker")
+    return parser
+
+
+def check_cluster_arguments(parser, args):
+    """Un worker no puede adivinar la clave: error de argparse si falta"""
+    if args.worker and not args.authkey:
+        parser.error("--worker necesita la clave del coordinador (--authkey o $CLUSTER_AUTHKEY)")
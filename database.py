@@ -0,0 +1,501 @@
+"""Acceso común a la base de datos para todos los scripts.
+
+- ``DB_CONFIG``: única definición de los datos de conexión.
+- Motor intercambiable (``backends``): MySQL o SQLite embebido, elegido con
+  ``--backend`` en cada script (``add_backend_arguments``/``configure_backend``)
+  o con la variable de entorno ``SUMAPARALELA_BACKEND``.
+- ``ConnectionPool``: pool de conexiones seguro entre hilos y tras ``fork``
+  (un proceso hijo nunca reutiliza los sockets heredados del padre).
+- ``PooledConnection``: envoltorio cuyo ``close()`` devuelve la conexión al
+  pool y que cachea los cursores preparados por sentencia SQL.
+- ``DatabaseManager``: creación del esquema, índices, control de cambios
+  (triggers para ``result_store``) y conexiones para insert-data.py.
+- ``db_time()``: segundos acumulados dentro de llamadas a la base de datos
+  (execute/fetch) por este proceso y sus hijos creados con ``fork``, para
+  separar el tiempo de la BD del tiempo del cliente. Con ``tracing`` activo
+  cada llamada también queda como un span ``db.*``.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from backends import Error, BACKENDS, DEFAULT_BACKEND, create_backend
+import tracing
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'sumaparalela',
+    'autocommit': True
+}
+DEFAULT_POOL_SIZE = 4
+BACKEND_ENV = 'SUMAPARALELA_BACKEND'
+SQLITE_PATH_ENV = 'SUMAPARALELA_SQLITE_PATH'
+
+# Índices secundarios que usan los patrones (Fork-Join por país/ciudad, BSP por fecha)
+CUSTOMERS_INDEXES = {
+    'idx_customers_country_city': ('country', 'city'),
+    'idx_customers_subscription_date': ('subscription_date',),
+}
+
+# Columnas de customers: (columna del CSV, columna de la BD, longitud máxima de texto)
+CSV_COLUMN_MAP = [
+    ('Index', 'index_field', None),
+    ('Customer Id', 'customer_id', 50),
+    ('First Name', 'first_name', 100),
+    ('Last Name', 'last_name', 100),
+    ('Company', 'company', 200),
+    ('City', 'city', 100),
+    ('Country', 'country', 100),
+    ('Phone 1', 'phone_1', 20),
+    ('Phone 2', 'phone_2', 20),
+    ('Email', 'email', 150),
+    ('Subscription Date', 'subscription_date', None),
+    ('Website', 'website', 200),
+]
+DB_COLUMNS = [db_col for _, db_col, _ in CSV_COLUMN_MAP]
+INSERT_CUSTOMERS_SQL = (f"INSERT INTO customers ({', '.join(DB_COLUMNS)}) "
+                        f"VALUES ({', '.join(['%s'] * len(DB_COLUMNS))})")
+
+# Triggers que incrementan table_changes.version (ver ensure_change_tracking)
+CHANGE_TRIGGERS = {
+    'customers_track_update': 'UPDATE',
+    'customers_track_delete': 'DELETE',
+}
+
+
+class PoolTimeout(Error):
+    pass
+
+
+# Compartido con los hijos creados con fork (workers de Pipeline, BSP, ...)
+_db_time = multiprocessing.Value('d', 0.0)
+
+
+def db_time():
+    """Segundos pasados dentro de la base de datos desde que se importó el módulo"""
+    return _db_time.value
+
+
+_SPAN_NAMES = {name: f'db.{name}' for name in
+               ('execute', 'executemany', 'fetchone', 'fetchmany', 'fetchall')}
+
+
+class TimedCursor:
+    """Cursor del driver que acumula en ``db_time()`` el tiempo de execute/fetch"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def _timed(self, method, *args):
+        t0 = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            t1 = time.perf_counter()
+            with _db_time.get_lock():
+                _db_time.value += t1 - t0
+            tracing.add_span(_SPAN_NAMES[method.__name__], t0, t1, 'db')
+
+    def execute(self, *args):
+        return self._timed(self.raw.execute, *args)
+
+    def executemany(self, *args):
+        return self._timed(self.raw.executemany, *args)
+
+    def fetchone(self):
+        return self._timed(self.raw.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self.raw.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self.raw.fetchall)
+
+    def __getattr__(self, name):
+        # close, with_rows, rowcount, lastrowid, ...
+        return getattr(self.raw, name)
+
+
+class PooledConnection:
+    """Conexión prestada por un pool; ``close()`` la devuelve en lugar de cerrarla"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self.raw = raw
+        self._prepared = {}
+        self._in_use = False
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self.raw.cursor(*args, **kwargs))
+
+    def prepared(self, sql):
+        """Cursor preparado para ``sql``, reutilizado en llamadas sucesivas"""
+        cur = self._prepared.get(sql)
+        if cur is None:
+            cur = self._prepared[sql] = self.cursor(prepared=True)
+        return cur
+
+    def query(self, sql, params=()):
+        """Ejecuta una sentencia preparada y devuelve todas sus filas"""
+        cur = self.prepared(sql)
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    def query_one(self, sql, params=()):
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+    def __getattr__(self, name):
+        # commit, rollback, consume_results, ... del driver
+        return getattr(self.raw, name)
+
+    def close(self):
+        self._pool.release(self)
+
+    def discard(self):
+        """Devuelve la conexión marcándola como rota (se cerrará)"""
+        self._pool.release(self, discard=True)
+
+    def _close_raw(self):
+        for cur in self._prepared.values():
+            try:
+                cur.close()
+            except Error:
+                pass
+        self._prepared.clear()
+        try:
+            self.raw.close()
+        except Error:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, Error):
+            self.discard()
+        else:
+            self.close()
+
+
+class ConnectionPool:
+    def __init__(self, size=DEFAULT_POOL_SIZE, backend=None, **config):
+        """Pool de hasta ``size`` conexiones de ``backend`` creadas bajo demanda con ``config``"""
+        self.config = config or dict(DB_CONFIG)
+        self.backend = backend or get_backend()
+        self.size = size
+        self._reset()
+
+    def _reset(self):
+        """Estado vacío; se llama al crear el pool y en el hijo tras un fork"""
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self.connections_created = 0
+        self.acquisitions = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.connect_time = 0.0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Las conexiones heredadas pertenecen al padre: se abandonan sin
+            # cerrarlas para no cortar su sesión
+            self._reset()
+
+    def acquire(self, timeout=None):
+        """Toma una conexión libre o crea una si no se ha llegado a ``size``"""
+        self._check_pid()
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No hay conexiones libres tras {timeout}s")
+        waited = time.perf_counter() - t0
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                t1 = time.perf_counter()
+                conn = PooledConnection(self, self.backend.connect(self.config))
+                with self._lock:
+                    self.connections_created += 1
+                    self.connect_time += time.perf_counter() - t1
+            except Exception:
+                self._slots.release()
+                raise
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+        conn._in_use = True
+        return conn
+
+    def release(self, conn, discard=False):
+        if not conn._in_use:
+            return
+        conn._in_use = False
+        if self._pid != os.getpid():
+            return  # Conexión prestada antes del fork: no es de este proceso
+        if discard:
+            conn._close_raw()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def connection(self, timeout=None):
+        """Uso: ``with pool.connection() as conn: ...``"""
+        return self.acquire(timeout)
+
+    def resize(self, size):
+        """Ajusta el tamaño máximo (solo si no hay conexiones prestadas)"""
+        with self._lock:
+            self.close()
+            self.size = size
+            self._reset()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'connections_created': self.connections_created,
+            'acquisitions': self.acquisitions,
+            'wait_time': self.wait_time,
+            'max_wait': self.max_wait,
+            'connect_time': self.connect_time,
+        }
+
+    def print_stats(self, label="Pool"):
+        s = self.stats()
+        print(f"[{label}] {s['acquisitions']} préstamos, {s['connections_created']} "
+              f"conexiones creadas ({s['connect_time']:.3f}s), espera total "
+              f"{s['wait_time']:.3f}s (máx {s['max_wait']:.3f}s)")
+
+    def close(self):
+        """Cierra las conexiones libres del pool"""
+        if self._pid != os.getpid():
+            return
+        while True:
+            try:
+                self._idle.get_nowait()._close_raw()
+            except queue.Empty:
+                break
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+_backend = None
+
+
+def get_backend():
+    """Motor en uso (por defecto el de ``SUMAPARALELA_BACKEND`` o MySQL)"""
+    global _backend
+    if _backend is None:
+        name = os.environ.get(BACKEND_ENV, DEFAULT_BACKEND)
+        options = {}
+        if name == 'sqlite' and os.environ.get(SQLITE_PATH_ENV):
+            options['path'] = os.environ[SQLITE_PATH_ENV]
+        _backend = create_backend(name, **options)
+    return _backend
+
+
+def set_backend(name, **options):
+    """Cambia de motor; el pool compartido se recrea con el nuevo"""
+    global _backend, _default_pool
+    _backend = create_backend(name, **options)
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
+    return _backend
+
+
+def add_backend_arguments(parser):
+    """Opciones comunes ``--backend``, ``--sqlite-path`` y ``--no-wal``"""
+    parser.add_argument('--backend', choices=BACKENDS,
+                        default=os.environ.get(BACKEND_ENV, DEFAULT_BACKEND),
+                        help="motor de base de datos (sqlite: fichero local, sin servidor)")
+    parser.add_argument('--sqlite-path', default=os.environ.get(SQLITE_PATH_ENV),
+                        help="fichero SQLite (por defecto <database>.db)")
+    parser.add_argument('--no-wal', action='store_true',
+                        help="SQLite sin modo WAL (journal por defecto)")
+    return parser
+
+
+def configure_backend(args):
+    """Aplica las opciones de ``add_backend_arguments`` antes de abrir conexiones"""
+    if args.backend == 'sqlite':
+        return set_backend('sqlite', path=args.sqlite_path, wal=not args.no_wal)
+    return set_backend(args.backend)
+
+
+def _after_fork_in_child():
+    # El lock pudo copiarse tomado por otro hilo del padre
+    global _default_lock
+    _default_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_pool():
+    """Pool compartido del proceso actual (uno nuevo en cada hijo tras fork)"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool(DEFAULT_POOL_SIZE, **DB_CONFIG)
+        return _default_pool
+
+
+def configure_pool(num_workers):
+    """Dimensiona el pool compartido para ``num_workers`` hilos (+1 del principal)"""
+    pool = get_pool()
+    if pool.size != num_workers + 1:
+        pool.resize(num_workers + 1)
+    return pool
+
+
+class DatabaseManager:
+    def __init__(self, host=DB_CONFIG['host'], database=DB_CONFIG['database'],
+                 user=DB_CONFIG['user'], password=DB_CONFIG['password'],
+                 pool_size=DEFAULT_POOL_SIZE, allow_local_infile=False, backend=None):
+        self.backend = backend or get_backend()
+        self.host = host
+        self.database = database
+        self.user = user
+        self.password = password
+        config = dict(host=host, database=database, user=user, password=password)
+        if allow_local_infile:
+            config['allow_local_infile'] = True  # Necesario para LOAD DATA LOCAL INFILE
+        self.pool = ConnectionPool(pool_size, self.backend, **config)
+
+    def create_connection(self):
+        """Tomar una conexión del pool (``close()`` la devuelve al pool)"""
+        try:
+            return self.pool.acquire()
+        except Error as e:
+            print(f"Error conectando a {self.backend.describe(self.pool.config)}: {e}")
+            return None
+
+    def create_customers_table(self):
+        """Crear tabla customers si no existe"""
+        connection = self.create_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                create_table_query = """
+                CREATE TABLE IF NOT EXISTS customers (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    index_field INT,
+                    customer_id VARCHAR(50),
+                    first_name VARCHAR(100),
+                    last_name VARCHAR(100),
+                    company VARCHAR(200),
+                    city VARCHAR(100),
+                    country VARCHAR(100),
+                    phone_1 VARCHAR(20),
+                    phone_2 VARCHAR(20),
+                    email VARCHAR(150),
+                    subscription_date DATE,
+                    website VARCHAR(200)
+                )
+                """
+                cursor.execute(create_table_query)
+                connection.commit()
+                print("Tabla 'customers' creada exitosamente")
+            except Error as e:
+                print(f"Error creando tabla: {e}")
+            finally:
+                cursor.close()
+                connection.close()
+
+    def create_checkpoint_table(self):
+        """Crear la tabla de progreso de cargas reanudables si no existe"""
+        connection = self.create_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                    source CHAR(40) NOT NULL,
+                    source_path VARCHAR(255),
+                    first_row BIGINT NOT NULL,
+                    row_count INT NOT NULL,
+                    chunk_rows INT NOT NULL,
+                    committed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source, first_row)
+                )
+                """)
+                connection.commit()
+            except Error as e:
+                print(f"Error creando tabla de checkpoints: {e}")
+            finally:
+                cursor.close()
+                connection.close()
+
+    def ensure_indexes(self):
+        """Crear los índices de ``CUSTOMERS_INDEXES`` que falten; devuelve los creados"""
+        created = []
+        connection = self.create_connection()
+        if not connection:
+            return created
+        cursor = connection.cursor()
+        try:
+            # Columnas de cada índice existente, en orden
+            existing = self.backend.index_columns(cursor, 'customers')
+            prefixes = [tuple(cols) for cols in existing.values()]
+
+            for name, columns in CUSTOMERS_INDEXES.items():
+                # Un índice cuyas primeras columnas coinciden ya sirve
+                if any(prefix[:len(columns)] == columns for prefix in prefixes):
+                    continue
+                print(f"Creando índice {name} ({', '.join(columns)})...")
+                cursor.execute(f"CREATE INDEX {name} ON customers ({', '.join(columns)})")
+                created.append(name)
+        except Error as e:
+            print(f"Error creando índices: {e}")
+        finally:
+            cursor.close()
+            connection.close()
+        return created
+
+    def ensure_change_tracking(self):
+        """Tabla ``table_changes`` y triggers que cuentan los UPDATE/DELETE de customers.
+
+        ``result_store`` compara ese contador para saber si puede actualizar
+        sus agregados solo con las filas nuevas. Devuelve False si no se
+        pudieron crear (p. ej. sin privilegio TRIGGER).
+        """
+        connection = self.create_connection()
+        if not connection:
+            return False
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS table_changes (
+                table_name VARCHAR(64) PRIMARY KEY,
+                version BIGINT NOT NULL
+            )
+            """)
+            cursor.execute("SELECT version FROM table_changes WHERE table_name = 'customers'")
+            if cursor.fetchone() is None:
+                cursor.execute("INSERT INTO table_changes (table_name, version) "
+                               "VALUES ('customers', 0)")
+            existing = set(self.backend.trigger_names(cursor, 'customers'))
+            for name, event in CHANGE_TRIGGERS.items():
+                if name not in existing:
+                    cursor.execute(
+                        f"CREATE TRIGGER {name} AFTER {event} ON customers FOR EACH ROW "
+                        f"BEGIN UPDATE table_changes SET version = version + 1 "
+                        f"WHERE table_name = 'customers'; END")
+            connection.commit()
+            return True
+        except Error as e:
+            print(f"Error creando el control de cambios: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
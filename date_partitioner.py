@@ -0,0 +1,180 @@
+"""Particionado de ``subscription_date`` a partir de los datos reales.
+
+En lugar de doce meses fijos se lee el rango real de fechas (MIN/MAX) y un
+histograma diario (opcionalmente muestreado) y se cortan N rangos contiguos con
+aproximadamente el mismo número de filas. Como los rangos no coinciden con los
+meses, cada partición cuenta sus filas agrupadas por mes y los informes se
+recomponen por mes de calendario.
+"""
+from datetime import date, timedelta
+
+
+def as_date(value):
+    """Normaliza lo que devuelve el driver (date, datetime o texto ISO) a ``date``"""
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, date):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def add_months(d, months):
+    """Primer día del mes situado ``months`` meses después del de ``d``"""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_label(d):
+    return d.strftime('%Y-%m')
+
+
+def calendar_months(start, end):
+    """Primeros días de los meses de calendario que se solapan con [start, end)"""
+    months = []
+    current = add_months(start, 0)
+    while current < end:
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+def fetch_date_bounds(conn):
+    """(MIN, MAX) de subscription_date, o (None, None) si la tabla está vacía"""
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(subscription_date), MAX(subscription_date) FROM customers")
+    low, high = cur.fetchone()
+    cur.close()
+    return as_date(low), as_date(high)
+
+
+def last_months_window(conn, months=12):
+    """[inicio, fin) que cubre los últimos ``months`` meses con datos.
+
+    ``months=None`` devuelve el rango completo de la tabla.
+    """
+    return window_from_bounds(*fetch_date_bounds(conn), months)
+
+
+def window_from_bounds(low, high, months=12):
+    """Ventana de ``last_months_window`` a partir de (MIN, MAX) ya conocidos"""
+    if high is None:
+        return None, None
+    end = add_months(high, 1)
+    if months is None:
+        return add_months(low, 0), end
+    return max(add_months(end, -months), add_months(low, 0)), end
+
+
+def fetch_date_histogram(conn, start, end, sample_every=1):
+    """Lista ``[(día, filas)]`` ordenada; ``sample_every > 1`` muestrea por ``id``"""
+    query = ("SELECT subscription_date, COUNT(*) FROM customers "
+             "WHERE subscription_date >= %s AND subscription_date < %s")
+    params = [start.isoformat(), end.isoformat()]
+    if sample_every > 1:
+        query += " AND MOD(id, %s) = 0"
+        params.append(sample_every)
+    query += " GROUP BY subscription_date ORDER BY subscription_date"
+    cur = conn.cursor()
+    cur.execute(query, tuple(params))
+    histogram = [(as_date(day), count) for day, count in cur.fetchall()]
+    cur.close()
+    return histogram
+
+
+def balanced_ranges(histogram, num_partitions, start, end):
+    """Corta [start, end) en hasta ``num_partitions`` rangos de filas similares.
+
+    Los cortes caen en límites de día, así que un día muy cargado no se divide
+    y puede haber menos particiones que las pedidas.
+    """
+    total = sum(count for _, count in histogram)
+    if total == 0:
+        # Sin datos: repartir por días
+        span = (end - start).days
+        bounds = sorted({start + timedelta(days=span * k // num_partitions)
+                         for k in range(1, num_partitions)} - {start, end})
+    else:
+        bounds = []
+        cumulative = 0
+        k = 1
+        for day, count in histogram:
+            cumulative += count
+            while k < num_partitions and cumulative >= total * k / num_partitions:
+                cut = day + timedelta(days=1)
+                if start < cut < end and (not bounds or cut > bounds[-1]):
+                    bounds.append(cut)
+                k += 1
+    edges = [start] + bounds + [end]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def count_by_month(conn, start, end):
+    """Filas por mes de calendario dentro de [start, end) como ``{'YYYY-MM': n}``"""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT YEAR(subscription_date), MONTH(subscription_date), COUNT(*) "
+        "FROM customers WHERE subscription_date >= %s AND subscription_date < %s "
+        "GROUP BY YEAR(subscription_date), MONTH(subscription_date)",
+        (start.isoformat(), end.isoformat())
+    )
+    counts = {f"{int(year):04d}-{int(month):02d}": count
+              for year, month, count in cur.fetchall()}
+    cur.close()
+    return counts
+
+
+def count_by_month_country(conn, start, end):
+    """Filas por mes y país dentro de [start, end) como ``{'YYYY-MM': {país: n}}``"""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT YEAR(subscription_date), MONTH(subscription_date), Country, COUNT(*) "
+        "FROM customers WHERE subscription_date >= %s AND subscription_date < %s "
+        "GROUP BY YEAR(subscription_date), MONTH(subscription_date), Country",
+        (start.isoformat(), end.isoformat())
+    )
+    counts = {}
+    for year, month, country, count in cur.fetchall():
+        counts.setdefault(f"{int(year):04d}-{int(month):02d}", {})[country] = count
+    cur.close()
+    return counts
+
+
+def merge_counts(partials):
+    """Suma varios diccionarios ``{'YYYY-MM': n}``"""
+    merged = {}
+    for partial in partials:
+        for label, count in partial.items():
+            merged[label] = merged.get(label, 0) + count
+    return merged
+
+
+def month_start(label):
+    """'YYYY-MM' -> primer día del mes"""
+    year, month = label.split('-')
+    return date(int(year), int(month), 1)
+
+
+def bounds_from_counts(counts):
+    """(primer mes, último mes) con filas de ``{'YYYY-MM': n}``, como ``fetch_date_bounds``"""
+    labels = sorted(label for label, count in counts.items() if count)
+    if not labels:
+        return None, None
+    return month_start(labels[0]), month_start(labels[-1])
+
+
+def monthly_histogram(counts, start, end):
+    """Histograma para ``balanced_ranges`` con los cortes en límites de mes"""
+    return [(add_months(m, 1) - timedelta(days=1), counts.get(month_label(m), 0))
+            for m in calendar_months(start, end)]
+
+
+def counts_in_range(counts, start, end):
+    """Meses de ``counts`` que empiezan en [start, end) (rangos alineados a meses)"""
+    return {label: count for label, count in counts.items()
+            if start <= month_start(label) < end}
+
+
+def monthly_series(counts, start, end):
+    """Serie ordenada ``[(mes, filas)]`` de todos los meses de [start, end)"""
+    return [(month_label(m), counts.get(month_label(m), 0))
+            for m in calendar_months(start, end)]
@@ -0,0 +1,157 @@
+"""Control adaptativo de lotes y contrapresión para Pipeline-Hash.
+
+``AdaptiveController`` vive en el proceso principal, donde están el reader y
+el collector, y regula dos magnitudes dentro de unos límites:
+
+- Tamaño de lote de lectura: empieza en el mínimo (el primer resultado llega
+  pronto) y se duplica mientras los workers de hashing se quedan sin trabajo,
+  porque entonces la lectura es el cuello de botella y lotes mayores amortizan
+  los viajes a la BD. Cuando el hashing va por detrás se reduce hacia los
+  emails que el hashing procesa en ``BATCH_TARGET_SECONDS``: leer más solo
+  ocuparía memoria.
+- Ventana: sub-lotes en vuelo (leídos y aún no aplicados por el collector).
+  ``acquire()`` bloquea al reader cuando la ventana está llena, lo que es la
+  contrapresión real; crece mientras hay workers parados y, con el hashing
+  saturado, baja hacia lo que se procesa en ``LATENCY_TARGET`` segundos (ley
+  de Little) sin bajar nunca de un sub-lote por worker.
+
+Las colas ``multiprocessing.Queue`` no pueden cambiar de tamaño, así que se
+crean con ``max_window`` como cota dura y la ventana efectiva se aplica aquí.
+"""
+import math
+import threading
+import time
+
+import tracing
+
+MIN_BATCH_SIZE = 1_000
+MAX_BATCH_SIZE = 200_000
+ADJUST_INTERVAL = 0.5  # Segundos entre ajustes
+SMOOTHING = 0.3  # Peso de la última medida en las medias móviles
+BACKPRESSURE_THRESHOLD = 0.2  # Fracción del intervalo con el reader bloqueado
+BATCH_TARGET_SECONDS = 1.0  # Trabajo de hashing que debe cubrir un lote con el hashing saturado
+LATENCY_TARGET = 2.0  # Segundos en vuelo de un sub-lote con el hashing saturado
+
+
+def _ewma(previous, value):
+    return value if previous is None else previous + SMOOTHING * (value - previous)
+
+
+class AdaptiveController:
+    def __init__(self, num_workers, min_batch=MIN_BATCH_SIZE, max_batch=MAX_BATCH_SIZE,
+                 max_window=None, adaptive=True, batch_size=None):
+        """``adaptive=False``: lote ``batch_size`` y ventana ``max_window`` fijos"""
+        self.num_workers = num_workers
+        self.min_batch = min_batch
+        self.max_batch = max(min_batch, max_batch)
+        self.min_window = num_workers
+        self.max_window = max(num_workers, max_window or num_workers * 4)
+        self.adaptive = adaptive
+        if adaptive:
+            self.batch_size = min_batch
+            self.window = min(self.max_window, 2 * num_workers)
+        else:
+            self.batch_size = batch_size or self.max_batch
+            self.window = self.max_window
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.hash_rate = None  # emails/s recogidos por el collector
+        self.fetch_rate = None  # filas/s de la lectura
+        self.blocked_time = 0.0
+        self.adjustments = 0
+        self._last_adjust = time.perf_counter()
+        self._interval_emails = 0
+        self._interval_chunks = 0
+        self._interval_blocked = 0.0
+        self._starved = False
+        self._closed = False
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def next_batch_size(self):
+        """Tamaño del siguiente lote de lectura (se pasa a ``iter_keyset_batches``)"""
+        return self.batch_size
+
+    def record_fetch(self, rows, seconds):
+        if seconds > 0:
+            self.fetch_rate = _ewma(self.fetch_rate, rows / seconds)
+
+    def acquire(self):
+        """Reserva un hueco de la ventana; bloquea al reader si está llena.
+
+        Devuelve False si el collector ya terminó (no queda nadie que libere).
+        """
+        with self._cond:
+            if self.in_flight >= self.window and not self._closed:
+                t0 = time.perf_counter()
+                while self.in_flight >= self.window and not self._closed:
+                    self._cond.wait()
+                waited = time.perf_counter() - t0
+                self.blocked_time += waited
+                self._interval_blocked += waited
+            if self._closed:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, emails):
+        """El collector ha aplicado (en orden) un sub-lote con ``emails`` registros"""
+        with self._cond:
+            self.in_flight -= 1
+            self._interval_emails += emails
+            self._interval_chunks += 1
+            if self.in_flight < self.num_workers:
+                self._starved = True  # Algún worker se ha quedado sin sub-lote
+            self._adjust()
+            self._cond.notify()
+
+    def close(self):
+        """Desbloquea al reader (p. ej. si todos los workers terminaron con error)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _adjust(self):
+        now = time.perf_counter()
+        interval = now - self._last_adjust
+        if interval < ADJUST_INTERVAL:
+            return
+        self.hash_rate = _ewma(self.hash_rate, self._interval_emails / interval)
+        chunk_rate = self._interval_chunks / interval
+        blocked = self._interval_blocked / interval
+
+        if not self.adaptive:
+            pass  # Solo se miden los ritmos
+        elif self._starved and blocked < BACKPRESSURE_THRESHOLD:
+            # La lectura no da abasto: lotes mayores y más margen en vuelo
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+            self.window = min(self.max_window, self.window + self.num_workers)
+        elif blocked >= BACKPRESSURE_THRESHOLD:
+            # El hashing va por detrás: no acumular más de lo necesario
+            target_batch = int(self.hash_rate * BATCH_TARGET_SECONDS)
+            target_batch = max(self.min_batch, min(self.max_batch, target_batch))
+            if self.batch_size > target_batch:
+                self.batch_size = max(target_batch, self.batch_size // 2)
+            target_window = max(self.min_window, math.ceil(chunk_rate * LATENCY_TARGET))
+            if self.window > target_window:
+                self.window -= 1
+
+        if self.adaptive:
+            tracing.counter('batch_size', self.batch_size)
+            tracing.counter('window', self.window)
+            self.adjustments += 1
+        self._last_adjust = now
+        self._interval_emails = 0
+        self._interval_chunks = 0
+        self._interval_blocked = 0.0
+        self._starved = False
+
+    def summary(self):
+        hash_rate = f"{self.hash_rate:.0f} emails/s" if self.hash_rate else "n/d"
+        fetch_rate = f"{self.fetch_rate:.0f} filas/s" if self.fetch_rate else "n/d"
+        return (f"lote final {self.batch_size}, ventana final {self.window} sub-lotes, "
+                f"hashing {hash_rate}, lectura {fetch_rate}, "
+                f"reader bloqueado {self.blocked_time:.2f}s, {self.adjustments} ajustes")
@@ -0,0 +1,48 @@
+"""Planificador del patrón Fork-Join para agregados por clave (p. ej. país).
+
+Hay dos planes posibles:
+
+- ``fanout``: una consulta por clave (``WHERE Country = %s``). Con pocas claves
+  cada tarea es una búsqueda en el índice y se reparten bien entre hilos.
+- ``grouped``: las claves ordenadas se cortan en un rango contiguo por worker y
+  cada uno resuelve su rango con un solo ``GROUP BY``. Con muchas claves evita
+  pagar un round-trip por clave.
+
+La elección se basa en la cardinalidad de la clave respecto al número de workers.
+Los planes ``cost`` (claves desequilibradas: tareas ordenadas por coste
+estimado, claves pequeñas empaquetadas en ``IN (...)`` y robo de trabajo, ver
+forkjoin_scheduler.py) y ``hll`` (conteo aproximado con sketches, ver
+city_sketches.py) nunca se eligen automáticamente: hay que pedirlos de forma
+explícita.
+"""
+
+PLAN_FANOUT = 'fanout'
+PLAN_GROUPED = 'grouped'
+PLAN_HLL = 'hll'
+PLAN_COST = 'cost'
+PLANS = (PLAN_FANOUT, PLAN_GROUPED, PLAN_COST, PLAN_HLL)
+FANOUT_KEYS_PER_WORKER = 4  # Por encima de esto dominan los round-trips
+
+
+def choose_plan(num_keys, num_workers, keys_per_worker=FANOUT_KEYS_PER_WORKER):
+    """``fanout`` si hay pocas claves por worker, ``grouped`` en otro caso"""
+    if num_keys <= keys_per_worker * max(1, num_workers):
+        return PLAN_FANOUT
+    return PLAN_GROUPED
+
+
+def key_ranges(sorted_keys, num_ranges):
+    """Corta claves ya ordenadas (por la BD) en rangos inclusivos ``(desde, hasta)``.
+
+    El orden debe venir de un ``ORDER BY`` en MySQL para que los rangos usen la
+    misma collation que el ``WHERE clave BETWEEN`` que los resuelve.
+    """
+    if not sorted_keys:
+        return []
+    num_ranges = max(1, min(num_ranges, len(sorted_keys)))
+    ranges = []
+    for i in range(num_ranges):
+        lo = i * len(sorted_keys) // num_ranges
+        hi = (i + 1) * len(sorted_keys) // num_ranges - 1
+        ranges.append((sorted_keys[lo], sorted_keys[hi]))
+    return ranges
@@ -0,0 +1,172 @@
+"""Planificación por coste de las tareas Fork-Join con claves desequilibradas.
+
+1. Coste estimado de cada clave: segundos medidos en ejecuciones anteriores
+   (``results/forkjoin-costs-<base>.json``) cuando la clave fue una tarea
+   propia, o sus filas (``COUNT(*) ... GROUP BY`` o el historial) convertidas a
+   segundos con la velocidad de esas tareas. Las claves de un paquete no se
+   miden una a una: repartir el tiempo del paquete les atribuiría el coste fijo
+   de la consulta y las haría parecer más caras de lo que son.
+2. Tareas: las claves grandes van solas; las pequeñas se empaquetan en
+   consultas ``IN (...)`` hasta sumar el coste objetivo de una tarea, para no
+   pagar un round-trip por clave.
+3. Reparto: cada worker tiene su propia cola, cargada con el algoritmo LPT
+   (la tarea más grande al worker menos cargado). Un worker toma primero sus
+   tareas más grandes; cuando se queda sin trabajo roba las más pequeñas del
+   worker con más coste pendiente, de modo que ninguna tarea grande queda para
+   el final mientras los demás esperan.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from database import DB_CONFIG
+from result_store import DEFAULT_RESULTS_DIR
+
+TASKS_PER_WORKER = 4  # Coste objetivo de un paquete: total / (workers * TASKS_PER_WORKER)
+MAX_BATCH_KEYS = 500  # Claves como máximo en un IN (...)
+HISTORY_SMOOTHING = 0.5  # Peso de la última medida en el historial de costes
+
+
+def cost_history_path(results_dir=DEFAULT_RESULTS_DIR, database=None):
+    return os.path.join(results_dir, f"forkjoin-costs-{database or DB_CONFIG['database']}.json")
+
+
+def load_cost_history(path):
+    """``{clave: {'seconds': s, 'rows': n}}`` de ejecuciones anteriores"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cost_history(path, history, measured):
+    """Combina ``{clave: (segundos o None, filas)}`` de esta ejecución con el historial"""
+    for key, (seconds, rows) in measured.items():
+        previous = (history.get(key) or {}).get('seconds')
+        if seconds is not None and previous is not None:
+            seconds = previous + HISTORY_SMOOTHING * (seconds - previous)
+        history[key] = {'seconds': seconds, 'rows': rows}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(history, f)
+    os.replace(tmp, path)
+
+
+def estimate_costs(keys, history, row_counts):
+    """Segundos estimados por clave (medidos si existen, filas si no)"""
+    known = [h for h in history.values() if h.get('rows') and h.get('seconds') is not None]
+    seconds_per_row = (sum(h['seconds'] for h in known) / sum(h['rows'] for h in known)
+                       if known else 1.0)
+    costs = {}
+    for key in keys:
+        entry = history.get(key) or {}
+        if entry.get('seconds') is not None:
+            costs[key] = entry['seconds']
+        else:
+            rows = row_counts.get(key, entry.get('rows')) or 0
+            costs[key] = rows * seconds_per_row
+    return costs
+
+
+class Task:
+    __slots__ = ('keys', 'cost')
+
+    def __init__(self, keys, cost):
+        self.keys = keys
+        self.cost = cost
+
+
+def pack_tasks(costs, num_workers, tasks_per_worker=TASKS_PER_WORKER,
+               max_batch_keys=MAX_BATCH_KEYS):
+    """Tareas ordenadas de mayor a menor coste: claves grandes solas, pequeñas en paquetes"""
+    total = sum(costs.values())
+    target = total / max(1, num_workers * tasks_per_worker)
+    tasks = []
+    batch, batch_cost = [], 0.0
+    for key, cost in sorted(costs.items(), key=lambda kv: kv[1], reverse=True):
+        if cost >= target or target == 0:
+            tasks.append(Task([key], cost))
+            continue
+        if batch and (batch_cost + cost > target or len(batch) >= max_batch_keys):
+            tasks.append(Task(batch, batch_cost))
+            batch, batch_cost = [], 0.0
+        batch.append(key)
+        batch_cost += cost
+    if batch:
+        tasks.append(Task(batch, batch_cost))
+    tasks.sort(key=lambda t: t.cost, reverse=True)
+    return tasks
+
+
+class WorkStealingScheduler:
+    """Ejecuta ``run_task(task)`` en ``num_workers`` hilos con colas propias y robo"""
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self._queues = [deque() for _ in range(num_workers)]
+        self._pending_cost = [0.0] * num_workers
+        self._lock = threading.Lock()
+        self.steals = 0
+        self.busy = [0.0] * num_workers
+
+    def _assign(self, tasks):
+        # LPT: tareas de mayor a menor, cada una al worker con menos coste asignado
+        for task in sorted(tasks, key=lambda t: t.cost, reverse=True):
+            worker = min(range(self.num_workers), key=lambda w: self._pending_cost[w])
+            self._queues[worker].append(task)
+            self._pending_cost[worker] += task.cost
+
+    def _next(self, worker):
+        with self._lock:
+            if self._queues[worker]:
+                task = self._queues[worker].popleft()  # Las propias, de mayor a menor
+            else:
+                victims = [w for w in range(self.num_workers) if self._queues[w]]
+                if not victims:
+                    return None
+                victim = max(victims, key=lambda w: self._pending_cost[w])
+                task = self._queues[victim].pop()  # Robo: la más pequeña de la víctima
+                self.steals += 1
+                worker = victim
+            self._pending_cost[worker] -= task.cost
+            return task
+
+    def run(self, tasks, run_task):
+        """Devuelve la lista de ``(tarea, resultado, segundos)``"""
+        self._assign(tasks)
+        results = []
+        errors = []
+
+        def worker_loop(worker):
+            while True:
+                task = self._next(worker)
+                if task is None:
+                    return
+                t0 = time.perf_counter()
+                try:
+                    result = run_task(task)
+                except Exception as e:
+                    errors.append(e)
+                    return
+                elapsed = time.perf_counter() - t0
+                self.busy[worker] += elapsed
+                results.append((task, result, elapsed))  # list.append es atómico
+
+        threads = [threading.Thread(target=worker_loop, args=(w,), name=f"fj-{w}")
+                   for w in range(self.num_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def imbalance(self):
+        """Tiempo ocupado del worker más cargado respecto a la media (1.0 = perfecto)"""
+        mean = sum(self.busy) / len(self.busy)
+        return max(self.busy) / mean if mean else 1.0
@@ -0,0 +1,139 @@
+"""Caché persistente (en disco) de los resultados de ``hash_intensive``.
+
+El fichero es una tabla hash asociativa por conjuntos de tamaño fijo que se abre
+con ``mmap``: varios procesos pueden leer y escribir a la vez sobre las mismas
+páginas compartidas sin pasar por ningún servidor. Cada registro se direcciona
+por contenido (md5 del email + número de iteraciones) y lleva un CRC32, de modo
+que una escritura concurrente a medias se descarta como un fallo de caché.
+
+Delante del fichero hay una LRU en memoria por proceso para los emails
+repetidos dentro de la misma ejecución.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+
+DEFAULT_PATH = 'hash_cache.bin'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_LRU_SIZE = 10_000
+WAYS = 4  # Registros por conjunto; al llenarse se reemplaza uno de ellos
+
+_MAGIC = b'HCACHE1\0'
+_HEADER = struct.Struct('<8sQI12x')            # magic, num_sets, ways
+_RECORD = struct.Struct('<16sI16s')            # key, iterations, value
+_RECORD_SIZE = _RECORD.size + 4                # + crc32 del registro
+
+
+def email_digest(email):
+    """Clave de contenido de un email (md5 de sus bytes)"""
+    return hashlib.md5(email.encode()).digest()
+
+
+class HashCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 lru_size=DEFAULT_LRU_SIZE):
+        self.path = path
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self.hits_lru = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        if not os.path.exists(path):
+            self._create(path, max_bytes)
+        self._file = open(path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, self.num_sets, self.ways = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un fichero de caché de hashes")
+
+    @staticmethod
+    def _create(path, max_bytes):
+        """Crea el fichero vacío de forma atómica (seguro entre procesos)"""
+        num_sets = max(1, (max_bytes - _HEADER.size) // (_RECORD_SIZE * WAYS))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, num_sets, WAYS))
+            f.truncate(_HEADER.size + num_sets * WAYS * _RECORD_SIZE)
+        os.replace(tmp_path, path)
+
+    def _slots(self, key):
+        """Offsets de los registros del conjunto asociado a ``key``"""
+        set_idx = int.from_bytes(key[:8], 'little') % self.num_sets
+        base = _HEADER.size + set_idx * self.ways * _RECORD_SIZE
+        return [base + w * _RECORD_SIZE for w in range(self.ways)]
+
+    def _read(self, offset):
+        record = self._mm[offset:offset + _RECORD_SIZE]
+        if zlib.crc32(record[:-4]) != int.from_bytes(record[-4:], 'little'):
+            return None  # Vacío o escrito a medias por otro proceso
+        return _RECORD.unpack(record[:-4])
+
+    def get(self, key, iterations):
+        """Devuelve el digest guardado o ``None`` si no está en la caché"""
+        lru_key = (key, iterations)
+        value = self._lru.get(lru_key)
+        if value is not None:
+            self._lru.move_to_end(lru_key)
+            self.hits_lru += 1
+            return value
+
+        for offset in self._slots(key):
+            record = self._read(offset)
+            if record and record[0] == key and record[1] == iterations:
+                self.hits_disk += 1
+                self._remember(lru_key, record[2])
+                return record[2]
+        self.misses += 1
+        return None
+
+    def put(self, key, iterations, value):
+        """Guarda un resultado; si el conjunto está lleno desaloja un registro"""
+        self._remember((key, iterations), value)
+        slots = self._slots(key)
+        victim = None
+        for offset in slots:
+            record = self._read(offset)
+            if record is None or (record[0] == key and record[1] == iterations):
+                victim = offset
+                break
+        if victim is None:
+            # Reemplazo pseudoaleatorio pero determinista dentro del conjunto
+            victim = slots[key[8] % self.ways]
+        packed = _RECORD.pack(key, iterations, value)
+        self._mm[victim:victim + _RECORD_SIZE] = packed + zlib.crc32(packed).to_bytes(4, 'little')
+
+    def get_or_compute(self, email, iterations, compute):
+        """Devuelve ``compute(email)`` usando la caché si ya estaba calculado"""
+        key = email_digest(email)
+        value = self.get(key, iterations)
+        if value is None:
+            value = compute(email)
+            self.put(key, iterations, value)
+        return value
+
+    def _remember(self, lru_key, value):
+        self._lru[lru_key] = value
+        self._lru.move_to_end(lru_key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def stats(self):
+        return {'hits_lru': self.hits_lru, 'hits_disk': self.hits_disk,
+                'misses': self.misses}
+
+    def close(self):
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,74 @@
+"""Sketch HyperLogLog para contar elementos distintos de forma aproximada.
+
+Memoria fija de ``2**precision`` bytes por sketch y error relativo típico de
+``1.04 / sqrt(2**precision)`` (≈1,6 % con la precisión por defecto, 12). Dos
+sketches con la misma precisión se combinan con ``merge`` (máximo registro a
+registro), así que los resultados parciales de cada worker o fragmento pueden
+unirse más tarde sin volver a leer los datos.
+"""
+import hashlib
+import math
+
+DEFAULT_PRECISION = 12
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+_MAGIC = b'HLL1'
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"La precisión debe estar entre {MIN_PRECISION} y {MAX_PRECISION}")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        x = _hash64(value)
+        idx = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        """Une ``other`` en este sketch (unión de conjuntos)"""
+        if other.precision != self.precision:
+            raise ValueError("Solo se pueden unir sketches con la misma precisión")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimación del número de elementos distintos añadidos"""
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Corrección para cardinalidades pequeñas (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return _MAGIC + bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != _MAGIC:
+            raise ValueError("Datos de sketch HyperLogLog no válidos")
+        sketch = cls(data[4])
+        if len(data) != 5 + sketch.m:
+            raise ValueError("Tamaño de sketch HyperLogLog incorrecto")
+        sketch.registers = bytearray(data[5:])
+        return sketch
+
+    def __len__(self):
+        return self.count()
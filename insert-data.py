@@ -1,64 +1,37 @@
 import pandas as pd
-import mysql.connector
-from mysql.connector import Error
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import time
 import threading
+import argparse
+import os
+import tempfile
+import hashlib
+from database import (DatabaseManager, Error, CSV_COLUMN_MAP, DB_COLUMNS, INSERT_CUSTOMERS_SQL,
+                      add_backend_arguments, configure_backend)
+from stream_reader import fetch_numeric_columns, DEFAULT_FETCH_BATCH_SIZE
+from shared_reduce import SharedArrayReducer, chunk_bounds
 
-class DatabaseManager:
-    def __init__(self, host='localhost', database='sumaparalela', 
-                 user='root', password=''):
-        self.host = host
-        self.database = database
-        self.user = user
-        self.password = password
-    
-    def create_connection(self):
-        """Crear conexión a MySQL"""
-        try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
-            return connection
-        except Error as e:
-            print(f"Error conectando a MySQL: {e}")
-            return None
-    
-    def create_customers_table(self):
-        """Crear tabla customers si no existe"""
-        connection = self.create_connection()
-        if connection:
-            try:
-                cursor = connection.cursor()
-                create_table_query = """
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    index_field INT,
-                    customer_id VARCHAR(50),
-                    first_name VARCHAR(100),
-                    last_name VARCHAR(100),
-                    company VARCHAR(200),
-                    city VARCHAR(100),
-                    country VARCHAR(100),
-                    phone_1 VARCHAR(20),
-                    phone_2 VARCHAR(20),
-                    email VARCHAR(150),
-                    subscription_date DATE,
-                    website VARCHAR(200)
-                )
-                """
-                cursor.execute(create_table_query)
-                connection.commit()
-                print("Tabla 'customers' creada exitosamente")
-            except Error as e:
-                print(f"Error creando tabla: {e}")
-            finally:
-                cursor.close()
-                connection.close()
+def clean_customers_chunk(df):
+    """Limpieza vectorizada de un bloque del CSV: columna a columna, sin iterrows"""
+    clean = pd.DataFrame(index=df.index)
+    for csv_col, db_col, width in CSV_COLUMN_MAP:
+        col = df[csv_col] if csv_col in df else pd.Series(None, index=df.index, dtype=object)
+        if db_col == 'index_field':
+            clean[db_col] = pd.to_numeric(col, errors='coerce').fillna(0).astype('int64')
+        elif db_col == 'subscription_date':
+            clean[db_col] = pd.to_datetime(col, errors='coerce')
+        else:
+            clean[db_col] = col.fillna('').astype(str).str.slice(0, width)
+    return clean
+
+def chunk_to_rows(clean):
+    """Tuplas listas para executemany (fechas como date, NaT como NULL)"""
+    dates = clean['subscription_date']
+    columns = [clean[c].tolist() for c in DB_COLUMNS if c != 'subscription_date']
+    date_pos = DB_COLUMNS.index('subscription_date')
+    columns.insert(date_pos, dates.dt.date.astype(object).where(dates.notna(), None).tolist())
+    return list(zip(*columns))
 
 class CSVProcessor:
     def __init__(self, db_manager):
@@ -152,27 +125,243 @@ class CSVProcessor:
         except Exception as e:
             print(f"Error procesando CSV: {e}")
 
+class BulkLoader:
+    """Carga rápida del CSV: limpieza vectorizada y varios escritores en paralelo.
+    
+    - ``executemany``: INSERT multi-fila por sub-lotes de ``INSERT_BATCH_ROWS``.
+    - ``infile``: cada bloque limpio se vuelca a un fichero temporal y se carga
+      con ``LOAD DATA LOCAL INFILE`` (requiere ``local_infile`` en el servidor).
+    
+    El fichero se lee en streaming por bloques: el hilo principal lee y limpia
+    el bloque siguiente mientras los escritores insertan los anteriores, y como
+    mucho hay ``2 * num_writers`` bloques en vuelo. Con ``max_memory_mb`` el
+    tamaño de bloque se calcula para no superar ese techo.
+    
+    Con ``checkpoint=True`` cada bloque registra su posición en la tabla
+    ``ingest_checkpoints`` dentro de la misma transacción que sus filas: o
+    quedan confirmadas ambas cosas o ninguna. Una nueva ejecución salta los
+    bloques ya confirmados (reanudación idempotente).
+    """
+    MODES = ('executemany', 'infile')
+    INSERT_BATCH_ROWS = 2_000  # Filas por sentencia (respeta max_allowed_packet)
+    MEMORY_SAMPLE_ROWS = 2_000  # Filas leídas para estimar la memoria por fila
+    
+    def __init__(self, db_manager, num_writers=4, chunk_rows=50_000, mode='executemany',
+                 max_memory_mb=None, checkpoint=False):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo desconocido: {mode}")
+        if mode == 'infile' and not db_manager.backend.supports_load_infile:
+            raise ValueError(f"El motor {db_manager.backend.name} no admite LOAD DATA "
+                             f"LOCAL INFILE (usar el modo executemany)")
+        self.db_manager = db_manager
+        self.num_writers = num_writers
+        self.chunk_rows = chunk_rows
+        self.mode = mode
+        self.max_memory_mb = max_memory_mb
+        self.checkpoint = checkpoint
+        if db_manager.pool.size < num_writers:
+            db_manager.pool.resize(num_writers)
+    
+    def _chunk_rows_for_budget(self, csv_file_path):
+        """Filas por bloque para que los bloques en memoria quepan en ``max_memory_mb``"""
+        sample = pd.read_csv(csv_file_path, nrows=self.MEMORY_SAMPLE_ROWS)
+        if sample.empty:
+            return self.chunk_rows
+        raw_bytes = sample.memory_usage(deep=True).sum()
+        clean_bytes = clean_customers_chunk(sample).memory_usage(deep=True).sum()
+        bytes_per_row = (raw_bytes + clean_bytes) / len(sample)
+        # Bloques en vuelo + el que se está leyendo/limpiando
+        chunks_in_memory = 2 * self.num_writers + 1
+        budget = self.max_memory_mb * 1024 * 1024
+        return max(1_000, int(budget / (bytes_per_row * chunks_in_memory)))
+    
+    def _run_statement(self, query, params):
+        connection = self.db_manager.create_connection()
+        if not connection:
+            raise Error("Sin conexión")
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall() if cursor.with_rows else None
+            connection.commit()
+            cursor.close()
+        finally:
+            connection.close()
+        return rows
+    
+    def _committed_chunks(self, source):
+        """(filas por bloque de la carga anterior, {fila_inicial: filas}) ya confirmados"""
+        rows = self._run_statement(
+            "SELECT first_row, row_count, chunk_rows FROM ingest_checkpoints "
+            "WHERE source = %s", (source,))
+        chunk_rows = rows[0][2] if rows else None
+        return chunk_rows, {first_row: row_count for first_row, row_count, _ in rows}
+    
+    def _record_chunk(self, cursor, progress, first_row, row_count):
+        """Registra el bloque en la transacción en curso (``progress``: fuente, ruta, filas/bloque)"""
+        source, source_path, chunk_rows = progress
+        cursor.execute(
+            "INSERT INTO ingest_checkpoints (source, source_path, first_row, row_count, chunk_rows) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (source, source_path[-255:], first_row, row_count, chunk_rows)
+        )
+    
+    def _insert_rows(self, clean, first_row, progress):
+        connection = self.db_manager.create_connection()
+        if not connection:
+            raise Error("Sin conexión")
+        try:
+            cursor = connection.cursor()
+            rows = chunk_to_rows(clean)
+            for i in range(0, len(rows), self.INSERT_BATCH_ROWS):
+                cursor.executemany(INSERT_CUSTOMERS_SQL, rows[i:i + self.INSERT_BATCH_ROWS])
+            if progress:
+                self._record_chunk(cursor, progress, first_row, len(clean))
+            connection.commit()
+            cursor.close()
+        except Exception:
+            connection.rollback()  # El bloque se inserta entero o nada
+            raise
+        finally:
+            connection.close()
+        return len(clean)
+    
+    def _load_infile(self, clean, first_row, progress):
+        # LOAD DATA usa \ como escape y tabuladores/saltos como separadores
+        out = clean.copy()
+        for col in DB_COLUMNS:
+            if pd.api.types.is_string_dtype(out[col]):
+                out[col] = (out[col].str.replace('\\', '\\\\', regex=False)
+                            .str.replace('\t', ' ', regex=False)
+                            .str.replace('\n', ' ', regex=False))
+        fd, path = tempfile.mkstemp(prefix=f'customers-{first_row}-', suffix='.tsv')
+        os.close(fd)
+        connection = None
+        try:
+            out.to_csv(path, sep='\t', header=False, index=False, na_rep='\\N',
+                       date_format='%Y-%m-%d', lineterminator='\n')
+            connection = self.db_manager.create_connection()
+            if not connection:
+                raise Error("Sin conexión")
+            cursor = connection.cursor()
+            cursor.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE customers "
+                "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                f"({', '.join(DB_COLUMNS)})",
+                (path,)
+            )
+            if progress:
+                self._record_chunk(cursor, progress, first_row, len(clean))
+            connection.commit()
+            cursor.close()
+        except Exception:
+            if connection:
+                connection.rollback()
+            raise
+        finally:
+            if connection:
+                connection.close()
+            os.remove(path)
+        return len(clean)
+    
+    def load_csv(self, csv_file_path, restart=False):
+        """Carga el CSV en streaming y devuelve estadísticas (filas, segundos, filas/s).
+        
+        Con checkpoints, ``restart=True`` olvida el progreso de cargas anteriores.
+        """
+        write = self._insert_rows if self.mode == 'executemany' else self._load_infile
+        chunk_rows = self.chunk_rows
+        if self.max_memory_mb:
+            chunk_rows = self._chunk_rows_for_budget(csv_file_path)
+            print(f"Techo de memoria {self.max_memory_mb} MB: bloques de {chunk_rows} filas")
+        
+        progress = None
+        committed = {}
+        resume_row = 0
+        if self.checkpoint:
+            self.db_manager.create_checkpoint_table()
+            source_path = os.path.abspath(csv_file_path)
+            source = hashlib.sha1(source_path.encode()).hexdigest()
+            if restart:
+                self._run_statement("DELETE FROM ingest_checkpoints WHERE source = %s",
+                                    (source,))
+            previous_chunk_rows, committed = self._committed_chunks(source)
+            if previous_chunk_rows:
+                chunk_rows = previous_chunk_rows  # Los bloques deben coincidir con la carga previa
+            # Prefijo contiguo ya confirmado: esas filas ni siquiera se parsean
+            while resume_row in committed:
+                resume_row += chunk_rows
+            if committed:
+                print(f"Reanudando: {sum(committed.values())} filas ya confirmadas, "
+                      f"lectura desde la fila {resume_row}")
+            progress = (source, source_path, chunk_rows)
+        
+        in_flight = threading.BoundedSemaphore(2 * self.num_writers)
+        total_rows = 0
+        failed = []
+        
+        def write_chunk(clean, first_row):
+            try:
+                return write(clean, first_row, progress)
+            finally:
+                in_flight.release()
+        
+        t0 = time.perf_counter()
+        # skiprows como función: una lista de filas a saltar ocuparía memoria O(n)
+        reader = pd.read_csv(csv_file_path, chunksize=chunk_rows,
+                             skiprows=(lambda i: 0 < i <= resume_row) if resume_row else None)
+        with ThreadPoolExecutor(max_workers=self.num_writers) as executor:
+            futures = {}
+            for k, df in enumerate(reader):
+                first_row = resume_row + k * chunk_rows
+                if first_row in committed:
+                    continue  # Confirmado en una ejecución anterior
+                clean = clean_customers_chunk(df)
+                del df
+                in_flight.acquire()  # Contrapresión: no leer más de la cuenta
+                futures[executor.submit(write_chunk, clean, first_row)] = first_row
+                del clean
+            
+            for future, first_row in futures.items():
+                try:
+                    total_rows += future.result()
+                except Exception as e:
+                    print(f"Error cargando bloque desde la fila {first_row}: {e}")
+                    failed.append(first_row)
+        elapsed = time.perf_counter() - t0
+        
+        stats = {'mode': self.mode, 'rows': total_rows, 'seconds': elapsed,
+                 'rows_per_second': total_rows / elapsed if elapsed else 0.0,
+                 'chunk_rows': chunk_rows, 'failed_chunks': failed}
+        print(f"[{self.mode}] {total_rows} registros en {elapsed:.2f}s "
+              f"({stats['rows_per_second']:,.0f} registros/s, {self.num_writers} escritores)")
+        if failed and self.checkpoint:
+            print("Hay bloques sin confirmar: vuelve a ejecutar la carga para reanudarla")
+        return stats
+
 class ParallelSummer:
     def __init__(self, db_manager):
         self.db_manager = db_manager
     
-    def get_numeric_data(self, limit=1000000):
-        """Obtener datos numéricos para suma (usando Index como ejemplo)"""
+    def get_numeric_data(self, limit=1000000, column='index_field', dtype=np.int64,
+                         batch_size=DEFAULT_FETCH_BATCH_SIZE):
+        """Obtener datos numéricos para suma (usando Index como ejemplo) como array NumPy"""
+        columns = self.get_numeric_columns((column,), limit, dtype, batch_size)
+        return columns.get(column, np.empty(0, dtype=dtype))
+    
+    def get_numeric_columns(self, columns, limit=1000000, dtype=np.int64,
+                            batch_size=DEFAULT_FETCH_BATCH_SIZE):
+        """Varias columnas numéricas a arrays tipados con fetchmany: {columna: array}"""
         connection = self.db_manager.create_connection()
         if not connection:
-            return []
+            return {}
         
         try:
-            cursor = connection.cursor()
-            query = f"SELECT index_field FROM customers LIMIT {limit}"
-            cursor.execute(query)
-            results = cursor.fetchall()
-            return [row[0] for row in results if row[0] is not None]
+            return fetch_numeric_columns(connection, columns, limit, dtype, batch_size)
         except Error as e:
             print(f"Error obteniendo datos: {e}")
-            return []
+            return {}
         finally:
-            cursor.close()
             connection.close()
     
     def sum_chunk(self, chunk):
@@ -181,11 +370,10 @@ class ParallelSummer:
     
     def parallel_sum_threads(self, data, num_threads=4):
         """Suma paralela usando threads"""
-        if not data:
+        if len(data) == 0:
             return 0
         
-        chunk_size = len(data) // num_threads
-        chunks = [data[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
+        chunks = [data[start:end] for start, end in chunk_bounds(len(data), num_threads)]
         
         with ThreadPoolExecutor(max_workers=num_threads) as executor:
             futures = [executor.submit(self.sum_chunk, chunk) for chunk in chunks]
@@ -195,68 +383,125 @@ class ParallelSummer:
     
     def parallel_sum_processes(self, data, num_processes=4):
         """Suma paralela usando procesos"""
-        if not data:
+        if len(data) == 0:
             return 0
         
-        chunk_size = len(data) // num_processes
-        chunks = [data[i:i+chunk_size] for i in range(0, len(data), chunk_size)]
+        chunks = [data[start:end] for start, end in chunk_bounds(len(data), num_processes)]
         
         with ProcessPoolExecutor(max_workers=num_processes) as executor:
-            futures = [executor.submit(self.sum_chunk, chunk) for chunk in chunks]
+            # sum y no self.sum_chunk: el método arrastraría el pool de conexiones,
+            # que no se puede enviar a otro proceso
+            futures = [executor.submit(sum, chunk) for chunk in chunks]
             results = [future.result() for future in futures]
         
         return sum(results)
     
+    def parallel_reduce_shared(self, data, num_processes=4, ops=('sum',)):
+        """Reducciones con procesos sobre memoria compartida (datos copiados una vez)"""
+        if len(data) == 0:
+            return {}
+        
+        with SharedArrayReducer(data, num_processes) as reducer:
+            return {op: reducer.reduce(op) for op in ops}
+    
     def benchmark_sums(self, data):
         """Comparar diferentes métodos de suma"""
         print(f"\n=== BENCHMARK DE SUMAS ({len(data)} elementos) ===")
         
+        # Los métodos en Python puro trabajan sobre una lista; NumPy y la memoria
+        # compartida, sobre el array leído de la BD (sin copia adicional)
+        np_data = np.asarray(data)
+        data = np_data.tolist()
+        
         # Suma secuencial
-        start_time = time.time()
+        start_time = time.perf_counter()
         sequential_sum = sum(data)
-        sequential_time = time.time() - start_time
+        sequential_time = time.perf_counter() - start_time
         print(f"Suma secuencial: {sequential_sum} - Tiempo: {sequential_time:.4f}s")
         
         # Suma paralela con threads
-        start_time = time.time()
+        start_time = time.perf_counter()
         thread_sum = self.parallel_sum_threads(data, 4)
-        thread_time = time.time() - start_time
+        thread_time = time.perf_counter() - start_time
         print(f"Suma con threads: {thread_sum} - Tiempo: {thread_time:.4f}s")
         
         # Suma paralela con procesos
-        start_time = time.time()
+        start_time = time.perf_counter()
         process_sum = self.parallel_sum_processes(data, 4)
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         print(f"Suma con procesos: {process_sum} - Tiempo: {process_time:.4f}s")
         
+        # Memoria compartida: el pool y la copia se crean una vez y se reutilizan
+        start_time = time.perf_counter()
+        reducer = SharedArrayReducer(np_data, 4)
+        setup_time = time.perf_counter() - start_time
+        try:
+            start_time = time.perf_counter()
+            shared_sum = reducer.sum()
+            shared_time = time.perf_counter() - start_time
+            print(f"Suma con memoria compartida: {shared_sum} - Tiempo: {shared_time:.4f}s "
+                  f"(preparación {setup_time:.4f}s)")
+            
+            start_time = time.perf_counter()
+            minimo, maximo, media = reducer.min(), reducer.max(), reducer.mean()
+            counts, edges = reducer.histogram()
+            stats_time = time.perf_counter() - start_time
+            print(f"Mín/máx/media/histograma con memoria compartida: {minimo}/{maximo}/"
+                  f"{media:.2f}/{counts.tolist()} - Tiempo: {stats_time:.4f}s")
+        finally:
+            reducer.close()
+        
         # Suma con NumPy (optimizada)
-        np_data = np.array(data)
-        start_time = time.time()
+        start_time = time.perf_counter()
         numpy_sum = np.sum(np_data)
-        numpy_time = time.time() - start_time
+        numpy_time = time.perf_counter() - start_time
         print(f"Suma con NumPy: {int(numpy_sum)} - Tiempo: {numpy_time:.4f}s")
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Carga de customers y sumas paralelas")
+    # Cambiar por la ruta de tu archivo CSV
+    parser.add_argument('--csv', default='customers-1000000.csv')
+    parser.add_argument('--mode', choices=('legacy',) + BulkLoader.MODES,
+                        default='executemany',
+                        help="legacy: lotes de 500 filas con iterrows; executemany/infile: "
+                             "carga rápida vectorizada con varios escritores")
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    parser.add_argument('--max-memory-mb', type=int, default=None,
+                        help="techo de memoria para los bloques en vuelo (ajusta --chunk-rows)")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="registrar cada bloque confirmado y reanudar desde ahí")
+    parser.add_argument('--restart', action='store_true',
+                        help="con --checkpoint, ignorar el progreso de cargas anteriores")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+    
     # Configurar base de datos
     db_manager = DatabaseManager(
         host='localhost',
         database='sumaparalela',  # Cambia por tu base de datos
         user='root',
-        password=''  # Cambia por tu password
+        password='',  # Cambia por tu password
+        allow_local_infile=(args.mode == 'infile')
     )
     
     # Crear tabla
     db_manager.create_customers_table()
     
-    # Procesar CSV
-    csv_processor = CSVProcessor(db_manager)
-    
-    # Cambiar por la ruta de tu archivo CSV
-    csv_file_path = 'customers-1000000.csv'  
-    
     print("=== INSERTANDO DATOS EN LOTES ===")
-    csv_processor.process_csv_in_batches(csv_file_path, batch_size=500)
+    if args.mode == 'legacy':
+        # Procesar CSV
+        csv_processor = CSVProcessor(db_manager)
+        csv_processor.process_csv_in_batches(args.csv, batch_size=500)
+    else:
+        loader = BulkLoader(db_manager, args.writers, args.chunk_rows, args.mode,
+                            args.max_memory_mb, args.checkpoint)
+        loader.load_csv(args.csv, restart=args.restart)
+    
+    # Índices secundarios después de la carga (más rápido que mantenerlos al insertar)
+    db_manager.ensure_indexes()
     
     # Realizar sumas paralelas
     print("\n=== REALIZANDO SUMAS PARALELAS ===")
@@ -266,7 +511,7 @@ def main():
     print("Obteniendo datos de la base de datos...")
     numeric_data = summer.get_numeric_data(1000000)
     
-    if numeric_data:
+    if len(numeric_data):
         print(f"Datos obtenidos: {len(numeric_data)} registros")
         summer.benchmark_sums(numeric_data)
     else:
@@ -0,0 +1,283 @@
+"""Agregados de Fork-Join y BSP actualizados de forma incremental.
+
+Cada agregado guarda en ``results/<nombre>-<base>.json`` su estado parcial
+(pares país/ciudad, filas por mes y país) junto con la marca de agua: el
+``MAX(id)`` hasta el que está calculado. En la siguiente ejecución solo se leen las filas
+con ``id`` por encima de la marca, repartidas en rangos entre varios hilos
+(fork), y se unen al estado guardado (join).
+
+Se recalcula todo desde cero cuando el estado guardado no es fiable:
+
+- ``table_changes.version`` cambió: los triggers de
+  ``DatabaseManager.ensure_change_tracking`` lo incrementan en cada UPDATE o
+  DELETE sobre customers.
+- ``COUNT(*)`` de las filas con ``id <= marca`` no coincide con el guardado
+  (borrados sin triggers, ``TRUNCATE``, tabla recreada o transacciones que
+  confirmaron ids bajos después de la última ejecución).
+- Cambió la base de datos, el formato o no hay estado previo.
+
+El ``COUNT(*)`` recorre solo el índice primario; el resto del coste es
+proporcional a las filas nuevas.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DB_CONFIG, Error, get_backend, get_pool
+from shared_reduce import chunk_bounds
+
+FORMAT_VERSION = 3
+DEFAULT_RESULTS_DIR = 'results'
+MIN_RANGE_ROWS = 10_000  # Ids por tarea como mínimo al repartir las filas nuevas
+
+MODE_FULL = 'completo'
+MODE_INCREMENTAL = 'incremental'
+MODE_UNCHANGED = 'sin cambios'
+
+
+def change_version(conn):
+    """Contador de UPDATE/DELETE sobre customers (None sin control de cambios)"""
+    try:
+        row = conn.query_one("SELECT version FROM table_changes WHERE table_name = 'customers'")
+    except Error:
+        return None
+    return row[0] if row else None
+
+
+class ResultStore:
+    def __init__(self, directory=DEFAULT_RESULTS_DIR, database=None):
+        self.directory = directory
+        self.database = database or DB_CONFIG['database']
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}-{self.database}.json")
+
+    def load(self, name):
+        try:
+            with open(self.path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name, entry):
+        """Escritura atómica: un fallo a mitad deja el estado anterior intacto"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+
+class IncrementalAggregate:
+    """Agregado cuyo estado se obtiene por rangos de ``id`` y se une con ``merge``"""
+    name = None
+
+    def empty(self):
+        raise NotImplementedError
+
+    def delta(self, conn, after_id, until_id):
+        """Estado parcial de las filas con ``after_id < id <= until_id``"""
+        raise NotImplementedError
+
+    def merge(self, state, partial):
+        raise NotImplementedError
+
+    def encode(self, state):
+        return state
+
+    def decode(self, data):
+        return data
+
+
+def _first_spelling(names, key, value):
+    """Grafía ya vista de ``value`` según la collation (``names``: clave -> grafía)"""
+    if value is None:
+        return None
+    return names.setdefault(key(value), value)
+
+
+class CitiesByCountry(IncrementalAggregate):
+    """Ciudades distintas por país; el estado es ``{país: set(claves de ciudad)}``.
+
+    Ciudades y países se comparan con la collation del motor
+    (``backend.text_key``): en MySQL 'París', 'paris' y 'Paris' son una sola
+    ciudad, igual que en ``COUNT(DISTINCT City)`` del plan fanout.
+    """
+    name = 'cities_by_country'
+
+    def empty(self):
+        return {}
+
+    def delta(self, conn, after_id, until_id):
+        key = get_backend().text_key
+        partial = {}
+        for country, city in conn.query("SELECT DISTINCT Country, City FROM customers "
+                                        "WHERE id > %s AND id <= %s", (after_id, until_id)):
+            cities = partial.setdefault(country, set())
+            if city is not None:
+                cities.add(key(city))
+        return partial
+
+    def merge(self, state, partial):
+        key = get_backend().text_key
+        # Un país que la collation iguala a uno ya guardado se une a ese
+        names = {key(country): country for country in state if country is not None}
+        for country, cities in partial.items():
+            country = _first_spelling(names, key, country)
+            state.setdefault(country, set()).update(cities)
+        return state
+
+    def encode(self, state):
+        # Lista de pares para conservar el país NULL (una clave JSON no puede ser null)
+        return [[country, sorted(cities)] for country, cities in state.items()]
+
+    def decode(self, data):
+        return {country: set(cities) for country, cities in data}
+
+    @staticmethod
+    def counts(state):
+        """``{país: ciudades distintas}`` como ``COUNT(DISTINCT City)`` (NULL no cuenta)"""
+        return {country: (len(cities) if country is not None else 0)
+                for country, cities in state.items()}
+
+
+class MonthlyCountryCounts(IncrementalAggregate):
+    """Filas por mes de ``subscription_date`` y país; el estado es ``{'YYYY-MM': {país: n}}``"""
+    name = 'monthly_country_counts'
+
+    def empty(self):
+        return {}
+
+    def delta(self, conn, after_id, until_id):
+        rows = conn.query(
+            "SELECT YEAR(subscription_date), MONTH(subscription_date), Country, COUNT(*) "
+            "FROM customers WHERE id > %s AND id <= %s AND subscription_date IS NOT NULL "
+            "GROUP BY YEAR(subscription_date), MONTH(subscription_date), Country",
+            (after_id, until_id))
+        partial = {}
+        for year, month, country, count in rows:
+            partial.setdefault(f"{int(year):04d}-{int(month):02d}", {})[country] = count
+        return partial
+
+    def merge(self, state, partial):
+        key = get_backend().text_key
+        # Como en CitiesByCountry: 'peru' se suma al 'Peru' ya guardado, igual
+        # que en el GROUP BY Country de un recálculo completo
+        names = {key(country): country for countries in state.values()
+                 for country in countries if country is not None}
+        for label, countries in partial.items():
+            month = state.setdefault(label, {})
+            for country, count in countries.items():
+                country = _first_spelling(names, key, country)
+                month[country] = month.get(country, 0) + count
+        return state
+
+    def encode(self, state):
+        # Ternas (mes, país, n): el país NULL no puede ser clave JSON
+        return [[label, country, count] for label, countries in state.items()
+                for country, count in countries.items()]
+
+    def decode(self, data):
+        state = {}
+        for label, country, count in data:
+            state.setdefault(label, {})[country] = count
+        return state
+
+
+def _count_upto(conn, until_id):
+    return conn.query_one("SELECT COUNT(*) FROM customers WHERE id <= %s", (until_id,))[0]
+
+
+def _stale_reason(conn, entry, aggregate, source, version, max_id):
+    """Motivo para recalcular todo, o None si el estado guardado sirve"""
+    if entry is None:
+        return "sin estado previo"
+    if entry.get('format') != FORMAT_VERSION or entry.get('aggregate') != aggregate.name:
+        return "formato distinto"
+    if entry.get('source') != source:
+        return "otra base de datos"
+    if version is None or entry.get('change_version') != version:
+        return "UPDATE/DELETE desde la última ejecución" if version is not None \
+            else "sin control de cambios"
+    if max_id < entry['watermark'] or _count_upto(conn, entry['watermark']) != entry['rows']:
+        return "filas borradas o tabla recreada"
+    return None
+
+
+def _delta_task(aggregate, after_id, until_id):
+    """Tarea del fork: estado parcial y filas de un rango de ids"""
+    with get_pool().connection() as conn:
+        partial = aggregate.delta(conn, after_id, until_id)
+        count = conn.query_one("SELECT COUNT(*) FROM customers WHERE id > %s AND id <= %s",
+                               (after_id, until_id))[0]
+    return partial, count
+
+
+def id_ranges(after_id, until_id, parts, min_rows=MIN_RANGE_ROWS):
+    """Rangos ``(desde, hasta]`` disjuntos que cubren ``(after_id, until_id]``"""
+    span = until_id - after_id
+    if span <= 0:
+        return []
+    parts = max(1, min(parts, -(-span // min_rows)))
+    return [(after_id + lo, after_id + hi) for lo, hi in chunk_bounds(span, parts)]
+
+
+def refresh(aggregate, store=None, num_workers=1):
+    """Pone al día ``aggregate``; devuelve ``(estado, info)``.
+
+    ``info`` incluye el modo (completo, incremental o sin cambios), el motivo
+    de un recálculo completo, la marca de agua y las filas leídas.
+    """
+    store = store or ResultStore()
+    source = get_backend().describe(DB_CONFIG)
+    with get_pool().connection() as conn:
+        version = change_version(conn)
+        max_id = conn.query_one("SELECT MAX(id) FROM customers")[0] or 0
+        entry = store.load(aggregate.name)
+        reason = _stale_reason(conn, entry, aggregate, source, version, max_id)
+
+    if reason is None:
+        state = aggregate.decode(entry['state'])
+        after_id, rows = entry['watermark'], entry['rows']
+    else:
+        state = aggregate.empty()
+        after_id, rows = 0, 0
+
+    ranges = id_ranges(after_id, max_id, num_workers)
+    new_rows = 0
+    if ranges:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            # Fork: un rango de ids nuevo por hilo; join: unión de los parciales
+            for partial, count in executor.map(lambda r: _delta_task(aggregate, *r), ranges):
+                state = aggregate.merge(state, partial)
+                new_rows += count
+
+    if reason is not None:
+        mode = MODE_FULL
+    else:
+        mode = MODE_INCREMENTAL if new_rows else MODE_UNCHANGED
+    if mode != MODE_UNCHANGED or entry.get('watermark') != max_id:
+        store.save(aggregate.name, {
+            'format': FORMAT_VERSION,
+            'aggregate': aggregate.name,
+            'source': source,
+            'watermark': max_id,
+            'rows': rows + new_rows,
+            'change_version': version,
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'state': aggregate.encode(state),
+        })
+    return state, {'mode': mode, 'reason': reason, 'watermark': max_id,
+                   'previous_watermark': after_id, 'new_rows': new_rows,
+                   'tasks': len(ranges)}
+
+
+def describe_refresh(info):
+    """Texto corto para los scripts"""
+    text = f"{info['mode']}"
+    if info['reason']:
+        text += f" ({info['reason']})"
+    return (f"{text}, {info['new_rows']} filas leídas en {info['tasks']} tareas, "
+            f"marca de agua {info['previous_watermark']} -> {info['watermark']}")
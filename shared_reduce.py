@@ -0,0 +1,143 @@
+"""Reducciones paralelas sobre un array NumPy en memoria compartida.
+
+Los datos se copian una sola vez a un bloque de ``shared_memory``; un pool de
+procesos persistente se conecta a ese bloque al arrancar y cada tarea recibe
+solo los límites ``(inicio, fin)`` de su fragmento, sobre el que trabaja con
+una vista sin copia. Así se evita serializar los datos en cada llamada y
+recrear el pool, que es lo que hace más lento que ``sum`` el reparto de listas
+a un ``ProcessPoolExecutor``.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+REDUCTIONS = ('sum', 'min', 'max', 'mean', 'histogram')
+DEFAULT_BINS = 10
+
+# Estado de cada proceso del pool (se fija en el initializer)
+_worker_shm = None
+_worker_array = None
+
+
+def chunk_bounds(length, parts):
+    """Límites ``(inicio, fin)`` de ``parts`` fragmentos que difieren como mucho en 1.
+
+    A diferencia de ``range(0, n, n // parts)`` no deja un fragmento sobrante
+    con el resto de la división.
+    """
+    parts = max(1, min(parts, length))
+    base, extra = divmod(length, parts)
+    bounds = []
+    start = 0
+    for i in range(parts):
+        end = start + base + (1 if i < extra else 0)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def _attach(name, length, dtype):
+    """Initializer del pool: vista del bloque compartido en este proceso"""
+    global _worker_shm, _worker_array
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_array = np.ndarray((length,), dtype=dtype, buffer=_worker_shm.buf)
+
+
+def _reduce_chunk(op, start, end, bins=None, value_range=None):
+    """Reducción parcial de ``array[start:end]`` (tarea de un worker)"""
+    view = _worker_array[start:end]
+    if op == 'sum':
+        return view.sum(dtype=_accumulator(view.dtype))
+    if op == 'min':
+        return view.min()
+    if op == 'max':
+        return view.max()
+    if op == 'mean':
+        return view.sum(dtype=np.float64), len(view)
+    if op == 'histogram':
+        counts, _ = np.histogram(view, bins=bins, range=value_range)
+        return counts
+    raise ValueError(f"Reducción desconocida: {op}")
+
+
+def _accumulator(dtype):
+    """Tipo acumulador sin desbordamiento para enteros pequeños"""
+    if np.issubdtype(dtype, np.integer):
+        return np.int64 if np.issubdtype(dtype, np.signedinteger) else np.uint64
+    return np.float64
+
+
+class SharedArrayReducer:
+    def __init__(self, data, num_workers=None, dtype=None):
+        """Copia ``data`` a memoria compartida y arranca el pool de procesos"""
+        array = np.asarray(data, dtype=dtype)
+        self.length = len(array)
+        self.dtype = array.dtype
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray((self.length,), dtype=self.dtype, buffer=self._shm.buf)
+        self.array[:] = array
+        self._bounds = chunk_bounds(self.length, self.num_workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers, initializer=_attach,
+            initargs=(self._shm.name, self.length, self.dtype.str))
+
+    def _map(self, op, *args):
+        futures = [self._executor.submit(_reduce_chunk, op, start, end, *args)
+                   for start, end in self._bounds]
+        return [f.result() for f in futures]
+
+    def sum(self):
+        if not self.length:
+            return 0
+        return sum(self._map('sum')).item()
+
+    def min(self):
+        if not self.length:
+            raise ValueError("min de un array vacío")
+        return min(self._map('min')).item()
+
+    def max(self):
+        if not self.length:
+            raise ValueError("max de un array vacío")
+        return max(self._map('max')).item()
+
+    def mean(self):
+        partials = self._map('mean') if self.length else []
+        total = sum(s for s, _ in partials)
+        count = sum(n for _, n in partials)
+        return float(total / count) if count else float('nan')
+
+    def histogram(self, bins=DEFAULT_BINS, value_range=None):
+        """Como ``np.histogram``: devuelve ``(conteos, bordes)``.
+
+        Sin ``value_range`` se calcula antes el mínimo y el máximo para que
+        todos los workers usen los mismos bordes.
+        """
+        if value_range is None:
+            value_range = (self.min(), self.max()) if self.length else (0, 1)
+        edges = np.histogram_bin_edges([], bins=bins, range=value_range)
+        if not self.length:
+            return np.zeros(bins, dtype=np.int64), edges
+        counts = sum(self._map('histogram', bins, value_range))
+        return counts, edges
+
+    def reduce(self, op, **kwargs):
+        """Reducción por nombre (uno de ``REDUCTIONS``)"""
+        if op not in REDUCTIONS:
+            raise ValueError(f"Reducción desconocida: {op}")
+        return getattr(self, op)(**kwargs)
+
+    def close(self):
+        self._executor.shutdown()
+        del self.array  # liberar la vista antes de cerrar el bloque
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,87 @@
+"""Etapa de shuffle compartida por los pipelines serial y paralelo.
+
+Un único particionador (md5 del email módulo ``NUM_PARTITIONS``) decide la
+partición de cada registro, y ``SpillWriter`` añade los registros de cada
+partición, junto con su digest, a su propio fichero de solo-añadido. Así
+ambas versiones producen exactamente las mismas particiones y los consumidores
+posteriores pueden procesarlas en paralelo sin volver a leer MySQL.
+
+Formato de cada línea: ``email<TAB>digest_hex``.
+"""
+import hashlib
+import os
+
+NUM_PARTITIONS = 4
+DEFAULT_SPILL_DIR = 'spill'
+
+
+def partition_for(email, num_partitions=NUM_PARTITIONS):
+    """Partición de un email (misma función en todas las versiones)"""
+    return int.from_bytes(hashlib.md5(email.encode()).digest(), 'big') % num_partitions
+
+
+def partition_path(directory, partition):
+    return os.path.join(directory, f"part-{partition:05d}.tsv")
+
+
+class SpillWriter:
+    def __init__(self, directory=DEFAULT_SPILL_DIR, num_partitions=NUM_PARTITIONS,
+                 reset=True):
+        """Abre un fichero por partición; ``reset`` descarta los de una ejecución previa"""
+        self.directory = directory
+        self.num_partitions = num_partitions
+        self.counts = [0] * num_partitions
+        os.makedirs(directory, exist_ok=True)
+        mode = 'w' if reset else 'a'
+        self._files = [open(partition_path(directory, p), mode, encoding='utf-8')
+                       for p in range(num_partitions)]
+
+    def write(self, partition, records):
+        """Añade ``(email, digest)`` al fichero de la partición indicada"""
+        lines = [f"{email}\t{digest.hex()}\n" for email, digest in records]
+        self._files[partition].writelines(lines)
+        self.counts[partition] += len(lines)
+
+    def write_buckets(self, buckets):
+        """Añade una lista de registros por partición (como la de ``process_batch``)"""
+        for partition, records in enumerate(buckets):
+            if records:
+                self.write(partition, records)
+
+    def flush(self):
+        for f in self._files:
+            f.flush()
+
+    def sync(self):
+        """Fuerza a disco lo escrito y devuelve el tamaño en bytes de cada partición"""
+        sizes = []
+        for f in self._files:
+            f.flush()
+            os.fsync(f.fileno())
+            sizes.append(os.fstat(f.fileno()).st_size)
+        return sizes
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def truncate_partitions(directory, sizes):
+    """Recorta cada partición a ``sizes`` (descarta lo escrito tras un checkpoint)"""
+    for partition, size in enumerate(sizes):
+        with open(partition_path(directory, partition), 'r+b') as f:
+            f.truncate(size)
+
+
+def read_partition(directory, partition):
+    """Recorre los registros ``(email, digest)`` de una partición ya escrita"""
+    with open(partition_path(directory, partition), encoding='utf-8') as f:
+        for line in f:
+            email, digest_hex = line.rstrip('\n').split('\t')
+            yield email, bytes.fromhex(digest_hex)
@@ -1,97 +1,104 @@
-import mysql.connector
 import time
-from datetime import datetime, timedelta
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
-
-def suma_mes(start, end):
-    """Cuenta registros en un rango de fechas (versión serial)"""
+import argparse
+import multiprocessing
+from database import get_pool, add_backend_arguments, configure_backend
+from date_partitioner import (last_months_window, fetch_date_histogram, balanced_ranges,
+                              count_by_month_country, monthly_series, window_from_bounds)
+from snapshot import (open_snapshot, date_bounds as snapshot_date_bounds,
+                      date_histogram as snapshot_date_histogram,
+                      count_by_month_country as snapshot_count_by_month_country)
+from windowed_metrics import (METRICS, DEFAULT_ROLLING, add_metrics_arguments,
+                              merge_country_counts, month_totals, compute_metrics,
+                              print_metrics)
+import tracing
+
+NUM_MONTHS = 12  # Misma ventana que BSP-style
+HISTOGRAM_SAMPLE_EVERY = 1
+
+def suma_mes(start, end, snapshot_dir=None):
+    """Cuenta registros de un rango por mes y país (versión serial)"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        
-        # Convertir fechas a formato string para la consulta SQL
-        start_str = start.strftime('%Y-%m-%d')
-        end_str = end.strftime('%Y-%m-%d')
-        
+        if snapshot_dir:
+            return snapshot_count_by_month_country(open_snapshot(snapshot_dir), start, end)
+
+        conn = get_pool().acquire()
+
         # Usar la misma consulta que BSP-style
-        query = "SELECT COUNT(*) FROM customers WHERE subscription_date >= %s AND subscription_date < %s"
-        cur.execute(query, (start_str, end_str))
-        cnt = cur.fetchone()[0]
-        cur.close()
+        counts = count_by_month_country(conn, start, end)
         conn.close()
-        return cnt
-        
+        return counts
+
     except Exception as e:
-        print(f"Error en consulta para período {start.strftime('%Y-%m')}: {e}")
-        return 0
-
-def generate_monthly_ranges():
-    """Genera 12 rangos mensuales basados en los datos reales de la BD"""
-    # Basándose en el diagnóstico: datos van de 2020-01-01 a 2022-05-29
-    # Vamos a tomar los últimos 12 meses de datos disponibles
-    
-    # Comenzar desde mayo 2022 (último mes con datos) y retroceder 12 meses
-    end_date = datetime(2022, 6, 1)  # Primer día después del último mes con datos
-    fechas = []
-    
-    for i in range(12):
-        # Calcular el mes final
-        year = end_date.year
-        month = end_date.month - i
-        
-        # Ajustar año si el mes es negativo o cero
-        while month <= 0:
-            month += 12
-            year -= 1
-        
-        # Primer día del mes
-        fin = datetime(year, month, 1)
-        
-        # Primer día del siguiente mes (para el rango)
-        if month == 1:
-            inicio = datetime(year - 1, 12, 1)
-        else:
-            inicio = datetime(year, month - 1, 1)
-        
-        fechas.append((inicio, fin))
-    
-    # Invertir para tener orden cronológico ascendente
-    return list(reversed(fechas))
+        print(f"Error en consulta para rango {start} a {end}: {e}")
+        return {}
+
+def generate_balanced_ranges(num_partitions, months=NUM_MONTHS, snapshot_dir=None):
+    """Mismas particiones equilibradas que la versión paralela"""
+    if snapshot_dir:
+        snapshot = open_snapshot(snapshot_dir)
+        start, end = window_from_bounds(*snapshot_date_bounds(snapshot), months)
+        if start is None:
+            return None, []
+        histogram = snapshot_date_histogram(snapshot, start, end)
+        return (start, end), balanced_ranges(histogram, num_partitions, start, end)
+
+    conn = get_pool().acquire()
+    start, end = last_months_window(conn, months)
+    if start is None:
+        conn.close()
+        return None, []
+    histogram = fetch_date_histogram(conn, start, end, HISTOGRAM_SAMPLE_EVERY)
+    conn.close()
+    return (start, end), balanced_ranges(histogram, num_partitions, start, end)
+
+def conteo_serial(fechas, window, snapshot_dir=None, metrics=METRICS, rolling=DEFAULT_ROLLING):
+    """Cuenta cada partición una tras otra; devuelve (parciales, filas de métricas)"""
+    parciales = []
+    for idx, (start, end) in enumerate(fechas):
+        with tracing.span('task', 'task', particion=idx):
+            parciales.append(suma_mes(start, end, snapshot_dir))
+    por_pais = merge_country_counts(parciales)
+    series = monthly_series(month_totals(por_pais), *window)
+    return parciales, compute_metrics(series, por_pais, metrics=metrics, rolling=rolling)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Métricas mensuales BSP serial")
+    parser.add_argument('--partitions', type=int, default=multiprocessing.cpu_count(),
+                        help="particiones (usar el mismo valor que --workers en BSP-style)")
+    parser.add_argument('--months', type=int, default=NUM_MONTHS,
+                        help="últimos meses con datos a procesar")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="contar desde la instantánea columnar en lugar de la BD")
+    add_metrics_arguments(parser)
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+    tracing.start_from_args(args)
+
     print("Iniciando procesamiento serial BSP-style...")
-    
-    # Generar los intervalos mensuales
-    fechas = generate_monthly_ranges()
-    
-    print(f"Procesando {len(fechas)} períodos mensuales:")
+
+    # Generar los mismos rangos que la versión paralela
+    window, fechas = generate_balanced_ranges(args.partitions, args.months, args.snapshot)
+    if not fechas:
+        print("No hay datos en la tabla customers")
+        raise SystemExit(1)
+
+    print(f"Procesando {len(fechas)} particiones entre {window[0]} y {window[1]}:")
     for i, (inicio, fin) in enumerate(fechas):
-        print(f"  {i}: {inicio.strftime('%Y-%m-%d')} a {fin.strftime('%Y-%m-%d')}")
-    
+        print(f"  {i}: {inicio} a {fin}")
+
     print("\nProcesando secuencialmente...")
-    t0 = time.time()
-    resultados = {}
-    
-    for i, (start, end) in enumerate(fechas):
-        label = start.strftime('%Y-%m')
-        cantidad = suma_mes(start, end)
-        resultados[i] = (label, cantidad)
-        print(f"Período {label}: {cantidad} registros")
-
-    total_global = sum(v for _, v in resultados.values())
-    tiempo_total = time.time() - t0
-    
-    print(f"\n[Serial-BSP] Total registros último año = {total_global}")
-    print("Desglose por mes:")
-    for i in range(len(resultados)):
-        mes, cantidad = resultados[i]
-        print(f"  {mes}: {cantidad} registros")
-    
-    print(f"\nTiempo total (serial BSP-style): {tiempo_total:.2f} segundos")
\ No newline at end of file
+    t0 = time.perf_counter()
+    parciales, filas = conteo_serial(fechas, window, args.snapshot, args.metrics, args.rolling)
+    total_global = sum(f['registros'] for f in filas)
+    tiempo_total = time.perf_counter() - t0
+
+    for i, counts in enumerate(parciales):
+        print(f"Partición {i}: {sum(month_totals(counts).values())} registros")
+
+    print(f"\n[Serial-BSP] Total registros últimos {args.months} meses = {total_global}")
+    print_metrics(filas, args.metrics, args.rolling, args.top_paises)
+
+    print(f"\nTiempo total (serial BSP-style): {tiempo_total:.2f} segundos")
+    tracing.finish_from_args(args)
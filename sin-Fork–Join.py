@@ -1,48 +1,93 @@
-import mysql.connector
 import time
+import argparse
+from database import get_pool, configure_pool, add_backend_arguments, configure_backend
+from city_sketches import id_shards, shard_sketches, merge_sketches, DEFAULT_SKETCH_DIR
+from hyperloglog import DEFAULT_PRECISION
+from snapshot import open_snapshot, city_pairs, distinct_cities_by_country
+import tracing
 
-# Datos de conexión
-DB_CONFIG = {
-    'host':     'localhost',
-    'user':     'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
-
-
+CITY_COUNT_SQL = "SELECT COUNT(DISTINCT City) FROM customers WHERE Country = %s"
+CITY_COUNT_GROUPED_SQL = "SELECT Country, COUNT(DISTINCT City) FROM customers GROUP BY Country"
 
 def contar_ciudades_por_pais(pais):
     """Consulta a MySQL y devuelve (pais, número_de_ciudades_distintas)."""
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(DISTINCT City) FROM customers WHERE Country = %s",
-        (pais,)
-    )
-    count = cursor.fetchone()[0]
-    cursor.close()
-    conn.close()
+    # Conexión del pool y sentencia preparada reutilizada entre países
+    with tracing.span('task', 'task', pais=pais), get_pool().connection() as conn:
+        count = conn.query_one(CITY_COUNT_SQL, (pais,))[0]
     return pais, count
 
-if __name__ == '__main__':
+def contar_ciudades_serial():
+    """Modo exacto: una consulta por país, una tras otra; devuelve {pais: ciudades}"""
     # 1) Recuperamos la lista de países
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT Country FROM customers")
-    paises = [row[0] for row in cursor.fetchall()]
-    cursor.close()
-    conn.close()
+    with get_pool().connection() as conn:
+        paises = [row[0] for row in conn.query("SELECT DISTINCT Country FROM customers")]
 
     # 2) Bucle serial
-    start = time.time()
     resultados = {}
     for pais in paises:
         pais, cuenta = contar_ciudades_por_pais(pais)
         resultados[pais] = cuenta
-    total_time = time.time() - start
+    return resultados
+
+def contar_ciudades_agrupado():
+    """Plan grouped en serie: un solo GROUP BY para todos los países"""
+    with tracing.span('task', 'task'), get_pool().connection() as conn:
+        resultados = dict(conn.query(CITY_COUNT_GROUPED_SQL))
+    if None in resultados:
+        resultados[None] = 0  # Igual que WHERE Country = NULL en el plan fanout y en Fork-Join
+    return resultados
+
+def contar_ciudades_snapshot(snapshot_dir):
+    """Modo instantánea: un solo recorrido de las columnas país/ciudad del mmap"""
+    snapshot = open_snapshot(snapshot_dir)
+    return distinct_cities_by_country(snapshot, [city_pairs(snapshot)])
+
+def contar_ciudades_hll(precision, sketch_dir):
+    """Modo aproximado: mismos fragmentos y sketches que Fork-Join, uno tras otro"""
+    with get_pool().connection() as conn:
+        shards = id_shards(conn)
+    parciales = [shard_sketches(lo, hi, completo, precision, sketch_dir)[0]
+                 for lo, hi, completo in shards]
+    return {pais: s.count() for pais, s in merge_sketches(parciales).items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ciudades distintas por país (serial)")
+    parser.add_argument('--hll', action='store_true',
+                        help="conteo aproximado con sketches HyperLogLog")
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help="precisión de los sketches HyperLogLog (4-16)")
+    parser.add_argument('--sketch-dir', default=DEFAULT_SKETCH_DIR,
+                        help="caché de sketches por fragmento ('' para desactivarla)")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="conteo exacto desde la instantánea columnar, sin consultas")
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+    tracing.start_from_args(args)
+
+    pool = configure_pool(0)  # un solo hilo: una conexión
+    if args.hll:
+        start = time.perf_counter()
+        resultados = contar_ciudades_hll(args.precision, args.sketch_dir)
+        total_time = time.perf_counter() - start
+        for pais, cuenta in resultados.items():
+            print(f"{pais}: ~{cuenta} ciudades")
+        print(f"\nTiempo total (serial, hll precisión {args.precision}): {total_time:.2f} s")
+        pool.print_stats()
+        tracing.finish_from_args(args)
+        raise SystemExit(0)
+
+    start = time.perf_counter()
+    if args.snapshot:
+        resultados = contar_ciudades_snapshot(args.snapshot)
+    else:
+        resultados = contar_ciudades_serial()
+    total_time = time.perf_counter() - start
 
     # 3) Mostramos resultados y tiempo
     for pais, cuenta in resultados.items():
         print(f"{pais}: {cuenta} ciudades")
     print(f"\nTiempo total (serial): {total_time:.2f} s")
+    pool.print_stats()
+    tracing.finish_from_args(args)
@@ -1,72 +1,104 @@
-import mysql.connector
 import time
 import hashlib
+import os
+import argparse
+from stream_reader import iter_keyset_batches
+from database import get_pool, add_backend_arguments, configure_backend
+from hash_cache import HashCache, DEFAULT_PATH as HASH_CACHE_PATH
+from shuffle import NUM_PARTITIONS, DEFAULT_SPILL_DIR, SpillWriter, partition_for
+from snapshot import open_snapshot, iter_snapshot_batches
+import tracing
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'sumaparalela',
-    'autocommit': True
-}
 
 BATCH_SIZE = 100_000
-NUM_PARTS = 4
 HASH_ITERATIONS = 1000  # Mismo número de iteraciones que la versión paralela
+SERVER_SIDE_CURSOR = False  # True: un único cursor sin buffer con fetchmany
+USE_HASH_CACHE = True  # Reutilizar los hashes guardados en ejecuciones anteriores
+SPILL_DIR = os.path.join(DEFAULT_SPILL_DIR, 'pipeline-serial')  # None: solo contar
 
-def hash_intensive(email):
+def chained_md5(email):
     """Función intensiva que realiza múltiples hashes"""
     result = email.encode()
     for _ in range(HASH_ITERATIONS):
         result = hashlib.md5(result).digest()
     return result
 
-def serial_pipeline_hash():
+def hash_intensive(email, cache=None):
+    """Hash intensivo del email, reutilizando la caché persistente si se indica"""
+    if cache is not None:
+        return cache.get_or_compute(email, HASH_ITERATIONS, chained_md5)
+    return chained_md5(email)
+
+def serial_pipeline_hash(use_cache=USE_HASH_CACHE, spill_dir=SPILL_DIR, snapshot_dir=None):
     # Inicializar contadores
-    subtotales = {i: 0 for i in range(NUM_PARTS)}
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-    offset = 0
+    subtotales = {i: 0 for i in range(NUM_PARTITIONS)}
+    conn = None if snapshot_dir else get_pool().acquire()
+    cache = HashCache(HASH_CACHE_PATH) if use_cache else None
+    spill = SpillWriter(spill_dir) if spill_dir else None
     total_processed = 0
 
     print("[Serial] Iniciando procesamiento...")
     
-    while True:
-        cur.execute(
-            "SELECT email FROM customers LIMIT %s OFFSET %s",
-            (BATCH_SIZE, offset)
-        )
-        rows = cur.fetchall()
-        if not rows:
-            break
-
+    # Paginación por clave primaria (coste constante por lote) o la instantánea
+    if snapshot_dir:
+        batches = iter_snapshot_batches(open_snapshot(snapshot_dir), ('email',), BATCH_SIZE)
+    else:
+        batches = iter_keyset_batches(conn, ('email',), BATCH_SIZE,
+                                      server_side=SERVER_SIDE_CURSOR)
+    for rows in tracing.iter_spans(batches, 'read.batch'):
         batch_count = 0
-        for (email,) in rows:
-            if email:
-                # Proceso intensivo para cada email
-                hash_intensive(email)
-                
-                # Determinar partición
-                h = int(hashlib.md5(email.encode()).hexdigest(), 16) % NUM_PARTS
-                subtotales[h] += 1
-                batch_count += 1
+        buckets = [[] for _ in range(NUM_PARTITIONS)]
+        with tracing.span('hash', 'cpu', emails=len(rows)):
+            for _, email in rows:
+                if email:
+                    # Proceso intensivo para cada email
+                    digest = hash_intensive(email, cache)
+                    
+                    # Determinar partición (mismo particionador que la versión paralela)
+                    h = partition_for(email)
+                    buckets[h].append((email, digest))
+                    subtotales[h] += 1
+                    batch_count += 1
+        
+        if spill is not None:
+            with tracing.span('spill.write', 'io'):
+                spill.write_buckets(buckets)
         
         total_processed += batch_count
-        offset += BATCH_SIZE
         if total_processed % 50000 == 0:
             print(f"[Serial] Procesados {total_processed} emails...")
 
-    cur.close()
-    conn.close()
+    if conn is not None:
+        conn.close()
+    if spill is not None:
+        spill.close()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"[Serial] Caché: {stats['hits_lru'] + stats['hits_disk']} aciertos, "
+              f"{stats['misses']} fallos")
+        cache.close()
     return subtotales, total_processed
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pipeline serial de hashing de emails")
+    parser.add_argument('--snapshot', metavar='DIR',
+                        help="leer los emails de la instantánea columnar en lugar de la BD")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="no usar la caché persistente de hashes (compartida con "
+                             "Pipeline-Hash.py: sin esta opción se medirían aciertos de caché)")
+    add_backend_arguments(parser)
+    tracing.add_trace_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+    tracing.start_from_args(args)
+
     print("Iniciando pipeline serial...")
     print(f"Realizando {HASH_ITERATIONS} iteraciones de hash por email")
     
-    t0 = time.time()
-    subtotales, total = serial_pipeline_hash()
-    tiempo_total = time.time() - t0
+    t0 = time.perf_counter()
+    subtotales, total = serial_pipeline_hash(use_cache=not args.no_cache,
+                                             snapshot_dir=args.snapshot)
+    tiempo_total = time.perf_counter() - t0
 
     print(f"\n=== RESULTADOS FINALES ===")
     print(f"[Pipeline-serial] Total registros = {total}")
@@ -74,3 +106,4 @@ if __name__ == '__main__':
         print(f"  Partición {parte}: {subtotal} registros")
     print("=" * 30)
     print(f"\nTiempo total (Pipeline-serial): {tiempo_total:.2f} segundos")
+    tracing.finish_from_args(args)
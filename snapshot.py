@@ -0,0 +1,407 @@
+"""Instantánea columnar de ``customers`` en disco, abierta con ``numpy.memmap``.
+
+Una exportación lee la tabla una vez (paginación por clave) y escribe una
+versión nueva en ``<dir>/vNNNN/``:
+
+- un ``.npy`` de ancho fijo por columna, en el orden de ``id``;
+- textos codificados con diccionario: códigos ``int32`` (``-1`` = NULL) y el
+  diccionario como bytes UTF-8 concatenados más sus desplazamientos. En
+  ``COLLATED_COLUMNS`` (país y ciudad) los valores que la collation del motor
+  considera iguales comparten código y se guardan con la primera grafía, de
+  modo que los conteos por país y ciudad coinciden con los de la BD;
+- fechas como número de día desde 1970-01-01 en ``int32``;
+- ``manifest.json`` con la versión del formato, las filas y el ``MAX(id)``
+  exportados.
+
+El fichero ``<dir>/CURRENT`` apunta a la última versión completa y se
+actualiza de forma atómica, así que un lector nunca ve una exportación a
+medias. Los workers de Pipeline, Fork-Join y BSP abren la instantánea con
+``open_snapshot`` y leen sus fragmentos directamente de la caché de páginas
+compartida, sin conexión a la base de datos.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from date_partitioner import as_date
+from stream_reader import iter_keyset_batches
+
+FORMAT_VERSION = 1
+DEFAULT_SNAPSHOT_DIR = 'snapshot'
+SNAPSHOT_COLUMNS = ('index_field', 'email', 'city', 'country', 'subscription_date')
+EXPORT_BATCH_SIZE = 50_000
+COLLATED_COLUMNS = ('city', 'country')  # Se agrupan: comparar como la BD (no los emails)
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+# Tipo de cada columna exportable de customers
+COLUMN_KINDS = {
+    'index_field': 'int', 'customer_id': 'str', 'first_name': 'str', 'last_name': 'str',
+    'company': 'str', 'city': 'str', 'country': 'str', 'phone_1': 'str', 'phone_2': 'str',
+    'email': 'str', 'subscription_date': 'date', 'website': 'str',
+}
+KIND_DTYPES = {'int': np.int64, 'str': np.int32, 'date': np.int32}
+NULL_INT = np.iinfo(np.int64).min
+NULL_CODE = -1
+NULL_DAY = np.iinfo(np.int32).min
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(d):
+    return (d - EPOCH).days
+
+
+def from_day_number(n):
+    return EPOCH + timedelta(days=int(n))
+
+
+def _encode(kind, values, dictionary, fold=None):
+    """Valores del driver -> array del tipo fijo de la columna.
+
+    ``fold`` lleva cada texto a la grafía que lo representa en el diccionario.
+    """
+    if kind == 'str':
+        if fold is not None:
+            values = [None if v is None else fold(v) for v in values]
+        return np.fromiter((NULL_CODE if v is None else dictionary.setdefault(v, len(dictionary))
+                            for v in values), np.int32, len(values))
+    if kind == 'date':
+        return np.fromiter((NULL_DAY if v is None else day_number(as_date(v))
+                            for v in values), np.int32, len(values))
+    return np.fromiter((NULL_INT if v is None else v for v in values), np.int64, len(values))
+
+
+def _save_dictionary(path, strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(f"{path}.dict-offsets.npy", offsets)
+    np.save(f"{path}.dict-data.npy", np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+
+def _next_version(directory):
+    versions = [int(name[1:]) for name in os.listdir(directory)
+                if name.startswith('v') and name[1:].isdigit()]
+    return max(versions, default=0) + 1
+
+
+def _folder(text_key):
+    """Texto -> primera grafía vista con la misma clave de collation"""
+    names = {}
+    return lambda value: names.setdefault(text_key(value), value)
+
+
+def export_snapshot(conn, directory=DEFAULT_SNAPSHOT_DIR, columns=SNAPSHOT_COLUMNS,
+                    batch_size=EXPORT_BATCH_SIZE, text_key=None):
+    """Exporta ``customers`` a una versión nueva, la marca como actual y devuelve su ruta.
+
+    ``text_key`` es la clave de collation del motor (``backend.text_key``) con la
+    que se unen los valores de ``COLLATED_COLUMNS``; sin ella se guardan tal cual.
+    """
+    for col in columns:
+        if col not in COLUMN_KINDS:
+            raise ValueError(f"Columna no exportable: {col}")
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(id) FROM customers")
+    max_id = cur.fetchone()[0] or 0
+    # Con AUTO_INCREMENT no pueden aparecer filas nuevas con id <= max_id
+    cur.execute("SELECT COUNT(*) FROM customers WHERE id <= %s", (max_id,))
+    capacity = cur.fetchone()[0]
+    cur.close()
+
+    os.makedirs(directory, exist_ok=True)
+    version = _next_version(directory)
+    path = os.path.join(directory, f"v{version:04d}")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path)
+
+    kinds = {'id': 'int', **{col: COLUMN_KINDS[col] for col in columns}}
+    arrays = {col: np.lib.format.open_memmap(os.path.join(tmp_path, f"{col}.npy"), mode='w+',
+                                             dtype=KIND_DTYPES[kind], shape=(capacity,))
+              for col, kind in kinds.items()}
+    dictionaries = {col: {} for col, kind in kinds.items() if kind == 'str'}
+    folded = [col for col in COLLATED_COLUMNS if col in kinds] if text_key else []
+    folds = {col: _folder(text_key) for col in folded}
+
+    count = 0
+    for rows in iter_keyset_batches(conn, columns, batch_size, until_id=max_id):
+        end = count + len(rows)
+        if end > capacity:
+            raise RuntimeError("La tabla cambió durante la exportación")
+        for col, values in zip(kinds, zip(*rows)):
+            arrays[col][count:end] = _encode(kinds[col], values, dictionaries.get(col),
+                                             folds.get(col))
+        count = end
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    for col, dictionary in dictionaries.items():
+        _save_dictionary(os.path.join(tmp_path, col), dictionary)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rows': count,  # Menos que la capacidad si se borraron filas durante la lectura
+        'max_id': max_id,
+        'collated_columns': folded,
+        'columns': {col: {'kind': kind, 'dtype': np.dtype(KIND_DTYPES[kind]).str,
+                          'dictionary_size': len(dictionaries[col]) if kind == 'str' else None}
+                    for col, kind in kinds.items()},
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(tmp_path, path)
+
+    current_tmp = os.path.join(directory, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(current_tmp, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(path))
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+    return path
+
+
+def resolve_snapshot(path, version=None):
+    """Directorio de la versión pedida (o de la actual) a partir del raíz o de una versión"""
+    if version is not None:
+        return os.path.join(path, f"v{int(version):04d}")
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    current = os.path.join(path, CURRENT_FILE)
+    if not os.path.exists(current):
+        raise FileNotFoundError(f"No hay ninguna instantánea en {path}")
+    with open(current, encoding='utf-8') as f:
+        return os.path.join(path, f.read().strip())
+
+
+class SnapshotDictionary:
+    """Diccionario de una columna de texto: código -> cadena, leído del mmap"""
+
+    def __init__(self, prefix):
+        self.offsets = np.load(f"{prefix}.dict-offsets.npy", mmap_mode='r')
+        self.data = np.load(f"{prefix}.dict-data.npy", mmap_mode='r')
+        self._cache = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        if code == NULL_CODE:
+            return None
+        start, end = self.offsets[code], self.offsets[code + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def values(self):
+        """Todas las cadenas en orden de código (decodificadas una vez)"""
+        if self._cache is None:
+            blob = self.data.tobytes()
+            offsets = self.offsets.tolist()
+            self._cache = [blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                           for i in range(len(self))]
+        return self._cache
+
+    def decode(self, codes):
+        """Lista de cadenas (``None`` para NULL) de un array de códigos"""
+        return [self[code] for code in codes.tolist()]
+
+
+class CustomersSnapshot:
+    def __init__(self, path=DEFAULT_SNAPSHOT_DIR, version=None):
+        """Abre una versión (por defecto la actual) sin leer los datos a memoria"""
+        self.path = resolve_snapshot(path, version)
+        with open(os.path.join(self.path, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Formato de instantánea {self.manifest.get('format_version')} "
+                             f"no compatible (se esperaba {FORMAT_VERSION})")
+        self.version = self.manifest['version']
+        self.num_rows = self.manifest['rows']
+        self._columns = {}
+        self._dictionaries = {}
+
+    @property
+    def columns(self):
+        return tuple(self.manifest['columns'])
+
+    def kind(self, name):
+        return self.manifest['columns'][name]['kind']
+
+    def column(self, name, start=0, stop=None):
+        """Vista ``numpy.memmap`` (sin copia) de las filas ``[start, stop)``"""
+        array = self._columns.get(name)
+        if array is None:
+            if name not in self.manifest['columns']:
+                raise KeyError(f"La instantánea no contiene la columna {name}")
+            array = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+            array = self._columns[name] = array[:self.num_rows]
+        return array[start:stop]
+
+    def dictionary(self, name):
+        dictionary = self._dictionaries.get(name)
+        if dictionary is None:
+            if self.kind(name) != 'str':
+                raise ValueError(f"La columna {name} no es de texto")
+            dictionary = SnapshotDictionary(os.path.join(self.path, name))
+            self._dictionaries[name] = dictionary
+        return dictionary
+
+    def strings(self, name, start=0, stop=None):
+        """Cadenas decodificadas de las filas ``[start, stop)``"""
+        dictionary = self.dictionary(name)
+        codes = self.column(name, start, stop)
+        if dictionary._cache is None and len(codes) < len(dictionary) // 8:
+            return dictionary.decode(codes)  # Fragmento pequeño: solo sus códigos
+        values = dictionary.values()
+        return [values[code] if code != NULL_CODE else None for code in codes.tolist()]
+
+    def row_range(self, after_id=0, until_id=None):
+        """Posiciones ``[lo, hi)`` de las filas con ``after_id < id <= until_id``"""
+        ids = self.column('id')
+        lo = int(np.searchsorted(ids, after_id, side='right'))
+        hi = len(ids) if until_id is None else int(np.searchsorted(ids, until_id, side='right'))
+        return lo, hi
+
+    def is_current(self, conn):
+        """True si la tabla no ha cambiado de tamaño ni de ``MAX(id)`` desde la exportación"""
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*), MAX(id) FROM customers")
+        count, max_id = cur.fetchone()
+        cur.close()
+        return count == self.num_rows and (max_id or 0) == self.manifest['max_id']
+
+
+_open_snapshots = {}
+
+
+def open_snapshot(path=DEFAULT_SNAPSHOT_DIR, version=None):
+    """Instantánea abierta una sola vez por proceso (para los workers)"""
+    key = (os.getpid(), os.path.abspath(resolve_snapshot(path, version)))
+    snapshot = _open_snapshots.get(key)
+    if snapshot is None:
+        snapshot = _open_snapshots[key] = CustomersSnapshot(key[1])
+    return snapshot
+
+
+def iter_snapshot_batches(snapshot, columns=('email',), batch_size=EXPORT_BATCH_SIZE):
+    """Como ``iter_keyset_batches`` pero desde la instantánea: listas de ``(id, col1, ...)``"""
+    for start in range(0, snapshot.num_rows, batch_size):
+        stop = min(start + batch_size, snapshot.num_rows)
+        values = [snapshot.column('id', start, stop).tolist()]
+        for col in columns:
+            if snapshot.kind(col) == 'str':
+                values.append(snapshot.strings(col, start, stop))
+            elif snapshot.kind(col) == 'date':
+                values.append([None if d == NULL_DAY else from_day_number(d)
+                               for d in snapshot.column(col, start, stop).tolist()])
+            else:
+                values.append([None if v == NULL_INT else v
+                               for v in snapshot.column(col, start, stop).tolist()])
+        yield list(zip(*values))
+
+
+# --- Consultas de los patrones sobre la instantánea ---------------------------
+
+def date_bounds(snapshot, column='subscription_date'):
+    """(MIN, MAX) de la columna de fechas sin NULL, o (None, None)"""
+    days = snapshot.column(column)
+    valid = days[days != NULL_DAY]
+    if not len(valid):
+        return None, None
+    return from_day_number(valid.min()), from_day_number(valid.max())
+
+
+def _days_in(snapshot, start, end, column, lo=0, hi=None):
+    days = snapshot.column(column, lo, hi)
+    # NULL_DAY es menor que cualquier fecha real: queda fuera del rango
+    return days[(days >= day_number(start)) & (days < day_number(end))]
+
+
+def date_histogram(snapshot, start, end, column='subscription_date'):
+    """Lista ``[(día, filas)]`` ordenada dentro de [start, end)"""
+    days, counts = np.unique(_days_in(snapshot, start, end, column), return_counts=True)
+    return [(from_day_number(d), int(c)) for d, c in zip(days.tolist(), counts.tolist())]
+
+
+def count_by_month(snapshot, start, end, column='subscription_date'):
+    """Filas por mes de calendario en [start, end) como ``{'YYYY-MM': n}``"""
+    months = _days_in(snapshot, start, end, column).astype('datetime64[D]').astype('datetime64[M]')
+    labels, counts = np.unique(months, return_counts=True)
+    return {str(label): int(count) for label, count in zip(labels, counts.tolist())}
+
+
+def count_by_month_country(snapshot, start, end, column='subscription_date',
+                           country_column='country'):
+    """Filas por mes y país en [start, end) como ``{'YYYY-MM': {país: n}}``"""
+    days = snapshot.column(column)
+    inside = (days >= day_number(start)) & (days < day_number(end))
+    months = days[inside].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    codes = snapshot.column(country_column)[inside].astype(np.int64)
+    names = snapshot.dictionary(country_column)
+    width = len(names) + 1  # +1: el código NULL (-1) pasa a 0
+    keys, counts = np.unique(months * width + (codes + 1), return_counts=True)
+    result = {}
+    for key, count in zip(keys.tolist(), counts.tolist()):
+        month, code = divmod(key, width)
+        label = str(np.datetime64(month, 'M'))
+        result.setdefault(label, {})[names[code - 1]] = count
+    return result
+
+
+def city_pairs(snapshot, lo=0, hi=None):
+    """Tarea fork: países presentes y pares (país, ciudad) distintos de ``[lo, hi)``"""
+    countries = snapshot.column('country', lo, hi)
+    cities = snapshot.column('city', lo, hi)
+    num_cities = len(snapshot.dictionary('city'))
+    both = (countries != NULL_CODE) & (cities != NULL_CODE)
+    pairs = np.unique(countries[both].astype(np.int64) * num_cities + cities[both])
+    return np.unique(countries), pairs
+
+
+def city_pairs_task(path, lo, hi):
+    """``city_pairs`` para un ProcessPoolExecutor: se envía la ruta, no los datos"""
+    return city_pairs(open_snapshot(path), lo, hi)
+
+
+def distinct_cities_by_country(snapshot, partials):
+    """Join: une los pares de cada fragmento y devuelve ``{pais: ciudades_distintas}``"""
+    countries = np.unique(np.concatenate([c for c, _ in partials] or [np.empty(0, np.int32)]))
+    pairs = np.unique(np.concatenate([p for _, p in partials] or [np.empty(0, np.int64)]))
+    num_cities = len(snapshot.dictionary('city'))
+    per_country = np.bincount(pairs // max(1, num_cities),
+                              minlength=len(snapshot.dictionary('country')))
+    names = snapshot.dictionary('country')
+    # Igual que COUNT(DISTINCT City) ... WHERE Country = NULL: 0 para NULL
+    return {names[code]: int(per_country[code]) if code != NULL_CODE else 0
+            for code in countries.tolist()}
+
+
+if __name__ == '__main__':
+    from database import get_pool, get_backend, add_backend_arguments, configure_backend
+
+    parser = argparse.ArgumentParser(description="Instantánea columnar de customers")
+    parser.add_argument('action', choices=('export', 'info'))
+    parser.add_argument('--dir', default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument('--version', type=int, default=None,
+                        help="versión a mostrar (por defecto la actual)")
+    parser.add_argument('--columns', nargs='+', default=list(SNAPSHOT_COLUMNS),
+                        choices=sorted(COLUMN_KINDS))
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    configure_backend(args)
+
+    if args.action == 'export':
+        t0 = time.perf_counter()
+        with get_pool().connection() as conn:
+            path = export_snapshot(conn, args.dir, tuple(args.columns),
+                                   text_key=get_backend().text_key)
+        print(f"Instantánea exportada en {path} ({time.perf_counter() - t0:.2f}s)")
+    snapshot = CustomersSnapshot(args.dir, args.version)
+    print(f"Versión {snapshot.version} ({snapshot.manifest['created']}): "
+          f"{snapshot.num_rows} filas, MAX(id) = {snapshot.manifest['max_id']}")
+    for name, meta in snapshot.manifest['columns'].items():
+        extra = f", {meta['dictionary_size']} valores distintos" if meta['kind'] == 'str' else ""
+        print(f"  {name}: {meta['kind']} ({meta['dtype']}){extra}")
@@ -0,0 +1,129 @@
+"""Lectura en streaming de la tabla customers con paginación por clave (keyset).
+
+En lugar de ``LIMIT ... OFFSET ...`` (que obliga a MySQL a recorrer y descartar
+todas las filas anteriores en cada lote) se busca directamente sobre la clave
+primaria ``id``, de modo que el coste de cada lote es constante.
+
+``fetch_numeric_columns`` lee columnas numéricas directamente a arrays NumPy
+reservados de antemano, sin pasar por una lista con todas las filas.
+"""
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 100_000
+DEFAULT_FETCH_BATCH_SIZE = 10_000
+
+
+def iter_keyset_batches(conn, columns=('email',), batch_size=DEFAULT_BATCH_SIZE,
+                        after_id=0, table='customers', key='id',
+                        server_side=False, until_id=None):
+    """Genera lotes de filas ``(id, col1, col2, ...)`` ordenadas por ``key``.
+
+    - Modo por defecto: una consulta ``WHERE id > ultimo_id ORDER BY id LIMIT n``
+      por lote, cada una resuelta con un rango sobre el índice primario. La
+      sentencia se prepara una sola vez y se reutiliza en todos los lotes.
+    - ``server_side=True``: una única consulta con cursor no bufferizado y
+      ``fetchmany``; las filas se van leyendo del servidor según se consumen.
+
+    ``after_id`` permite continuar a partir de una clave ya procesada y
+    ``until_id`` limita la lectura a ``id <= until_id`` (fragmentos disjuntos).
+    ``batch_size`` puede ser una función sin argumentos que se consulta antes
+    de cada lote (tamaño adaptativo, ver ``flow_control``).
+    """
+    next_size = batch_size if callable(batch_size) else lambda: batch_size
+    select_cols = ', '.join((key,) + tuple(columns))
+    bound = f" AND {key} <= %s" if until_id is not None else ""
+    bound_params = (until_id,) if until_id is not None else ()
+
+    if server_side:
+        yield from _iter_server_side(conn, select_cols, next_size, after_id, table, key,
+                                     bound, bound_params)
+        return
+
+    query = (f"SELECT {select_cols} FROM {table} "
+             f"WHERE {key} > %s{bound} ORDER BY {key} LIMIT %s")
+    cur = conn.cursor(prepared=True)
+    try:
+        last_id = after_id
+        while True:
+            size = next_size()
+            cur.execute(query, (last_id,) + bound_params + (size,))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            yield rows
+            if len(rows) < size:
+                break
+    finally:
+        cur.close()
+
+
+def _iter_server_side(conn, select_cols, next_size, after_id, table, key,
+                      bound, bound_params):
+    """Recorre la tabla con un único cursor sin buffer y ``fetchmany``."""
+    query = f"SELECT {select_cols} FROM {table} WHERE {key} > %s{bound} ORDER BY {key}"
+    cur = conn.cursor(buffered=False)
+    exhausted = False
+    try:
+        cur.execute(query, (after_id,) + bound_params)
+        while True:
+            rows = cur.fetchmany(next_size())
+            if not rows:
+                exhausted = True
+                break
+            yield rows
+    finally:
+        # Si el consumidor abandona antes de tiempo hay que descartar las
+        # filas pendientes para poder reutilizar la conexión
+        if not exhausted:
+            conn.consume_results()
+        cur.close()
+
+
+def fetch_numeric_columns(conn, columns=('index_field',), limit=None, dtype=np.int64,
+                          batch_size=DEFAULT_FETCH_BATCH_SIZE, table='customers',
+                          skip_nulls=True):
+    """Lee ``columns`` a arrays NumPy tipados; devuelve ``{columna: array}``.
+
+    Los arrays se reservan con el número de filas (``COUNT(*)`` acotado por
+    ``limit``) y se rellenan lote a lote con ``fetchmany`` sobre un cursor sin
+    buffer, de modo que en memoria solo conviven los arrays finales y un lote
+    de filas. ``dtype`` puede ser un tipo común o un dict ``{columna: tipo}``.
+    Con ``skip_nulls`` se descartan las filas con algún NULL (un entero NumPy
+    no puede representarlo).
+    """
+    dtypes = [np.dtype(dtype[c] if isinstance(dtype, dict) else dtype) for c in columns]
+    limit_sql = f" LIMIT {int(limit)}" if limit is not None else ""
+
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {table}")
+    capacity = cur.fetchone()[0]
+    cur.close()
+    if limit is not None:
+        capacity = min(capacity, int(limit))
+    arrays = [np.empty(capacity, dtype=dt) for dt in dtypes]
+
+    count = 0
+    cur = conn.cursor(buffered=False)
+    exhausted = False
+    try:
+        cur.execute(f"SELECT {', '.join(columns)} FROM {table}{limit_sql}")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                exhausted = True
+                break
+            if skip_nulls:
+                rows = [row for row in rows if None not in row]
+            end = count + len(rows)
+            if end > len(arrays[0]):
+                # Se insertaron filas tras el COUNT(*): crecer en lugar de fallar
+                arrays = [np.resize(arr, max(end, 2 * len(arr))) for arr in arrays]
+            for arr, values in zip(arrays, zip(*rows)):
+                arr[count:end] = values
+            count = end
+    finally:
+        if not exhausted:
+            conn.consume_results()
+        cur.close()
+    return {col: arr[:count] for col, arr in zip(columns, arrays)}
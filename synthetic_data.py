@@ -0,0 +1,364 @@
+"""Generador vectorizado de customers sintéticos para pruebas de escala.
+
+Produce filas con el esquema de ``customers`` directamente en la BD o en
+ficheros CSV por bloques (con la cabecera del CSV de ejemplo, de modo que
+``insert-data.py --csv`` también puede cargarlos). Cada bloque se genera con
+operaciones de NumPy sobre columnas enteras, sin bucles por fila, y los
+bloques se reparten entre varios procesos.
+
+- Determinista: el bloque ``k`` usa la semilla ``(seed, k)``, así que el
+  resultado solo depende de ``--seed``, ``--rows`` y ``--chunk-rows``, no del
+  número de procesos ni del orden en que terminan.
+- Países con distribución de Zipf (``--country-skew``; 0 es uniforme) y, dentro
+  de cada país, ciudades también Zipf (``--city-skew``).
+- ``subscription_date`` uniforme o con crecimiento exponencial de altas
+  (``--date-dist growth``) entre ``--start`` y ``--end``.
+- Emails duplicados con probabilidad ``--duplicate-rate``. Nombre y email son
+  funciones de una identidad: la fila ``i`` tiene identidad ``i`` o, si es un
+  duplicado, la de una fila anterior que no lo es. Por eso el email repetido
+  existe siempre aunque esa fila esté en otro bloque u otro proceso.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+if not hasattr(np, 'strings'):
+    raise ImportError("synthetic_data.py necesita numpy>=2 (np.strings)")
+
+from database import (CSV_COLUMN_MAP, DB_COLUMNS, INSERT_CUSTOMERS_SQL, DatabaseManager,
+                      get_pool, add_backend_arguments, configure_backend)
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_OUTPUT_DIR = 'synthetic'
+INSERT_BATCH_ROWS = 2_000  # Filas por executemany (como BulkLoader en insert-data.py)
+DATE_DISTRIBUTIONS = ('uniform', 'growth')
+
+COUNTRIES = [
+    'United States', 'India', 'China', 'Brazil', 'Mexico', 'Spain', 'Germany',
+    'United Kingdom', 'France', 'Japan', 'Argentina', 'Colombia', 'Italy', 'Canada',
+    'Indonesia', 'Nigeria', 'Turkey', 'Philippines', 'Chile', 'Peru', 'Poland',
+    'Netherlands', 'South Africa', 'Egypt', 'Vietnam', 'Australia', 'Sweden',
+    'Portugal', 'Belgium', 'Switzerland', 'Austria', 'Greece', 'Norway', 'Denmark',
+    'Finland', 'Ireland', 'Morocco', 'Kenya', 'Thailand', 'Malaysia', 'Uruguay',
+    'Ecuador', 'Venezuela', 'Romania', 'Czech Republic', 'Hungary', 'Ukraine',
+    'Pakistan', 'Bangladesh', 'New Zealand',
+]
+FIRST_NAMES = [
+    'Ana', 'Luis', 'Maria', 'Jose', 'Carmen', 'Juan', 'Laura', 'Carlos', 'Sofia',
+    'Miguel', 'Lucia', 'David', 'Elena', 'Pablo', 'Marta', 'Jorge', 'Paula', 'Diego',
+    'Sara', 'Javier', 'Emma', 'Liam', 'Olivia', 'Noah', 'Ava', 'James', 'Mia',
+    'Lucas', 'Chloe', 'Ethan', 'Grace', 'Leo', 'Nora', 'Hugo', 'Alba', 'Ivan',
+]
+LAST_NAMES = [
+    'Garcia', 'Martinez', 'Lopez', 'Sanchez', 'Perez', 'Gomez', 'Martin', 'Jimenez',
+    'Ruiz', 'Hernandez', 'Diaz', 'Moreno', 'Alvarez', 'Romero', 'Navarro', 'Torres',
+    'Smith', 'Johnson', 'Brown', 'Taylor', 'Wilson', 'Evans', 'Walker', 'Wright',
+    'Rasmussen', 'Schmidt', 'Muller', 'Rossi', 'Silva', 'Santos', 'Kowalski', 'Novak',
+]
+COMPANY_SUFFIXES = ['Group', 'Ltd', 'LLC', 'PLC', 'Inc', 'and Sons', 'Partners', 'Holdings']
+EMAIL_DOMAINS = ['example.com', 'mail.com', 'correo.es', 'inbox.net', 'post.org', 'web.de']
+WEB_TLDS = ['.com', '.net', '.org', '.io', '.es', '.info']
+CITY_STEMS = [
+    'San', 'Villa', 'Puerto', 'Santa', 'North', 'South', 'East', 'West', 'New', 'Port',
+    'Lake', 'Mount', 'Fort', 'Castle', 'River', 'Green', 'Stone', 'Oak', 'Bay', 'Rock',
+]
+CITY_SUFFIXES = [
+    'field', 'ton', 'ville', 'burg', 'mouth', 'haven', 'ford', 'dale', 'wood', 'bridge',
+    ' del Mar', ' Alto', ' Nuevo', ' Real', ' Viejo', 'port', 'stead', 'brook',
+]
+CITY_NAMES = [stem + suffix for suffix in CITY_SUFFIXES for stem in CITY_STEMS]
+ID_ALPHABET = np.frombuffer(b'0123456789abcdefABCDEF', dtype=np.uint8)
+DIGITS = np.frombuffer(b'0123456789', dtype=np.uint8)
+PHONE_TEMPLATE = '+##-###-###-###'
+CUSTOMER_ID_TEMPLATE = '#' * 15
+CSV_HEADER = (','.join(csv_col for csv_col, _, _ in CSV_COLUMN_MAP) + '\n').encode()
+
+_MIX = 0x9E3779B97F4A7C15
+
+
+def _hash(values, salt):
+    """Mezcla splitmix64 vectorizada: entero pseudoaleatorio estable por valor y sal"""
+    x = values.astype(np.uint64) + np.uint64((salt * _MIX) % 2 ** 64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def positive_int(text):
+    """Tipo de argparse: entero >= 1"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"no es un entero: {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1: {value}")
+    return value
+
+
+def zipf_weights(n, skew):
+    """Probabilidades ``p_k ∝ 1 / (k + 1)^skew`` de ``n`` categorías"""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+def _random_strings(rng, n, template, alphabet=DIGITS):
+    """Cadenas con la forma de ``template``: cada ``#`` es un carácter de ``alphabet``.
+
+    Se construyen como una matriz de bytes ``(n, len(template))`` vista como
+    ``S<len>``: formatear enteros con ``astype(str)`` es varias veces más lento.
+    """
+    fixed = np.frombuffer(template.encode(), dtype=np.uint8)
+    chars = np.broadcast_to(fixed, (n, len(fixed))).copy()
+    slots = fixed == ord('#')
+    chars[:, slots] = alphabet[rng.integers(0, len(alphabet), size=(n, int(slots.sum())))]
+    return chars.view(f'S{len(fixed)}').ravel()
+
+
+def _pick(vocabulary, codes):
+    return vocabulary[codes % len(vocabulary)]
+
+
+def _bytes(values):
+    return np.array(values, dtype=np.bytes_)
+
+
+class CustomerGenerator:
+    def __init__(self, seed=DEFAULT_SEED, countries=len(COUNTRIES), country_skew=1.0,
+                 cities_per_country=50, city_skew=1.0, start=date(2020, 1, 1),
+                 end=date(2022, 1, 1), date_dist='uniform', growth=1.0, duplicate_rate=0.0):
+        """``growth``: tasa anual de crecimiento de altas con ``date_dist='growth'``"""
+        if date_dist not in DATE_DISTRIBUTIONS:
+            raise ValueError(f"Distribución de fechas desconocida: {date_dist}")
+        if not 0 <= duplicate_rate < 1:
+            raise ValueError("duplicate_rate debe estar en [0, 1)")
+        if countries < 1 or cities_per_country < 1:
+            raise ValueError("Se necesita al menos un país y una ciudad por país")
+        if end <= start:
+            raise ValueError(f"El rango de fechas [{start}, {end}) está vacío")
+        self.seed = seed
+        names = COUNTRIES[:countries] + [f"Country {i}" for i in range(len(COUNTRIES), countries)]
+        self.countries = _bytes(names)
+        self.country_p = zipf_weights(countries, country_skew)
+        self.cities_per_country = min(cities_per_country, len(CITY_NAMES))
+        self.city_p = zipf_weights(self.cities_per_country, city_skew)
+        self.cities = _bytes(CITY_NAMES)
+        self.start = np.datetime64(start, 'D')
+        self.days = int((np.datetime64(end, 'D') - self.start).astype(np.int64))
+        self.date_dist = date_dist
+        self.growth = growth
+        self.duplicate_rate = duplicate_rate
+        self.first_names = _bytes(FIRST_NAMES)
+        self.last_names = _bytes(LAST_NAMES)
+        self.company_suffixes = _bytes([' ' + suffix for suffix in COMPANY_SUFFIXES])
+        self.email_domains = _bytes(['@' + domain for domain in EMAIL_DOMAINS])
+        self.web_tlds = _bytes(WEB_TLDS)
+        self.first_lower = np.strings.lower(self.first_names)
+        self.last_lower = np.strings.lower(self.last_names)
+
+    def _is_duplicate(self, rows):
+        threshold = np.uint64(int(self.duplicate_rate * 2 ** 64))
+        return (_hash(rows, self.seed * 8 + 1) < threshold) & (rows > 1)
+
+    def identities(self, rows):
+        """Identidad (fila de la que se copia nombre y email) de cada número de fila (desde 1)"""
+        identity = rows.astype(np.int64)
+        if not self.duplicate_rate:
+            return identity
+        pending = self._is_duplicate(identity)
+        while pending.any():
+            # Un duplicado apunta a una fila anterior; si también lo es, se sigue la cadena
+            current = identity[pending]
+            identity[pending] = (_hash(current, self.seed * 8 + 2)
+                                 % (current - 1).astype(np.uint64)).astype(np.int64) + 1
+            pending[pending] = self._is_duplicate(identity[pending])
+        return identity
+
+    def _dates(self, rng, n):
+        u = rng.random(n)
+        if self.date_dist == 'uniform' or not self.growth:
+            offsets = u * self.days
+        else:
+            # Inversa de la densidad ∝ e^(g·t) en [0, days]: más altas al final
+            rate = self.growth / 365.0
+            offsets = np.log1p(u * np.expm1(rate * self.days)) / rate
+        return self.start + np.minimum(offsets.astype(np.int64), self.days - 1)
+
+    def chunk(self, index, first_row, rows):
+        """Columnas ``{columna_bd: array}`` de las filas ``first_row+1 .. first_row+rows``.
+
+        Los textos son arrays de bytes ASCII (``S<n>``): ocupan la cuarta parte
+        que ``U<n>`` y se escriben en el CSV sin volver a codificarlos.
+        """
+        rng = np.random.default_rng([self.seed, index])
+        row_numbers = np.arange(first_row + 1, first_row + rows + 1, dtype=np.int64)
+        identity = self.identities(row_numbers)
+        first = _hash(identity, self.seed * 8 + 3) % np.uint64(len(FIRST_NAMES))
+        last = _hash(identity, self.seed * 8 + 4) % np.uint64(len(LAST_NAMES))
+        domain = _hash(identity, self.seed * 8 + 5) % np.uint64(len(EMAIL_DOMAINS))
+
+        email = np.strings.add(np.strings.add(self.first_lower[first], b'.'),
+                               self.last_lower[last])
+        email = np.strings.add(np.strings.add(email, identity.astype(np.bytes_)),
+                               self.email_domains[domain])
+
+        country = rng.choice(len(self.countries), size=rows, p=self.country_p)
+        city = rng.choice(self.cities_per_country, size=rows, p=self.city_p)
+        # Desplazamiento por país: cada país tiene su propio conjunto de ciudades
+        city_names = _pick(self.cities, city + country * 7)
+
+        company = np.strings.add(_pick(self.last_names, rng.integers(0, 1 << 30, rows)),
+                                 _pick(self.company_suffixes, rng.integers(0, 1 << 30, rows)))
+        website = np.strings.add(np.strings.add(b'https://www.', _pick(self.last_lower,
+                                                                        rng.integers(0, 1 << 30, rows))),
+                                 _pick(self.web_tlds, rng.integers(0, 1 << 30, rows)))
+        customer_id = _random_strings(rng, rows, CUSTOMER_ID_TEMPLATE, ID_ALPHABET)
+
+        return {
+            'index_field': row_numbers,
+            'customer_id': customer_id,
+            'first_name': self.first_names[first],
+            'last_name': self.last_names[last],
+            'company': company,
+            'city': city_names,
+            'country': self.countries[country],
+            'phone_1': _random_strings(rng, rows, PHONE_TEMPLATE),
+            'phone_2': _random_strings(rng, rows, PHONE_TEMPLATE),
+            'email': email,
+            'subscription_date': self._dates(rng, rows),
+            'website': website,
+        }
+
+
+def chunk_plan(total_rows, chunk_rows):
+    """Lista de ``(índice, primera fila, filas)`` de cada bloque"""
+    return [(k, first, min(chunk_rows, total_rows - first))
+            for k, first in enumerate(range(0, total_rows, chunk_rows))]
+
+
+def _csv_values(values):
+    """Columna como lista de ``bytes`` para el CSV"""
+    if values.dtype.kind == 'M':
+        # Hay pocas fechas distintas: cada una se formatea una sola vez
+        unique, inverse = np.unique(values, return_inverse=True)
+        values = np.datetime_as_string(unique).astype(np.bytes_)[inverse]
+    elif values.dtype.kind != 'S':
+        values = values.astype(np.bytes_)
+    return values.tolist()
+
+
+def _db_values(values):
+    if values.dtype.kind == 'M':
+        return values.astype(object).tolist()  # datetime.date
+    if values.dtype.kind == 'S':
+        return values.astype(np.str_).tolist()
+    return values.tolist()
+
+
+def write_csv_chunk(generator, index, first_row, rows, directory):
+    t0 = time.perf_counter()
+    columns = generator.chunk(index, first_row, rows)
+    fields = [_csv_values(columns[db_col]) for db_col in DB_COLUMNS]
+    path = os.path.join(directory, f"customers-{generator.seed}-{index:05d}.csv")
+    tmp = f"{path}.tmp"
+    # Ningún vocabulario lleva comas ni comillas: las líneas se unen sin escapar
+    # nada, mucho más rápido que DataFrame.to_csv
+    with open(tmp, 'wb') as f:
+        f.write(CSV_HEADER)
+        f.write(b'\n'.join(map(b','.join, zip(*fields))))
+        f.write(b'\n')
+    os.replace(tmp, path)  # Un bloque interrumpido no deja un CSV a medias
+    return rows, time.perf_counter() - t0
+
+
+def insert_chunk(generator, index, first_row, rows):
+    t0 = time.perf_counter()
+    columns = generator.chunk(index, first_row, rows)
+    rows_data = list(zip(*(_db_values(columns[c]) for c in DB_COLUMNS)))
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(rows_data), INSERT_BATCH_ROWS):
+            cursor.executemany(INSERT_CUSTOMERS_SQL, rows_data[i:i + INSERT_BATCH_ROWS])
+        conn.commit()
+        cursor.close()
+    return rows, time.perf_counter() - t0
+
+
+def generate(generator, total_rows, chunk_rows=DEFAULT_CHUNK_ROWS, processes=None,
+             output='csv', directory=DEFAULT_OUTPUT_DIR):
+    """Genera ``total_rows`` filas en paralelo; devuelve estadísticas (filas, segundos, filas/s)"""
+    plan = chunk_plan(total_rows, chunk_rows)
+    if output == 'csv':
+        os.makedirs(directory, exist_ok=True)
+        task, extra = write_csv_chunk, (directory,)
+    else:
+        task, extra = insert_chunk, ()
+    t0 = time.perf_counter()
+    written = 0
+    busy = 0.0
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(task, generator, *unit, *extra) for unit in plan]
+        for future in futures:
+            rows, seconds = future.result()
+            written += rows
+            busy += seconds
+    elapsed = time.perf_counter() - t0
+    return {'rows': written, 'chunks': len(plan), 'seconds': elapsed,
+            'rows_per_second': written / elapsed if elapsed else 0.0,
+            'busy_seconds': busy}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generador de customers sintéticos")
+    parser.add_argument('--rows', type=positive_int, required=True, help="filas a generar")
+    parser.add_argument('--output', choices=('csv', 'db'), default='csv',
+                        help="ficheros CSV por bloques o inserción directa en la BD")
+    parser.add_argument('--dir', default=DEFAULT_OUTPUT_DIR,
+                        help="directorio de los CSV (--output csv)")
+    parser.add_argument('--chunk-rows', type=positive_int, default=DEFAULT_CHUNK_ROWS,
+                        help="filas por bloque (y por fichero CSV)")
+    parser.add_argument('--processes', type=positive_int, default=os.cpu_count(),
+                        help="procesos generadores")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--countries', type=positive_int, default=len(COUNTRIES))
+    parser.add_argument('--country-skew', type=float, default=1.0,
+                        help="exponente de Zipf de los países (0: uniforme)")
+    parser.add_argument('--cities', type=positive_int, default=50, help="ciudades por país")
+    parser.add_argument('--city-skew', type=float, default=1.0,
+                        help="exponente de Zipf de las ciudades dentro de un país")
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2020, 1, 1),
+                        help="primera subscription_date (incluida)")
+    parser.add_argument('--end', type=date.fromisoformat, default=date(2022, 1, 1),
+                        help="última subscription_date (excluida)")
+    parser.add_argument('--date-dist', choices=DATE_DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--growth', type=float, default=1.0,
+                        help="tasa anual de crecimiento de altas con --date-dist growth")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help="fracción de filas que repiten el email de una fila anterior")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    if args.end <= args.start:
+        parser.error("--end debe ser posterior a --start")
+    if not 0 <= args.duplicate_rate < 1:
+        parser.error("--duplicate-rate debe estar en [0, 1)")
+    configure_backend(args)
+
+    generator = CustomerGenerator(args.seed, args.countries, args.country_skew, args.cities,
+                                  args.city_skew, args.start, args.end, args.date_dist,
+                                  args.growth, args.duplicate_rate)
+    if args.output == 'db':
+        db_manager = DatabaseManager()
+        db_manager.create_customers_table()
+    stats = generate(generator, args.rows, args.chunk_rows, args.processes, args.output,
+                     args.dir)
+    destino = args.dir if args.output == 'csv' else 'la BD'
+    print(f"{stats['rows']} filas en {stats['chunks']} bloques hacia {destino}: "
+          f"{stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} filas/s, "
+          f"{args.processes} procesos)")
+    if args.output == 'db':
+        # Índices después de la carga, como insert-data.py
+        db_manager.ensure_indexes()
@@ -0,0 +1,40 @@
+"""Configuración común de las pruebas: el proyecto no es un paquete instalable"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+import synthetic_data  # noqa: E402
+
+CUSTOMERS_ROWS = 3_000
+# Casos límite que el generador no produce: país o ciudad NULL
+EXTRA_ROWS = [
+    (CUSTOMERS_ROWS + 1, 'x1', 'Ana', 'Ruiz', 'Ruiz Ltd', 'Sintierra', None,
+     '+00-000-000-000', '+00-000-000-000', 'ana.ruiz.x1@example.com', '2021-06-01',
+     'https://www.ruiz.com'),
+    (CUSTOMERS_ROWS + 2, 'x2', 'Leo', 'Diaz', 'Diaz LLC', None, 'Spain',
+     '+00-000-000-000', '+00-000-000-000', 'leo.diaz.x2@example.com', '2021-07-15',
+     'https://www.diaz.com'),
+]
+
+
+@pytest.fixture
+def customers_db(tmp_path):
+    """Base SQLite temporal con customers sintéticos; el motor queda apuntando a ella"""
+    path = str(tmp_path / 'customers.db')
+    database.set_backend('sqlite', path=path)
+    database.DatabaseManager().create_customers_table()
+    generator = synthetic_data.CustomerGenerator(seed=7, countries=8, cities_per_country=6,
+                                                 duplicate_rate=0.05)
+    synthetic_data.insert_chunk(generator, 0, 0, CUSTOMERS_ROWS)
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(database.INSERT_CUSTOMERS_SQL, EXTRA_ROWS)
+        conn.commit()
+        cursor.close()
+    return path
@@ -0,0 +1,88 @@
+"""Checkpoints duraderos y reanudación del pipeline paralelo"""
+import json
+import os
+
+import pytest
+
+import database
+from benchmark import load_script
+from checkpoint import Checkpoint, CheckpointError
+from shuffle import NUM_PARTITIONS, partition_path
+
+pipeline = load_script('Pipeline-Hash.py')
+serial = load_script('sin-Pipeline-Hash.py')
+
+
+def test_save_and_load(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'sub' / 'run.json'))
+    assert checkpoint.load() is None
+    checkpoint.save({'last_key': 42, 'totals': [1, 2]})
+    state = checkpoint.load()
+    assert state['last_key'] == 42 and state['totals'] == [1, 2]
+    assert checkpoint.saves == 1
+    assert os.listdir(tmp_path / 'sub') == ['run.json']  # Sin temporales
+
+
+def test_unreadable_or_foreign_checkpoint(tmp_path):
+    path = tmp_path / 'run.json'
+    checkpoint = Checkpoint(str(path))
+    path.write_text('{"last_key": 4')
+    with pytest.raises(CheckpointError):
+        checkpoint.load()
+    path.write_text(json.dumps({'format': 0}))
+    with pytest.raises(CheckpointError):
+        checkpoint.load()
+
+    checkpoint.save({'partitions': 4})
+    checkpoint.check_compatible(checkpoint.load(), {'partitions': 4})
+    with pytest.raises(CheckpointError):
+        checkpoint.check_compatible(checkpoint.load(), {'partitions': 8})
+
+
+def _execute(*statements):
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        for sql in statements:
+            cursor.execute(sql)
+        conn.commit()
+        cursor.close()
+
+
+def _spill(directory):
+    return [partition_path(directory, p) for p in range(NUM_PARTITIONS)]
+
+
+def test_resume_matches_serial(customers_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'HASH_ITERATIONS', 3)
+    monkeypatch.setattr(serial, 'HASH_ITERATIONS', 3)
+    monkeypatch.setattr(pipeline, 'CHUNK_SIZE', 100)
+    expected, _ = serial.serial_pipeline_hash(use_cache=False,
+                                              spill_dir=str(tmp_path / 'serial'))
+
+    spill_dir = str(tmp_path / 'parallel')
+    checkpoint_path = str(tmp_path / 'run.checkpoint.json')
+    run = dict(num_workers=2, cache_path=None, spill_dir=spill_dir,
+               checkpoint_path=checkpoint_path, adaptive=False)
+    monkeypatch.setattr(pipeline, 'BATCH_SIZE', 500)
+
+    # Primera ejecución sobre la mitad de la tabla: su checkpoint final equivale
+    # al que dejaría una ejecución cortada tras la clave 1500
+    _execute("CREATE TABLE customers_rest AS SELECT * FROM customers WHERE id > 1500",
+             "DELETE FROM customers WHERE id > 1500")
+    pipeline.run_pipeline(**run)
+    _execute("INSERT INTO customers SELECT * FROM customers_rest")
+    checkpoint = Checkpoint(checkpoint_path)
+    state = checkpoint.load()
+    assert state['last_key'] == 1500
+    checkpoint.save(dict(state, finished=False))
+    # Lo escrito después del checkpoint se descarta al reanudar
+    for path in _spill(spill_dir):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("perdido@example.com\t00\n")
+
+    totals = pipeline.run_pipeline(resume=True, **run)
+    assert totals == [expected[p] for p in range(NUM_PARTITIONS)]
+    for ours, theirs in zip(_spill(spill_dir), _spill(str(tmp_path / 'serial'))):
+        with open(ours, encoding='utf-8') as a, open(theirs, encoding='utf-8') as b:
+            assert a.read() == b.read()
+    assert checkpoint.load()['finished']
@@ -0,0 +1,75 @@
+"""Registro de unidades y coordinador del modo multi-nodo (sin BD)"""
+import time
+
+import pytest
+
+import cluster
+
+AUTHKEY = 'pruebas'
+
+
+def square(data):
+    return data * data
+
+
+def test_complete_counts_first_result_only():
+    registry = cluster.WorkRegistry([('x', 1), ('x', 2)])
+    unit, _, _ = registry.lease('a')
+    assert registry.complete('a', unit, 'primero')
+    assert not registry.complete('b', unit, 'segundo')
+    assert registry.next_result(0) == (unit, 'primero')
+    assert registry.next_result(0) is None
+    assert registry.status()['duplicates'] == 1
+
+
+def test_result_is_queued_before_unit_is_done():
+    registry = cluster.WorkRegistry([('x', 1)])
+    unit, _, _ = registry.lease('a')
+    registry.complete('a', unit, 'r')
+    assert registry.finished()
+    assert registry.next_result(0) == (unit, 'r')
+
+
+def test_fail_retries_then_closes():
+    registry = cluster.WorkRegistry([('x', 1)], max_attempts=2)
+    unit, _, _ = registry.lease('a')
+    registry.fail('a', unit, 'error 1')
+    assert registry.failure is None
+    assert registry.lease('a')[0] == unit  # Vuelve a la cabeza de la cola
+    registry.fail('a', unit, 'error 2')
+    assert registry.failure and registry.closed()
+    assert registry.lease('a') is None
+
+
+def test_reap_reassigns_units_of_silent_worker():
+    registry = cluster.WorkRegistry([('x', 1), ('x', 2)], heartbeat_timeout=0.05)
+    unit, _, _ = registry.lease('muerto')
+    time.sleep(0.1)
+    registry.heartbeat('vivo')
+    assert registry.reap() == ['muerto']
+    assert registry.lease('vivo')[0] == unit
+    assert registry.status()['reassigned'] == 1
+
+
+def test_parse_address_defaults_to_loopback():
+    assert cluster.parse_address(':6000') == ('127.0.0.1', 6000)
+    assert cluster.parse_address('0.0.0.0:6000') == ('0.0.0.0', 6000)
+
+
+def test_worker_requires_authkey():
+    with pytest.raises(cluster.ClusterError):
+        cluster.run_worker(('127.0.0.1', 1), {}, authkey=None)
+
+
+def test_coordinator_delivers_every_unit_exactly_once():
+    units = [('square', i) for i in range(300)]
+    seen = {}
+
+    def on_result(unit, result):
+        seen[unit] = seen.get(unit, 0) + 1
+        assert result == units[unit][1] ** 2
+
+    status = cluster.run_coordinator(units, on_result, ('127.0.0.1', 0), {'square': square},
+                                     local_workers=3, authkey=AUTHKEY)
+    assert seen == {unit: 1 for unit in range(len(units))}
+    assert status['done'] == len(units)
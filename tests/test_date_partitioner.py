@@ -0,0 +1,71 @@
+"""Particionado de fechas equilibrado a partir del histograma real"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from date_partitioner import (add_months, as_date, balanced_ranges, calendar_months,
+                              count_by_month, fetch_date_histogram, last_months_window,
+                              merge_counts, monthly_series, window_from_bounds)
+
+
+def test_month_arithmetic():
+    assert add_months(date(2021, 11, 17), 2) == date(2022, 1, 1)
+    assert add_months(date(2021, 1, 31), -1) == date(2020, 12, 1)
+    assert calendar_months(date(2021, 1, 15), date(2021, 3, 1)) == [date(2021, 1, 1),
+                                                                   date(2021, 2, 1)]
+    assert as_date(datetime(2021, 5, 6, 7, 8)) == as_date('2021-05-06') == date(2021, 5, 6)
+
+
+def test_window_from_bounds():
+    low, high = date(2020, 3, 10), date(2021, 6, 20)
+    assert window_from_bounds(low, high, 12) == (date(2020, 7, 1), date(2021, 7, 1))
+    assert window_from_bounds(low, high, 36) == (date(2020, 3, 1), date(2021, 7, 1))
+    assert window_from_bounds(low, high, None) == (date(2020, 3, 1), date(2021, 7, 1))
+    assert window_from_bounds(None, None) == (None, None)
+
+
+def _check_ranges(ranges, start, end):
+    assert ranges[0][0] == start and ranges[-1][1] == end
+    assert all(lo < hi for lo, hi in ranges)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize('partitions', [1, 2, 5, 8])
+def test_skewed_histogram_is_balanced(partitions):
+    start, end = date(2021, 1, 1), date(2021, 3, 1)
+    # Crecimiento lineal: los últimos días tienen muchas más filas
+    histogram = [(start + timedelta(days=d), d + 1) for d in range((end - start).days)]
+    ranges = balanced_ranges(histogram, partitions, start, end)
+    _check_ranges(ranges, start, end)
+    assert len(ranges) == partitions
+    total = sum(n for _, n in histogram)
+    loads = [sum(n for day, n in histogram if lo <= day < hi) for lo, hi in ranges]
+    assert max(loads) - total / partitions <= max(n for _, n in histogram)
+
+
+def test_heavy_day_is_not_split():
+    start, end = date(2021, 1, 1), date(2021, 1, 11)
+    histogram = [(date(2021, 1, 5), 1_000), (date(2021, 1, 9), 1)]
+    ranges = balanced_ranges(histogram, 4, start, end)
+    _check_ranges(ranges, start, end)
+    assert len(ranges) < 4
+
+
+def test_empty_histogram_splits_by_days():
+    start, end = date(2021, 1, 1), date(2021, 1, 9)
+    ranges = balanced_ranges([], 4, start, end)
+    _check_ranges(ranges, start, end)
+    assert len(ranges) == 4
+
+
+def test_partitions_cover_the_window(customers_db):
+    with database.get_pool().connection() as conn:
+        start, end = last_months_window(conn, 12)
+        histogram = fetch_date_histogram(conn, start, end)
+        ranges = balanced_ranges(histogram, 4, start, end)
+        partials = [count_by_month(conn, lo, hi) for lo, hi in ranges]
+        whole = count_by_month(conn, start, end)
+    _check_ranges(ranges, start, end)
+    assert merge_counts(partials) == whole
+    assert sum(n for _, n in monthly_series(whole, start, end)) == sum(n for _, n in histogram)
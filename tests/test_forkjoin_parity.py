@@ -0,0 +1,23 @@
+"""Fork-Join serial y paralelo dan las mismas ciudades por país con el mismo plan"""
+import pytest
+
+from benchmark import load_script
+from forkjoin_planner import PLAN_FANOUT, PLAN_GROUPED
+
+serial = load_script('sin-Fork–Join.py')
+parallel = load_script('Fork–Join.py')
+
+
+@pytest.mark.parametrize('plan', [PLAN_FANOUT, PLAN_GROUPED])
+def test_serial_and_parallel_plans_agree(customers_db, plan):
+    if plan == PLAN_GROUPED:
+        expected = serial.contar_ciudades_agrupado()
+    else:
+        expected = serial.contar_ciudades_serial()
+    resultados, _, _ = parallel.fork_join_exacto(plan, 3)
+    assert resultados == expected
+    assert expected[None] == 0  # País NULL: como WHERE Country = NULL
+
+
+def test_grouped_matches_fanout(customers_db):
+    assert serial.contar_ciudades_agrupado() == serial.contar_ciudades_serial()
@@ -0,0 +1,85 @@
+"""Tareas por coste y reparto con robo de trabajo de Fork-Join"""
+import threading
+import time
+
+import pytest
+
+from forkjoin_scheduler import (Task, WorkStealingScheduler, estimate_costs, load_cost_history,
+                                pack_tasks, save_cost_history)
+
+# Una clave enorme y muchas pequeñas, como países con distribución de Zipf
+COSTS = {'big': 100.0, 'mid': 30.0, **{f"k{i}": 1.0 for i in range(70)}}
+
+
+def test_pack_tasks_covers_every_key_once():
+    tasks = pack_tasks(COSTS, 4)
+    keys = [key for task in tasks for key in task.keys]
+    assert sorted(keys) == sorted(COSTS)
+    assert [t.cost for t in tasks] == sorted((t.cost for t in tasks), reverse=True)
+    assert tasks[0].keys == ['big']  # Las grandes van solas
+    target = sum(COSTS.values()) / (4 * 4)
+    assert all(t.cost <= target for t in tasks if len(t.keys) > 1)
+
+
+def test_pack_tasks_limits_batch_keys():
+    tasks = pack_tasks({f"k{i}": 1.0 for i in range(50)}, 1, tasks_per_worker=1,
+                       max_batch_keys=8)
+    assert max(len(t.keys) for t in tasks) == 8
+    assert sum(len(t.keys) for t in tasks) == 50
+
+
+def test_estimate_costs_uses_measured_seconds_then_rows():
+    history = {'a': {'seconds': 2.0, 'rows': 1_000}, 'b': {'seconds': None, 'rows': 500}}
+    costs = estimate_costs(['a', 'b', 'c'], history, {'c': 3_000})
+    assert costs == {'a': 2.0, 'b': 1.0, 'c': 6.0}
+
+
+def test_cost_history_is_smoothed(tmp_path):
+    path = str(tmp_path / 'costs.json')
+    save_cost_history(path, load_cost_history(path), {'a': (2.0, 10)})
+    save_cost_history(path, load_cost_history(path), {'a': (4.0, 10), 'b': (None, 5)})
+    assert load_cost_history(path) == {'a': {'seconds': 3.0, 'rows': 10},
+                                       'b': {'seconds': None, 'rows': 5}}
+
+
+def test_scheduler_runs_every_task_once():
+    tasks = pack_tasks(COSTS, 3)
+    scheduler = WorkStealingScheduler(3)
+    results = scheduler.run(tasks, lambda task: list(task.keys))
+    assert sorted(k for _, keys, _ in results for k in keys) == sorted(COSTS)
+    assert len(results) == len(tasks)
+
+
+def test_idle_worker_steals_from_the_busiest():
+    scheduler = WorkStealingScheduler(2)
+    # La estimación es mala: la tarea "pequeña" del worker 1 bloquea hasta que
+    # el worker 0 haya terminado la suya y robado las pequeñas pendientes
+    started, release = threading.Event(), threading.Event()
+    big, slow = Task(['grande'], 10.0), Task(['lenta'], 1.0)
+    tasks = [big, slow] + [Task([f"p{i}"], 0.5) for i in range(6)]
+    done = []
+
+    def run_task(task):
+        if task is big:
+            started.wait(5)
+        if task is slow:
+            started.set()
+            release.wait(5)
+        done.append(task.keys[0])
+        if len(done) == len(tasks) - 1:
+            release.set()
+        return task.keys[0]
+
+    results = scheduler.run(tasks, run_task)
+    assert len(results) == len(tasks)
+    assert scheduler.steals == 6 and done[-1] == 'lenta'
+
+
+def test_scheduler_propagates_task_errors():
+    def run_task(task):
+        if task.keys == ['k3']:
+            raise ValueError("consulta fallida")
+        time.sleep(0.001)
+
+    with pytest.raises(ValueError):
+        WorkStealingScheduler(2).run([Task([f"k{i}"], 1.0) for i in range(6)], run_task)
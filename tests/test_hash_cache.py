@@ -0,0 +1,73 @@
+"""Caché persistente de hashes compartida entre procesos"""
+import multiprocessing
+
+import pytest
+
+from hash_cache import HashCache, email_digest, _HEADER, _RECORD_SIZE
+
+
+def _digest(email):
+    return email_digest(email + '!')
+
+
+def test_values_survive_reopen(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    with HashCache(path, max_bytes=64 * 1024) as cache:
+        assert cache.get_or_compute('ana@example.com', 10, _digest) == _digest('ana@example.com')
+        assert cache.stats() == {'hits_lru': 0, 'hits_disk': 0, 'misses': 1}
+    with HashCache(path) as cache:
+        assert cache.get(email_digest('ana@example.com'), 10) == _digest('ana@example.com')
+        assert cache.get(email_digest('ana@example.com'), 11) is None  # Otras iteraciones
+        assert cache.stats() == {'hits_lru': 0, 'hits_disk': 1, 'misses': 1}
+
+
+def test_torn_record_is_a_miss(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    key = email_digest('leo@example.com')
+    with HashCache(path, max_bytes=64 * 1024) as cache:
+        cache.put(key, 10, _digest('leo@example.com'))
+        offset = cache._slots(key)[0]
+    with open(path, 'r+b') as f:
+        f.seek(offset + 20)  # Dentro del valor: el CRC ya no coincide
+        f.write(b'\xff')
+    with HashCache(path) as cache:
+        assert cache.get(key, 10) is None
+
+
+def test_full_set_evicts_within_the_set(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    # Un único conjunto: el quinto registro desaloja a uno de los cuatro
+    with HashCache(path, max_bytes=_HEADER.size + 4 * _RECORD_SIZE, lru_size=1) as cache:
+        assert cache.num_sets == 1
+        emails = [f"e{i}@example.com" for i in range(5)]
+        for email in emails:
+            cache.put(email_digest(email), 10, _digest(email))
+    with HashCache(path) as cache:
+        found = [cache.get(email_digest(e), 10) == _digest(e) for e in emails]
+    assert found[-1] and sum(found) == 4
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'cache.bin'
+    path.write_bytes(b'x' * 64)
+    with pytest.raises(ValueError):
+        HashCache(str(path))
+
+
+def _fill(path, emails):
+    with HashCache(path) as cache:
+        for email in emails:
+            cache.get_or_compute(email, 10, _digest)
+
+
+def test_processes_share_the_file(tmp_path):
+    path = str(tmp_path / 'cache.bin')
+    HashCache(path, max_bytes=256 * 1024).close()
+    emails = [f"p{i}@example.com" for i in range(200)]
+    child = multiprocessing.Process(target=_fill, args=(path, emails))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    with HashCache(path) as cache:
+        assert all(cache.get_or_compute(e, 10, None) == _digest(e) for e in emails)
+        assert cache.stats()['misses'] == 0
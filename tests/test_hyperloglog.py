@@ -0,0 +1,64 @@
+"""HyperLogLog y sketches de ciudades por país"""
+import pytest
+
+import city_sketches
+import database
+from backends import accent_case_key
+from hyperloglog import HyperLogLog
+
+
+def _sketch(values, precision=12):
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize('n', [10, 1_000, 50_000])
+def test_estimate_within_error_bounds(n):
+    sketch = _sketch(f"ciudad-{i}" for i in range(n))
+    # Error típico 1.04/sqrt(m) ~ 1.6 % con p=12; se admiten 4 desviaciones
+    assert abs(sketch.count() - n) <= max(1, 0.065 * n)
+
+
+def test_merge_equals_union():
+    a = _sketch(f"c{i}" for i in range(0, 3_000))
+    b = _sketch(f"c{i}" for i in range(2_000, 5_000))
+    union = _sketch(f"c{i}" for i in range(5_000))
+    assert a.merge(b).registers == union.registers
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_bytes_round_trip():
+    sketch = _sketch(f"c{i}" for i in range(500))
+    copy = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert copy.precision == sketch.precision and copy.registers == sketch.registers
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(b'XXXX' + sketch.to_bytes()[4:])
+
+
+def test_scan_folds_cities_with_collation(customers_db, monkeypatch):
+    rows = [(10_001 + i, f"y{i}", 'Eva', 'Gil', 'Gil SA', city, country, '+00', '+00',
+             f"eva.gil.y{i}@example.com", '2021-01-01', 'https://www.gil.com')
+            for i, (city, country) in enumerate([('Lima', 'Perú'), ('LIMA', 'peru'),
+                                                 ('lima ', 'PERU'), ('Cusco', 'Peru')])]
+    with database.get_pool().connection() as conn:
+        last_id = conn.query_one("SELECT MAX(id) FROM customers")[0]
+        cursor = conn.cursor()
+        cursor.executemany(database.INSERT_CUSTOMERS_SQL, rows)
+        conn.commit()
+        cursor.close()
+    # Collation de MySQL sobre SQLite: acentos, mayúsculas y espacios finales no cuentan
+    monkeypatch.setattr(type(database.get_backend()), 'text_key', staticmethod(accent_case_key))
+
+    with database.get_pool().connection() as conn:
+        first = city_sketches.scan_shard(conn, last_id, last_id + 2)
+        second = city_sketches.scan_shard(conn, last_id + 2, last_id + 4)
+    assert list(first) == ['Perú'] and list(second) == ['PERU']
+    merged = city_sketches.merge_sketches([first, second])
+    assert list(merged) == ['Perú']
+    assert merged['Perú'].count() == 2  # Lima y Cusco
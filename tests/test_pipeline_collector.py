@@ -0,0 +1,48 @@
+"""Collector del pipeline: orden de aplicación y liberación de la ventana"""
+from benchmark import load_script
+
+pipeline = load_script('Pipeline-Hash.py')
+
+
+class RecordingController:
+    def __init__(self):
+        self.released = 0
+
+    def release(self, emails):
+        self.released += 1
+
+    def close(self):
+        pass
+
+
+class ScriptedQueue:
+    """Cola que entrega ``items`` en orden y anota lo liberado antes de cada get"""
+
+    def __init__(self, items, controller):
+        self.items = list(items)
+        self.controller = controller
+        self.released_before_get = []
+
+    def get(self):
+        self.released_before_get.append(self.controller.released)
+        return self.items.pop(0)
+
+
+def _buckets(n):
+    buckets = [[] for _ in range(pipeline.NUM_PARTITIONS)]
+    buckets[0] = [(f"e{i}", b'') for i in range(n)]
+    return buckets
+
+
+def test_out_of_order_sub_batches_keep_their_window_slot():
+    controller = RecordingController()
+    # El sub-lote 0 es lento: llegan antes el 1 y el 2
+    queue = ScriptedQueue([(1, 20, _buckets(2)), (2, 30, _buckets(3)), (0, 10, _buckets(1)),
+                           None], controller)
+    progress = pipeline.new_progress()
+    totals = pipeline.collector(queue, 1, controller, progress=progress)
+
+    # Nada se libera mientras falte el 0; al llegar se aplican (y liberan) los tres
+    assert queue.released_before_get == [0, 0, 0, 3]
+    assert sum(totals) == 6
+    assert progress['applied'] == 3 and progress['last_key'] == 30
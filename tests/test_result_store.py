@@ -0,0 +1,61 @@
+"""Agregados incrementales: unión de parciales y collation del motor"""
+import pytest
+
+import database
+import result_store
+import synthetic_data
+from backends import accent_case_key
+from result_store import CitiesByCountry, MonthlyCountryCounts
+
+
+class CaseInsensitiveBackend:
+    """Motor con la collation ``_ai_ci`` de MySQL, sin servidor"""
+    text_key = staticmethod(accent_case_key)
+
+
+@pytest.fixture
+def mysql_collation(monkeypatch):
+    monkeypatch.setattr(result_store, 'get_backend', lambda: CaseInsensitiveBackend)
+
+
+def test_accent_case_key():
+    assert {accent_case_key(c) for c in ('París', 'paris', 'Paris ', 'PARIS')} == {'paris'}
+
+
+def test_cities_fold_case_and_accents(mysql_collation):
+    aggregate = CitiesByCountry()
+    key = accent_case_key
+    state = aggregate.merge(aggregate.empty(), {'Peru': {key('Lima'), key('Cuzco')}})
+    state = aggregate.merge(state, {'peru': {key('LIMA'), key('Cusco')}, None: set()})
+    assert CitiesByCountry.counts(state) == {'Peru': 3, None: 0}
+
+
+def test_monthly_counts_fold_countries(mysql_collation):
+    aggregate = MonthlyCountryCounts()
+    state = aggregate.merge(aggregate.empty(), {'2021-01': {'Peru': 2, None: 1}})
+    state = aggregate.merge(state, {'2021-01': {'peru': 3}, '2021-02': {'PERÚ': 1}})
+    assert state == {'2021-01': {'Peru': 5, None: 1}, '2021-02': {'Peru': 1}}
+
+
+def test_monthly_counts_encode_roundtrip():
+    aggregate = MonthlyCountryCounts()
+    state = {'2021-01': {'Peru': 5, None: 1}, '2021-02': {'Chile': 2}}
+    assert aggregate.decode(aggregate.encode(state)) == state
+
+
+def test_incremental_refresh_matches_full(customers_db, tmp_path):
+    database.DatabaseManager().ensure_change_tracking()
+    store = result_store.ResultStore(str(tmp_path / 'incremental'))
+    result_store.refresh(MonthlyCountryCounts(), store, 2)
+
+    generator = synthetic_data.CustomerGenerator(seed=8, countries=8)
+    synthetic_data.insert_chunk(generator, 0, 0, 500)
+    state, info = result_store.refresh(MonthlyCountryCounts(), store, 2)
+    assert info['mode'] == result_store.MODE_INCREMENTAL and info['new_rows'] == 500
+
+    full, info = result_store.refresh(MonthlyCountryCounts(),
+                                      result_store.ResultStore(str(tmp_path / 'full')), 2)
+    assert info['mode'] == result_store.MODE_FULL
+    assert state == full
+    _, info = result_store.refresh(MonthlyCountryCounts(), store, 2)
+    assert info['mode'] == result_store.MODE_UNCHANGED
@@ -0,0 +1,52 @@
+"""Shuffle compartido por los pipelines serial y paralelo"""
+import pytest
+
+from benchmark import load_script
+from shuffle import (NUM_PARTITIONS, SpillWriter, partition_for, partition_path, read_partition,
+                     truncate_partitions)
+
+pipeline = load_script('Pipeline-Hash.py')
+serial = load_script('sin-Pipeline-Hash.py')
+
+
+def test_partition_is_stable_and_in_range():
+    emails = [f"u{i}@example.com" for i in range(1_000)]
+    parts = [partition_for(e) for e in emails]
+    assert parts == [partition_for(e) for e in emails]
+    assert set(parts) == set(range(NUM_PARTITIONS))
+    assert all(0 <= partition_for(e, 7) < 7 for e in emails)
+
+
+def test_spill_round_trip_and_truncate(tmp_path):
+    directory = str(tmp_path / 'spill')
+    with SpillWriter(directory) as spill:
+        spill.write_buckets([[('a@x', b'\x01')], [], [('b@x', b'\x02'), ('c@x', b'\x03')], []])
+        sizes = spill.sync()
+        spill.write(0, [('d@x', b'\x04')])
+        assert spill.counts == [2, 0, 2, 0]
+    truncate_partitions(directory, sizes)
+    assert list(read_partition(directory, 0)) == [('a@x', b'\x01')]
+    assert list(read_partition(directory, 2)) == [('b@x', b'\x02'), ('c@x', b'\x03')]
+
+    with SpillWriter(directory, reset=False) as spill:
+        spill.write(1, [('e@x', b'\x05')])
+    assert list(read_partition(directory, 1)) == [('e@x', b'\x05')]
+    assert len(list(read_partition(directory, 0))) == 1  # reset=False no borra
+    SpillWriter(directory).close()
+    assert all(not list(read_partition(directory, p)) for p in range(NUM_PARTITIONS))
+
+
+@pytest.mark.parametrize('adaptive', [False, True])
+def test_parallel_pipeline_matches_serial(customers_db, tmp_path, monkeypatch, adaptive):
+    monkeypatch.setattr(pipeline, 'HASH_ITERATIONS', 3)
+    monkeypatch.setattr(serial, 'HASH_ITERATIONS', 3)
+    monkeypatch.setattr(pipeline, 'CHUNK_SIZE', 250)
+    expected, total = serial.serial_pipeline_hash(use_cache=False,
+                                                  spill_dir=str(tmp_path / 'serial'))
+    totals = pipeline.run_pipeline(num_workers=2, cache_path=None, adaptive=adaptive,
+                                   spill_dir=str(tmp_path / 'parallel'))
+    assert totals == [expected[p] for p in range(NUM_PARTITIONS)] and sum(totals) == total
+    for p in range(NUM_PARTITIONS):
+        with open(partition_path(str(tmp_path / 'serial'), p), encoding='utf-8') as a, \
+                open(partition_path(str(tmp_path / 'parallel'), p), encoding='utf-8') as b:
+            assert a.read() == b.read()
@@ -0,0 +1,49 @@
+"""La instantánea columnar da los mismos conteos que las consultas sobre la BD"""
+from datetime import date
+
+import database
+import snapshot
+from backends import accent_case_key
+from benchmark import load_script
+from result_store import MonthlyCountryCounts, ResultStore, refresh
+
+serial = load_script('sin-Fork–Join.py')
+
+
+def _export(tmp_path, text_key=None):
+    with database.get_pool().connection() as conn:
+        path = snapshot.export_snapshot(conn, str(tmp_path / 'snapshot'), text_key=text_key)
+    return snapshot.open_snapshot(path)
+
+
+def test_cities_match_database(customers_db, tmp_path):
+    snap = _export(tmp_path, database.get_backend().text_key)
+    assert snap.num_rows == 3_002
+    assert serial.contar_ciudades_snapshot(snap.path) == serial.contar_ciudades_serial()
+
+
+def test_monthly_counts_match_database(customers_db, tmp_path):
+    snap = _export(tmp_path, database.get_backend().text_key)
+    state, _ = refresh(MonthlyCountryCounts(), ResultStore(str(tmp_path / 'results')))
+    assert snapshot.count_by_month_country(snap, date(1970, 1, 1), date(2100, 1, 1)) == state
+
+
+def test_collated_columns_share_codes(customers_db, tmp_path):
+    rows = [(3_100 + i, f"y{i}", 'Eva', 'Gil', 'Gil SA', city, country, '+00', '+00',
+             email, '2021-01-01', 'https://www.gil.com')
+            for i, (city, country, email) in enumerate([
+                ('Lima', 'Perú', 'eva@example.com'), ('LIMA', 'peru', 'EVA@example.com'),
+                ('Cusco', 'PERU', 'eva@example.com')])]
+    with database.get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(database.INSERT_CUSTOMERS_SQL, rows)
+        conn.commit()
+        cursor.close()
+
+    snap = _export(tmp_path, accent_case_key)
+    assert snap.manifest['collated_columns'] == ['city', 'country']
+    assert serial.contar_ciudades_snapshot(snap.path)['Perú'] == 2
+    assert 'peru' not in snap.dictionary('country').values()
+    # Los emails se guardan tal cual: el pipeline hashea la cadena original
+    emails = snap.dictionary('email').values()
+    assert 'eva@example.com' in emails and 'EVA@example.com' in emails
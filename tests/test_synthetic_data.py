@@ -0,0 +1,55 @@
+"""Generador sintético: determinismo, duplicados y validación de parámetros"""
+import argparse
+import filecmp
+import os
+
+import numpy as np
+import pytest
+
+import synthetic_data
+from synthetic_data import CustomerGenerator
+
+
+def test_output_does_not_depend_on_processes(tmp_path):
+    generator = CustomerGenerator(seed=3, duplicate_rate=0.1, date_dist='growth')
+    for processes in (1, 2):
+        synthetic_data.generate(generator, 2_500, 1_000, processes, 'csv',
+                                str(tmp_path / f"p{processes}"))
+    names = sorted(os.listdir(tmp_path / 'p1'))
+    assert len(names) == 3
+    match, mismatch, errors = filecmp.cmpfiles(tmp_path / 'p1', tmp_path / 'p2', names,
+                                               shallow=False)
+    assert match == names and not mismatch and not errors
+
+
+def test_duplicates_point_to_earlier_rows():
+    generator = CustomerGenerator(seed=5, duplicate_rate=0.2)
+    rows = np.arange(1, 20_001)
+    identity = generator.identities(rows)
+    assert (identity <= rows).all()
+    duplicated = identity != rows
+    assert 0.15 < duplicated.mean() < 0.25
+    # La identidad de un duplicado es siempre una fila que no lo es
+    assert (identity[identity - 1] == identity).all()
+
+
+def test_chunk_columns_and_ranges():
+    generator = CustomerGenerator(seed=1, countries=4, cities_per_country=3)
+    columns = generator.chunk(2, 100, 50)
+    assert columns['index_field'].tolist() == list(range(101, 151))
+    assert len(set(columns['country'].tolist())) <= 4
+    dates = columns['subscription_date']
+    assert dates.min() >= np.datetime64('2020-01-01') and dates.max() < np.datetime64('2022-01-01')
+
+
+@pytest.mark.parametrize('kwargs', [{'countries': 0}, {'cities_per_country': 0},
+                                    {'duplicate_rate': 1.0}, {'date_dist': 'normal'}])
+def test_invalid_generator_parameters(kwargs):
+    with pytest.raises(ValueError):
+        CustomerGenerator(**kwargs)
+
+
+@pytest.mark.parametrize('text', ['0', '-3', 'x'])
+def test_positive_int_rejects(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        synthetic_data.positive_int(text)
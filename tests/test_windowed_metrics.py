@@ -0,0 +1,54 @@
+"""Scan de prefijos de windowed_metrics y paridad BSP serial / paralelo"""
+import pytest
+
+import database
+from benchmark import load_script
+from bsp_runtime import BSPEngine
+from result_store import MonthlyCountryCounts, ResultStore, refresh
+from windowed_metrics import IDENTITY, combine, compute_metrics, summarize
+
+parallel = load_script('BSP-style.py')
+serial = load_script('sin-BSP-style.py')
+
+SERIES = [5, 0, 7, 3, 12, 9, 1, 4]
+
+
+@pytest.mark.parametrize('rolling', [1, 2, 3, 5])
+def test_combine_is_associative_with_identity(rolling):
+    a, b, c = (summarize(SERIES[i:j], rolling) for i, j in [(0, 3), (3, 4), (4, 8)])
+    assert combine(combine(a, b, rolling), c, rolling) == combine(a, combine(b, c, rolling),
+                                                                  rolling)
+    assert combine(IDENTITY, a, rolling) == a == combine(a, IDENTITY, rolling)
+    assert combine(combine(a, b, rolling), c, rolling) == summarize(SERIES, rolling)
+
+
+@pytest.mark.parametrize('rolling', [1, 3, 5])
+def test_metrics_from_prefix_match_whole_series(rolling):
+    series = [(f"2021-{m:02d}", n) for m, n in enumerate(SERIES, 1)]
+    whole = compute_metrics(series, {}, rolling=rolling)
+    for cut in range(len(series) + 1):
+        prefix = summarize([n for _, n in series[:cut]], rolling)
+        assert (compute_metrics(series[:cut], {}, rolling=rolling)
+                + compute_metrics(series[cut:], {}, prefix, rolling=rolling)) == whole
+
+
+@pytest.mark.parametrize('partitions', [1, 3, 4])
+def test_bsp_parallel_matches_serial(customers_db, partitions):
+    window, fechas = serial.generate_balanced_ranges(partitions, 12)
+    assert (window, fechas) == parallel.generate_balanced_ranges(partitions, 12)
+    _, expected = serial.conteo_serial(fechas, window, rolling=3)
+
+    with BSPEngine(len(fechas), slot_size=parallel.MESSAGE_SLOT_SIZE) as engine:
+        results = engine.run(parallel.WindowedMetricsProgram(fechas, window, rolling=3), fechas)
+    assert parallel.collect_rows(results) == expected
+
+
+def test_incremental_counts_match_serial(customers_db, tmp_path):
+    database.DatabaseManager().ensure_change_tracking()
+    stored, _ = refresh(MonthlyCountryCounts(), ResultStore(str(tmp_path)))
+    window, fechas = parallel.generate_balanced_ranges(3, 12, stored_counts=stored)
+    _, expected = serial.conteo_serial(fechas, window)
+
+    with BSPEngine(len(fechas), slot_size=parallel.MESSAGE_SLOT_SIZE) as engine:
+        program = parallel.WindowedMetricsProgram(fechas, window, stored_counts=stored)
+        assert parallel.collect_rows(engine.run(program, fechas)) == expected
@@ -0,0 +1,258 @@
+"""Trazas por etapa para los patrones (Pipeline, Fork-Join y BSP).
+
+Cada proceso acumula en memoria sus spans (inicio y duración de una etapa:
+lectura de la BD, hashing, espera en una cola, superpaso BSP...) y muestras de
+contadores (profundidad de las colas). ``flush()`` los añade a un fichero por
+proceso dentro del directorio de trazas y ``finish()``, en el proceso
+principal, los une en un JSON de Chrome trace (abrible en Perfetto o en
+chrome://tracing) y calcula una tabla resumen por etapa.
+
+Desactivado, ``span()`` devuelve siempre el mismo contexto vacío y el coste
+es una comprobación de un booleano. Activado, cada span cuesta dos lecturas
+del reloj y un ``append``; los spans se emiten por lote, no por fila, así que
+puede dejarse encendido en ejecuciones reales. Los workers creados con
+``fork`` heredan la activación; los tiempos usan ``perf_counter``
+(CLOCK_MONOTONIC, común a todos los procesos en Linux).
+"""
+import glob
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+_enabled = False
+_trace_dir = None
+_events = []
+_threads = {}
+_lock = threading.Lock()
+
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.cat, self.start, _now_us() - self.start, self.args)
+        return False
+
+
+def _record(name, cat, start_us, dur_us, args):
+    tid = threading.get_ident()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    _events.append((name, cat, start_us, dur_us, tid, args))
+
+
+def _after_fork_in_child():
+    # Los eventos heredados pertenecen al padre
+    global _events, _threads, _lock
+    _events = []
+    _threads = {}
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def enable(trace_dir=None):
+    """Activa las trazas en este proceso y en los hijos que se creen después"""
+    global _enabled, _trace_dir
+    _trace_dir = trace_dir or tempfile.mkdtemp(prefix='trace-')
+    os.makedirs(_trace_dir, exist_ok=True)
+    _enabled = True
+    return _trace_dir
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, cat='stage', **args):
+    """``with span('hash'): ...`` mide el bloque como una etapa"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args or None)
+
+
+def add_span(name, start, end, cat='stage', **args):
+    """Span a partir de dos lecturas de ``time.perf_counter()`` ya hechas"""
+    if _enabled:
+        _record(name, cat, int(start * 1_000_000), int((end - start) * 1_000_000), args or None)
+
+
+def counter(name, value):
+    """Muestra de un contador (p. ej. elementos en una cola)"""
+    if _enabled:
+        _record(name, 'counter', _now_us(), None, value)
+
+
+def queue_depth(name, q):
+    """Muestra la profundidad de una cola (``qsize`` no existe en todos los sistemas)"""
+    if _enabled:
+        try:
+            counter(name, q.qsize())
+        except NotImplementedError:
+            pass
+
+
+def iter_spans(iterable, name, cat='stage'):
+    """Recorre ``iterable`` midiendo cada ``next()`` como un span (p. ej. cada lote leído)"""
+    if not _enabled:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = _now_us()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _record(name, cat, start, _now_us() - start, None)
+        yield item
+
+
+def run_traced(name, fn, *args):
+    """Ejecuta ``fn(*args)`` como un span y vuelca la traza.
+
+    Para tareas de un ``ProcessPoolExecutor``, cuyos procesos no tienen un
+    punto de salida propio donde llamar a ``flush()``.
+    """
+    with span(name, 'task'):
+        result = fn(*args)
+    flush()
+    return result
+
+
+def flush():
+    """Añade los eventos pendientes de este proceso a su fichero de trazas"""
+    global _events
+    if not _enabled or not _events:
+        return
+    with _lock:
+        events, _events = _events, []
+    pid = os.getpid()
+    process_name = multiprocessing.current_process().name
+    with open(os.path.join(_trace_dir, f"trace-{pid}.jsonl"), 'a', encoding='utf-8') as f:
+        for name, cat, start, dur, tid, args in events:
+            f.write(json.dumps([name, cat, start, dur, pid, tid, args]) + '\n')
+        f.write(json.dumps(['#process', process_name, pid,
+                            {str(tid): tname for tid, tname in _threads.items()}]) + '\n')
+
+
+def _load_events(trace_dir):
+    trace_events = []
+    names = {}
+    for path in sorted(glob.glob(os.path.join(trace_dir, 'trace-*.jsonl'))):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record[0] == '#process':
+                    _, process_name, pid, threads = record
+                    names[pid] = (process_name, threads)
+                    continue
+                name, cat, start, dur, pid, tid, args = record
+                if cat == 'counter':
+                    trace_events.append({'name': name, 'ph': 'C', 'ts': start, 'pid': pid,
+                                         'tid': tid, 'args': {name: args}})
+                else:
+                    event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start, 'dur': dur,
+                             'pid': pid, 'tid': tid}
+                    if args:
+                        event['args'] = args
+                    trace_events.append(event)
+    for pid, (process_name, threads) in names.items():
+        trace_events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                             'args': {'name': process_name}})
+        for tid, thread_name in threads.items():
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                                 'tid': int(tid), 'args': {'name': thread_name}})
+    return trace_events
+
+
+def summarize(trace_events):
+    """Por etapa: número de spans, tiempo total/medio/máximo; por contador: media y máximo"""
+    spans = {}
+    counters = {}
+    for e in trace_events:
+        if e['ph'] == 'X':
+            spans.setdefault((e['cat'], e['name']), []).append(e['dur'])
+        elif e['ph'] == 'C':
+            counters.setdefault(e['name'], []).append(e['args'][e['name']])
+    summary = []
+    for (cat, name), durations in sorted(spans.items()):
+        total = sum(durations) / 1e6
+        summary.append({'cat': cat, 'name': name, 'count': len(durations), 'total_s': total,
+                        'mean_ms': total * 1e3 / len(durations),
+                        'max_ms': max(durations) / 1e3})
+    for name, values in sorted(counters.items()):
+        summary.append({'cat': 'counter', 'name': name, 'count': len(values),
+                        'mean': sum(values) / len(values), 'max': max(values)})
+    return summary
+
+
+def finish(output_path):
+    """Une las trazas de todos los procesos en ``output_path`` y devuelve el resumen"""
+    if not _enabled:
+        return []
+    flush()
+    trace_events = _load_events(_trace_dir)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+    return summarize(trace_events)
+
+
+def print_summary(summary):
+    print(f"{'categoría':9} {'etapa':24} {'spans':>7} {'total':>10} {'media':>10} {'máximo':>10}")
+    for row in summary:
+        if row['cat'] == 'counter':
+            print(f"{'contador':9} {row['name']:24} {row['count']:7d} {'':>10} "
+                  f"{row['mean']:10.1f} {row['max']:10d}")
+        else:
+            print(f"{row['cat']:9} {row['name']:24} {row['count']:7d} {row['total_s']:9.3f}s "
+                  f"{row['mean_ms']:8.2f}ms {row['max_ms']:8.2f}ms")
+
+
+def add_trace_arguments(parser):
+    """Opción común ``--trace FICHERO``"""
+    parser.add_argument('--trace', metavar='FICHERO',
+                        help="guardar trazas por etapa en formato Chrome trace/Perfetto (JSON)")
+    return parser
+
+
+def start_from_args(args):
+    if args.trace:
+        enable()
+
+
+def finish_from_args(args):
+    """Escribe la traza pedida con ``--trace`` y muestra el resumen"""
+    if args.trace:
+        summary = finish(args.trace)
+        print(f"\nTraza guardada en {args.trace}:")
+        print_summary(summary)
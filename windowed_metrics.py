@@ -0,0 +1,147 @@
+"""Métricas mensuales derivadas de un único recorrido por partición.
+
+La base son las filas por mes y país (``{'YYYY-MM': {país: n}}``); a partir
+de ellas se calculan, según se pidan:
+
+- ``acumulado``: suscripciones acumuladas desde el inicio de la ventana.
+- ``media_movil``: media de los últimos ``rolling`` meses (incluido el actual).
+- ``crecimiento``: variación respecto al mes anterior.
+- ``paises``: desglose del mes por país.
+
+Las métricas acumuladas y de ventana solo dependen del mes actual y de un
+resumen de todos los anteriores (total y últimos meses), y ese resumen se
+combina de forma asociativa (``combine``). Por eso BSP-style.py puede
+obtenerlo para cada partición con un scan de prefijos en paralelo y la
+versión serial con un simple recorrido, y ambas llaman a ``compute_metrics``
+con el mismo resultado.
+"""
+import argparse
+
+METRICS = ('acumulado', 'media_movil', 'crecimiento', 'paises')
+DEFAULT_ROLLING = 3
+DEFAULT_TOP_COUNTRIES = 5
+
+
+def parse_metrics(text):
+    """Tipo de argparse: lista separada por comas de ``METRICS`` (o 'todas')"""
+    if text in ('todas', 'all'):
+        return METRICS
+    metrics = tuple(m.strip() for m in text.split(',') if m.strip())
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"métricas desconocidas: {', '.join(unknown)} (disponibles: {', '.join(METRICS)})")
+    return metrics
+
+
+def parse_rolling(text):
+    """Tipo de argparse: meses de la media móvil (entero >= 1)"""
+    try:
+        months = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"no es un entero: {text!r}")
+    if months < 1:
+        raise argparse.ArgumentTypeError("la media móvil necesita al menos 1 mes")
+    return months
+
+
+def add_metrics_arguments(parser):
+    """Opciones comunes ``--metrics``, ``--rolling`` y ``--top-paises``"""
+    parser.add_argument('--metrics', type=parse_metrics, default=METRICS,
+                        help=f"métricas separadas por comas ({', '.join(METRICS)}; "
+                             f"por defecto todas)")
+    parser.add_argument('--rolling', type=parse_rolling, default=DEFAULT_ROLLING,
+                        help="meses de la media móvil")
+    parser.add_argument('--top-paises', type=int, default=DEFAULT_TOP_COUNTRIES,
+                        help="países a mostrar por mes en el desglose (0: todos)")
+    return parser
+
+
+def merge_country_counts(partials, into=None):
+    """Suma varios ``{'YYYY-MM': {país: n}}``"""
+    merged = {} if into is None else into
+    for partial in partials:
+        for label, countries in partial.items():
+            month = merged.setdefault(label, {})
+            for country, count in countries.items():
+                month[country] = month.get(country, 0) + count
+    return merged
+
+
+def month_totals(by_country):
+    """``{'YYYY-MM': {país: n}}`` -> ``{'YYYY-MM': n}``"""
+    return {label: sum(countries.values()) for label, countries in by_country.items()}
+
+
+# --- Resumen de un segmento de meses para el scan de prefijos ----------------
+
+def tail_length(rolling):
+    """Meses anteriores que necesitan la media móvil y el crecimiento"""
+    return max(rolling - 1, 1)
+
+
+IDENTITY = {'total': 0, 'tail': []}
+
+
+def summarize(monthly, rolling):
+    """Resumen de una serie ``[n_mes1, n_mes2, ...]``: total y últimos meses"""
+    return {'total': sum(monthly), 'tail': list(monthly[-tail_length(rolling):])}
+
+
+def combine(left, right, rolling):
+    """Resumen de ``left`` seguido de ``right`` (asociativo, ``IDENTITY`` neutro)"""
+    return {'total': left['total'] + right['total'],
+            'tail': (left['tail'] + right['tail'])[-tail_length(rolling):]}
+
+
+def compute_metrics(series, by_country, prefix=IDENTITY, metrics=METRICS,
+                    rolling=DEFAULT_ROLLING):
+    """Filas ``{'mes', 'registros', ...}`` de ``series`` (``[(mes, n)]`` consecutivos).
+
+    ``prefix`` resume todos los meses de la ventana anteriores a ``series``.
+    """
+    if rolling < 1:
+        raise ValueError("rolling debe ser al menos 1")
+    rows = []
+    acumulado = prefix['total']
+    history = list(prefix['tail'])
+    for mes, cantidad in series:
+        row = {'mes': mes, 'registros': cantidad}
+        acumulado += cantidad
+        if 'acumulado' in metrics:
+            row['acumulado'] = acumulado
+        if 'crecimiento' in metrics:
+            previous = history[-1] if history else None
+            row['crecimiento'] = (cantidad - previous) / previous if previous else None
+        history = (history + [cantidad])[-max(rolling, 1):]
+        if 'media_movil' in metrics:
+            window = history[-rolling:]
+            row['media_movil'] = sum(window) / len(window)
+        if 'paises' in metrics:
+            countries = by_country.get(mes, {})
+            row['paises'] = sorted(countries.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        rows.append(row)
+    return rows
+
+
+def print_metrics(rows, metrics=METRICS, rolling=DEFAULT_ROLLING,
+                  top_countries=DEFAULT_TOP_COUNTRIES):
+    print("Desglose por mes:")
+    for row in rows:
+        parts = []
+        if 'acumulado' in metrics:
+            parts.append(f"acumulado {row['acumulado']}")
+        if 'media_movil' in metrics:
+            parts.append(f"media {rolling}m {row['media_movil']:.1f}")
+        if 'crecimiento' in metrics:
+            crecimiento = row['crecimiento']
+            parts.append(f"crecimiento {crecimiento:+.1%}" if crecimiento is not None
+                         else "crecimiento    n/d")
+        extra = f" ({', '.join(parts)})" if parts else ""
+        print(f"  {row['mes']}: {row['registros']} registros{extra}")
+        if 'paises' in metrics:
+            countries = row['paises'][:top_countries] if top_countries else row['paises']
+            for country, count in countries:
+                print(f"      {country}: {count}")
+            if len(countries) < len(row['paises']):
+                print(f"      ... {len(row['paises']) - len(countries)} países más")